@@ -1,34 +1,111 @@
 from flask import Flask
 from flask_compress import Compress
+from werkzeug.middleware.proxy_fix import ProxyFix
+from contextlib import contextmanager
 import os
+import time
+
+@contextmanager
+def _fase(tiempos, nombre):
+    # Tiempo de cada fase del arranque (flask startup-profile)
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        tiempos.append((nombre, time.perf_counter() - inicio))
 
 def create_app(config_name=None):
+    tiempos = []
     app = Flask(__name__)
+    app.extensions['tiempos_arranque'] = tiempos
+    
+    with _fase(tiempos, 'configuracion'):
+        # Determinar configuración
+        if config_name is None:
+            config_name = os.environ.get('FLASK_CONFIG', 'default')
+        
+        # Cargar configuración
+        from app.config import config
+        app.config.from_object(config[config_name])
+        
+        # IP real del cliente detrás de nginx (límites por IP, logs)
+        if app.config['PROXIES_CONFIANZA']:
+            app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXIES_CONFIANZA'])
+    
+    with _fase(tiempos, 'extensiones'):
+        # Validadores y Cache-Control: se registra antes que Compress para
+        # ejecutarse después (los after_request van en orden inverso)
+        from app import cache_http
+        cache_http.init_app(app)
+        
+        # Inicializar extensiones
+        compress = Compress()
+        compress.init_app(app)
+        
+        # Envío de estáticos con sendfile/X-Accel-Redirect; registra la
+        # compresión al vuelo de Compress salvo para esos ficheros
+        from app import envio_ficheros
+        envio_ficheros.init_app(app, compress)
+    
+    with _fase(tiempos, 'logging'):
+        # Configurar manejo de errores
+        if not app.debug and not app.testing:
+            configure_production_logging(app)
     
-    # Determinar configuración
-    if config_name is None:
-        config_name = os.environ.get('FLASK_CONFIG', 'default')
+    with _fase(tiempos, 'base_de_datos'):
+        # Pool de conexiones SQLite
+        from app import db
+        db.init_app(app)
+        
+        # Escritor de logs en segundo plano
+        from app import escritor_logs
+        escritor_logs.init_app(app)
+        
+        # Cola duradera de /api/solicitud (INGESTA_SPOOL)
+        from app import cola_ingesta
+        cola_ingesta.init_app(app)
+        
+        # Estado compartido de la limitación de peticiones
+        from app import limite_peticiones
+        limite_peticiones.init_app(app)
+        
+        # Purga en segundo plano de las claves de idempotencia expiradas
+        from app import idempotencia
+        idempotencia.init_app(app)
+        
+        # Esquema de la base de datos: una consulta si ya está al día (en
+        # gunicorn las migraciones se aplican una vez en el proceso maestro)
+        with app.app_context():
+            from app import migraciones
+            migraciones.init_app(app)
     
-    # Cargar configuración
-    from app.config import config
-    app.config.from_object(config[config_name])
+    with _fase(tiempos, 'blueprints'):
+        # Registrar blueprints
+        from app.routes import main_bp
+        app.register_blueprint(main_bp)
     
-    # Inicializar extensiones
-    compress = Compress()
-    compress.init_app(app)
+    with _fase(tiempos, 'plantillas'):
+        # Bytecode de Jinja ya compilado (flask templates-compile)
+        from app import plantillas
+        plantillas.init_app(app)
+        # Etiqueta {% fragmento %}, antes de compilar ninguna plantilla
+        from app import cache_fragmentos
+        cache_fragmentos.init_app(app)
     
-    # Configurar manejo de errores
-    if not app.debug and not app.testing:
-        configure_production_logging(app)
+    with _fase(tiempos, 'activos'):
+        # URLs de estáticos con huella de contenido (flask assets-build)
+        from app import activos
+        activos.init_app(app)
     
-    # Inicializar base de datos
-    with app.app_context():
-        from app.models import init_db
-        init_db()
+    with _fase(tiempos, 'cache_paginas'):
+        # Páginas públicas prerenderizadas y comprimidas
+        from app import cache_paginas
+        cache_paginas.init_app(app)
     
-    # Registrar blueprints
-    from app.routes import main_bp
-    app.register_blueprint(main_bp)
+    with _fase(tiempos, 'comandos'):
+        # Comandos de mantenimiento (flask ...)
+        from app.cli import register_commands
+        register_commands(app)
     
     # Headers de seguridad
     @app.after_request
@@ -60,4 +137,4 @@ def configure_production_logging(app):
     file_handler.setLevel(logging.INFO)
     app.logger.addHandler(file_handler)
     app.logger.setLevel(logging.INFO)
-    app.logger.info('SESS-Vision startup')
\ No newline at end of file
+    app.logger.info('SESS-Vision startup')
@@ -0,0 +1,193 @@
+"""Activos estáticos con huella de contenido y variantes precomprimidas.
+
+`flask assets-build` copia cada fichero de app/static y cada paquete de
+app/paquetes.py a app/static/dist con el hash de su contenido en el
+nombre (css/main.css -> css/main.3fa9c2d1e4b5.css), escribe junto a él
+las variantes .br, .gz y .zst y guarda la correspondencia en
+dist/manifest.json.
+
+Con el manifiesto cargado, url_for('static', filename='css/main.css')
+apunta a la copia con huella: la URL solo cambia cuando cambia el
+contenido, así que se puede servir con Cache-Control immutable. Los
+ficheros de dist se sirven con la variante que acepte el cliente, sin
+comprimir nada al vuelo (el envío, en app/envio_ficheros.py). Sin
+manifiesto (o en modo debug) las URLs llevan ?v=STATIC_VERSION como
+hasta ahora.
+"""
+import os
+import gzip
+import json
+import hashlib
+import mimetypes
+from flask import request, url_for
+from markupsafe import Markup
+from app.cache_paginas import elegir_codificacion
+from app.envio_ficheros import enviar_fichero
+from app.paquetes import PAQUETES
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    from compression import zstd  # Python 3.14+
+except ImportError:
+    try:
+        from backports import zstd
+    except ImportError:
+        zstd = None
+
+DIRECTORIO_DIST = 'dist'
+MANIFIESTO = 'manifest.json'
+
+# Codificación -> extensión de la variante, en orden de preferencia
+VARIANTES = {'br': '.br', 'zstd': '.zst', 'gzip': '.gz'}
+
+# Tipos que merece la pena comprimir (las imágenes ya lo están, salvo SVG)
+EXTENSIONES_COMPRIMIBLES = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.xml', '.map')
+
+def _comprimir(contenido, codificacion):
+    if codificacion == 'br':
+        return brotli.compress(contenido, quality=11) if brotli is not None else None
+    if codificacion == 'zstd':
+        return zstd.compress(contenido, level=19) if zstd is not None else None
+    return gzip.compress(contenido, 9, mtime=0)
+
+def _escribir(ruta, contenido):
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    temporal = f'{ruta}.tmp'
+    with open(temporal, 'wb') as f:
+        f.write(contenido)
+    os.replace(temporal, ruta)
+
+def construir_activos(directorio_static, fuentes=None, excluidos=()):
+    """Genera dist/ y el manifiesto; devuelve {fichero: entrada del manifiesto}.
+
+    `fuentes` permite añadir ficheros generados ({nombre lógico: bytes})
+    que no existen tal cual en app/static, y `excluidos` deja fuera
+    ficheros de app/static. Las copias de compilaciones anteriores se
+    conservan: los workers que aún no se han reiniciado siguen enlazando
+    a ellas.
+    """
+    destino = os.path.join(directorio_static, DIRECTORIO_DIST)
+    contenidos = {}
+    for raiz, directorios, ficheros in os.walk(directorio_static):
+        if os.path.abspath(raiz) == os.path.abspath(directorio_static) and DIRECTORIO_DIST in directorios:
+            directorios.remove(DIRECTORIO_DIST)
+        for fichero in ficheros:
+            ruta = os.path.join(raiz, fichero)
+            nombre = os.path.relpath(ruta, directorio_static).replace(os.sep, '/')
+            if nombre in excluidos:
+                continue
+            with open(ruta, 'rb') as f:
+                contenidos[nombre] = f.read()
+    contenidos.update(fuentes or {})
+
+    manifiesto = {}
+    for nombre, contenido in sorted(contenidos.items()):
+        huella = hashlib.sha256(contenido).hexdigest()[:12]
+        base, extension = os.path.splitext(nombre)
+        versionado = f'{base}.{huella}{extension}'
+        ruta = os.path.join(destino, versionado)
+        if not os.path.exists(ruta):
+            _escribir(ruta, contenido)
+
+        variantes = []
+        if extension.lower() in EXTENSIONES_COMPRIMIBLES:
+            for codificacion, sufijo in VARIANTES.items():
+                if os.path.exists(ruta + sufijo):
+                    variantes.append(codificacion)
+                    continue
+                comprimido = _comprimir(contenido, codificacion)
+                # Solo si ahorra algo (ficheros muy pequeños no)
+                if comprimido is not None and len(comprimido) < len(contenido):
+                    _escribir(ruta + sufijo, comprimido)
+                    variantes.append(codificacion)
+        manifiesto[nombre] = {'ruta': versionado, 'bytes': len(contenido), 'variantes': variantes}
+
+    _escribir(os.path.join(destino, MANIFIESTO),
+              json.dumps(manifiesto, indent=2, sort_keys=True).encode('utf-8'))
+    return manifiesto
+
+class Activos:
+    """Manifiesto cargado y resolución de URLs de los estáticos"""
+
+    def __init__(self):
+        self.rutas = {}        # nombre lógico -> ruta en dist
+        self.variantes = {}    # ruta en dist -> codificaciones disponibles
+        self.criticos = {}     # nombre lógico -> CSS crítico a incrustar
+
+    def cargar(self, directorio_static):
+        ruta = os.path.join(directorio_static, DIRECTORIO_DIST, MANIFIESTO)
+        try:
+            with open(ruta, encoding='utf-8') as f:
+                manifiesto = json.load(f)
+        except FileNotFoundError:
+            manifiesto = {}
+        self.rutas = {nombre: f"{DIRECTORIO_DIST}/{entrada['ruta']}" for nombre, entrada in manifiesto.items()}
+        self.variantes = {f"{DIRECTORIO_DIST}/{entrada['ruta']}": frozenset(entrada['variantes'])
+                          for entrada in manifiesto.values()}
+        self.criticos = {}
+        for nombre, entrada in manifiesto.items():
+            if nombre.startswith('criticos/'):
+                with open(os.path.join(directorio_static, DIRECTORIO_DIST, entrada['ruta']), encoding='utf-8') as f:
+                    self.criticos[nombre] = f.read()
+        return bool(manifiesto)
+
+activos = Activos()
+
+def init_app(app):
+    """Usa el manifiesto (si existe y no es modo debug) en url_for('static')"""
+    usar_manifiesto = not app.debug and activos.cargar(app.static_folder)
+    version = app.config.get('STATIC_VERSION')
+
+    @app.url_defaults
+    def _url_estatico(endpoint, values):
+        if endpoint != 'static' or 'filename' not in values:
+            return
+        versionado = activos.rutas.get(values['filename']) if usar_manifiesto else None
+        if versionado is not None:
+            values['filename'] = versionado
+        elif not values['filename'].startswith(f'{DIRECTORIO_DIST}/'):
+            values.setdefault('v', version)
+
+    @app.template_global()
+    def urls_paquete(nombre):
+        """URL del paquete compilado o, sin manifiesto, de sus ficheros originales"""
+        if usar_manifiesto and nombre in activos.rutas:
+            return [url_for('static', filename=nombre)]
+        return [url_for('static', filename=fichero) for fichero in PAQUETES[nombre]]
+
+    @app.template_global()
+    def css_critico(nombre):
+        """CSS crítico compilado para incrustar en <style> ('' sin manifiesto)"""
+        if not usar_manifiesto:
+            return ''
+        # Un </style> dentro del CSS cerraría la etiqueta antes de tiempo
+        return Markup(activos.criticos.get(nombre, '').replace('</', '<\\/'))
+
+    def static(filename):
+        disponibles = activos.variantes.get(filename)
+        if disponibles is None:
+            return enviar_fichero(app.static_folder, filename)
+        if not disponibles or app.config['ESTATICOS_ENVIO'] == 'x-accel-redirect':
+            # Sin variantes, o nginx elige la suya (gzip_static/brotli_static)
+            respuesta = enviar_fichero(app.static_folder, filename)
+        else:
+            codificacion = elegir_codificacion(request.headers.get('Accept-Encoding', ''), disponibles,
+                                               tuple(VARIANTES))
+            if codificacion == 'identity':
+                respuesta = enviar_fichero(app.static_folder, filename)
+            else:
+                # El tipo es el del fichero original, no el de la variante (.br, .gz...)
+                respuesta = enviar_fichero(
+                    app.static_folder, filename + VARIANTES[codificacion],
+                    mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+                respuesta.headers['Content-Encoding'] = codificacion
+            respuesta.vary.add('Accept-Encoding')
+        # Las variantes ya están precomprimidas: nada que comprimir al vuelo
+        respuesta.comprimir_al_vuelo = False
+        return respuesta
+
+    app.view_functions['static'] = static
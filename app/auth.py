@@ -1,7 +1,6 @@
 from functools import wraps
-from flask import session, redirect, url_for, request, jsonify, flash
+from flask import session, redirect, url_for, request, jsonify, flash, current_app
 from app.models import verificar_admin, log_sistema
-import jwt
 from datetime import datetime, timedelta
 
 def login_required(f):
@@ -26,22 +25,21 @@ def admin_required(f):
 
 def generar_token(admin_id):
     """Genera token JWT para el administrador"""
-    from app import create_app
-    app = create_app()
+    # jwt solo se importa si se usan tokens (no en el arranque de cada worker)
+    import jwt
     
     payload = {
         'admin_id': admin_id,
         'exp': datetime.utcnow() + timedelta(hours=24)
     }
-    return jwt.encode(payload, app.config['SECRET_KEY'], algorithm='HS256')
+    return jwt.encode(payload, current_app.config['SECRET_KEY'], algorithm='HS256')
 
 def verificar_token(token):
     """Verifica un token JWT"""
-    from app import create_app
-    app = create_app()
+    import jwt
     
     try:
-        payload = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
+        payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
         return payload
     except jwt.ExpiredSignatureError:
         return None
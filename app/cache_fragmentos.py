@@ -0,0 +1,116 @@
+"""Caché de fragmentos HTML ya renderizados, por worker.
+
+En las plantillas:
+
+    {% fragmento 'solicitud', solicitud.id, solicitud.version %}
+        ... marcado de la tarjeta ...
+    {% endfragmento %}
+
+Todos los argumentos salvo el último forman la clave; el último es la
+versión. Si la entrada guardada tiene otra versión, el bloque se vuelve a
+renderizar y la sustituye. Las tarjetas de solicitudes usan la columna
+version, que cada UPDATE de models incrementa: un cambio hecho desde otro
+worker también deja obsoleta la copia de este. Las partes fijas del
+diseño (navegación, pie) usan STATIC_VERSION.
+
+Las entradas se expulsan por LRU cuando el total supera
+FRAGMENTOS_MAX_BYTES (memoria real de las cadenas, según sys.getsizeof).
+Las funciones de escritura de models además invalidan en el acto las
+entradas de las filas que modifican o borran.
+"""
+import sys
+import threading
+from collections import OrderedDict
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+class CacheFragmentos:
+    """LRU de fragmentos {clave: (versión, html)} con tope de memoria"""
+
+    def __init__(self, max_bytes=16 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.habilitada = True
+        self._entradas = OrderedDict()  # clave -> (versión, html, bytes)
+        self._bytes = 0
+        self._cerrojo = threading.Lock()
+        self._stats = {'aciertos': 0, 'fallos': 0, 'expulsadas': 0, 'invalidadas': 0}
+
+    def obtener(self, clave, version, generar):
+        """HTML guardado para (clave, versión) o el que devuelva generar()"""
+        if not self.habilitada:
+            return generar()
+        with self._cerrojo:
+            entrada = self._entradas.get(clave)
+            if entrada is not None and entrada[0] == version:
+                self._entradas.move_to_end(clave)
+                self._stats['aciertos'] += 1
+                return entrada[1]
+            self._stats['fallos'] += 1
+        # Fuera del cerrojo: el bloque puede contener otros fragmentos
+        html = generar()
+        self._guardar(clave, version, html)
+        return html
+
+    def _guardar(self, clave, version, html):
+        tamano = sys.getsizeof(html)
+        with self._cerrojo:
+            anterior = self._entradas.pop(clave, None)
+            if anterior is not None:
+                self._bytes -= anterior[2]
+            if tamano > self.max_bytes:
+                return
+            self._entradas[clave] = (version, html, tamano)
+            self._bytes += tamano
+            while self._bytes > self.max_bytes:
+                _, (_, _, liberados) = self._entradas.popitem(last=False)
+                self._bytes -= liberados
+                self._stats['expulsadas'] += 1
+
+    def invalidar(self, *claves):
+        with self._cerrojo:
+            for clave in claves:
+                entrada = self._entradas.pop(clave, None)
+                if entrada is not None:
+                    self._bytes -= entrada[2]
+                    self._stats['invalidadas'] += 1
+
+    def vaciar(self):
+        with self._cerrojo:
+            self._entradas.clear()
+            self._bytes = 0
+
+    def estadisticas(self):
+        with self._cerrojo:
+            return dict(self._stats, entradas=len(self._entradas), bytes=self._bytes,
+                        max_bytes=self.max_bytes, habilitada=self.habilitada)
+
+fragmentos = CacheFragmentos()
+
+def invalidar_solicitudes(ids):
+    """Quita de la caché las tarjetas de las solicitudes modificadas o borradas"""
+    fragmentos.invalidar(*(('solicitud', solicitud_id) for solicitud_id in ids))
+
+class ExtensionFragmentos(Extension):
+    """Etiqueta {% fragmento clave..., version %} ... {% endfragmento %}"""
+    tags = {'fragmento'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        argumentos = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            argumentos.append(parser.parse_expression())
+        if len(argumentos) < 2:
+            parser.fail('fragmento necesita al menos una clave y una versión', lineno)
+        cuerpo = parser.parse_statements(('name:endfragmento',), drop_needle=True)
+        llamada = self.call_method('_renderizar', [nodes.List(argumentos)])
+        return nodes.CallBlock(llamada, [], [], cuerpo).set_lineno(lineno)
+
+    def _renderizar(self, argumentos, caller):
+        *clave, version = argumentos
+        return fragmentos.obtener(tuple(clave), version, caller)
+
+def init_app(app):
+    """Registra la etiqueta en Jinja (antes de compilar ninguna plantilla)"""
+    fragmentos.habilitada = app.config.get('FRAGMENTOS_CACHE', True)
+    fragmentos.max_bytes = app.config.get('FRAGMENTOS_MAX_BYTES', fragmentos.max_bytes)
+    app.jinja_env.add_extension(ExtensionFragmentos)
@@ -0,0 +1,80 @@
+"""Validadores HTTP (ETag/Last-Modified, 304) y políticas de Cache-Control.
+
+Cada respuesta recibe la cabecera Cache-Control de su política: la que
+fije la vista con @politica_cache o, si no, la que corresponda a su tipo
+de ruta (páginas en caché, estáticos, panel, API). Salvo en las políticas
+no-store, las respuestas GET sin ETag reciben uno fuerte calculado sobre
+el cuerpo final y se evalúan If-None-Match/If-Modified-Since.
+
+El hook se registra antes que flask_compress para ejecutarse después de
+él (Flask llama a los after_request en orden inverso): así el ETag es el
+de la representación comprimida que recibe el cliente.
+"""
+from functools import wraps
+from flask import request
+
+_stats = {'evaluadas': 0, 'condicionales': 0, 'no_modificadas': 0}
+
+def politica_cache(nombre):
+    """Decorador: fija la política de Cache-Control de la vista"""
+    def decorador(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            return f(*args, **kwargs)
+        decorated_function.politica_cache = nombre
+        return decorated_function
+    return decorador
+
+def _politica(app):
+    vista = app.view_functions.get(request.endpoint)
+    nombre = getattr(vista, 'politica_cache', None)
+    if nombre is not None:
+        return nombre
+    if request.endpoint == 'static':
+        # Copias con huella (app/activos.py) o ?v=: la URL cambia con el contenido
+        if request.view_args['filename'].startswith('dist/') or 'v' in request.args:
+            return 'estaticos_versionados'
+        return 'estaticos'
+    if getattr(vista, 'pagina_en_cache', False):
+        return 'publica'
+    if request.path.startswith('/api/admin/'):
+        return 'api_admin'
+    if request.path.startswith('/admin'):
+        return 'admin'
+    if request.path.startswith('/api/'):
+        return 'api'
+    return None
+
+def _aplicar(app, response):
+    nombre = _politica(app)
+    if nombre is None:
+        return response
+    cache_control = app.config['CACHE_CONTROL'][nombre]
+    response.headers['Cache-Control'] = cache_control
+
+    if (request.method not in ('GET', 'HEAD') or response.status_code != 200
+            or response.is_streamed or 'no-store' in cache_control):
+        return response
+    if 'X-Accel-Redirect' in response.headers or 'X-Sendfile' in response.headers:
+        # El cuerpo lo pone el servidor de delante, que calcula sus validadores
+        return response
+
+    if response.get_etag()[0] is None:
+        response.add_etag()
+    _stats['evaluadas'] += 1
+    if 'If-None-Match' in request.headers or 'If-Modified-Since' in request.headers:
+        _stats['condicionales'] += 1
+        response.make_conditional(request)
+        if response.status_code == 304:
+            _stats['no_modificadas'] += 1
+    return response
+
+def estadisticas():
+    condicionales = _stats['condicionales']
+    return dict(_stats, tasa_304=round(_stats['no_modificadas'] / condicionales, 3) if condicionales else 0.0)
+
+def init_app(app):
+    """Registra el hook; debe llamarse antes de inicializar flask_compress"""
+    @app.after_request
+    def validadores_y_cache_control(response):
+        return _aplicar(app, response)
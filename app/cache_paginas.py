@@ -0,0 +1,131 @@
+"""Caché en memoria de las páginas públicas ya renderizadas.
+
+Las vistas marcadas con @pagina_en_cache se renderizan una vez por
+worker (al arrancar o en la primera visita) y se guardan en crudo y
+comprimidas con brotli y gzip. Las visitas siguientes reciben el cuerpo
+adecuado a su Accept-Encoding sin pasar por Jinja ni por flask_compress
+(que no toca respuestas que ya llevan Content-Encoding).
+
+La caché se invalida si cambia STATIC_VERSION y, cuando las plantillas se
+recargan solas (modo debug o TEMPLATES_AUTO_RELOAD), si cambia alguna
+plantilla.
+"""
+import os
+import gzip
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps, lru_cache
+from flask import current_app, request, Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Preferencia del servidor entre las codificaciones que el cliente acepta
+CODIFICACIONES = ('br', 'gzip')
+
+_paginas = {}
+_stats = {'aciertos': 0, 'renderizadas': 0}
+
+@lru_cache(maxsize=64)
+def codificaciones_aceptadas(accept_encoding):
+    """Conjunto de codificaciones de Accept-Encoding (sin las de q=0)"""
+    aceptadas = set()
+    for parte in accept_encoding.lower().split(','):
+        nombre, _, parametros = parte.partition(';')
+        parametros = parametros.replace(' ', '')
+        if parametros.startswith('q='):
+            try:
+                if float(parametros[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        aceptadas.add(nombre.strip())
+    return frozenset(aceptadas)
+
+def elegir_codificacion(accept_encoding, disponibles, preferencia=CODIFICACIONES):
+    """Codificación de `disponibles` a servir ('identity' si el cliente no acepta ninguna)"""
+    aceptadas = codificaciones_aceptadas(accept_encoding)
+    for codificacion in preferencia:
+        if codificacion in aceptadas and codificacion in disponibles:
+            return codificacion
+    return 'identity'
+
+def _firma_plantillas(app):
+    if not app.jinja_env.auto_reload:
+        return None
+    ultima = 0
+    for raiz, _, ficheros in os.walk(os.path.join(app.root_path, app.template_folder)):
+        for fichero in ficheros:
+            ultima = max(ultima, os.stat(os.path.join(raiz, fichero)).st_mtime_ns)
+    return ultima
+
+def _firma(app):
+    return (app.config.get('STATIC_VERSION'), _firma_plantillas(app))
+
+def _comprimir(html):
+    cuerpos = {'identity': html, 'gzip': gzip.compress(html, 9, mtime=0)}
+    if brotli is not None:
+        cuerpos['br'] = brotli.compress(html, quality=11)
+    # ETag fuerte por representación: mismo contenido, bytes distintos
+    resumen = hashlib.sha256(html).hexdigest()[:20]
+    return {codificacion: (cuerpo, f'{resumen}-{codificacion}') for codificacion, cuerpo in cuerpos.items()}
+
+def pagina_en_cache(f):
+    """Decorador: sirve la página renderizada una sola vez (solo GET sin parámetros de vista)"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        app = current_app._get_current_object()
+        if not app.config.get('CACHE_PAGINAS') or args or kwargs:
+            return f(*args, **kwargs)
+
+        firma = _firma(app)
+        pagina = _paginas.get(request.endpoint)
+        if pagina is None or pagina[0] != firma:
+            respuesta = app.make_response(f())
+            if respuesta.status_code != 200:
+                return respuesta
+            pagina = (firma, respuesta.mimetype, _comprimir(respuesta.get_data()),
+                      datetime.now(timezone.utc).replace(microsecond=0))
+            _paginas[request.endpoint] = pagina
+            _stats['renderizadas'] += 1
+        else:
+            _stats['aciertos'] += 1
+
+        _, mimetype, cuerpos, renderizada = pagina
+        codificacion = elegir_codificacion(request.headers.get('Accept-Encoding', ''), cuerpos)
+        cuerpo, etag = cuerpos[codificacion]
+        respuesta = Response(cuerpo, mimetype=mimetype)
+        if codificacion != 'identity':
+            respuesta.headers['Content-Encoding'] = codificacion
+        respuesta.headers['Vary'] = 'Accept-Encoding'
+        # Validadores precalculados (304 en app/cache_http.py)
+        respuesta.set_etag(etag)
+        respuesta.last_modified = renderizada
+        return respuesta
+    decorated_function.pagina_en_cache = True
+    return decorated_function
+
+def precalentar(app):
+    """Renderiza todas las páginas en caché (al arrancar el worker)"""
+    for regla in app.url_map.iter_rules():
+        vista = app.view_functions.get(regla.endpoint)
+        if not getattr(vista, 'pagina_en_cache', False) or regla.arguments:
+            continue
+        with app.test_request_context(regla.rule):
+            vista()
+
+def invalidar():
+    _paginas.clear()
+
+def estadisticas():
+    return dict(_stats, paginas={
+        endpoint: {codificacion: len(cuerpo) for codificacion, (cuerpo, _) in cuerpos.items()}
+        for endpoint, (_, _, cuerpos, _) in _paginas.items()
+    })
+
+def init_app(app):
+    """Precalienta la caché si está activada"""
+    if app.config.get('CACHE_PAGINAS') and app.config.get('CACHE_PAGINAS_PRECALENTAR'):
+        precalentar(app)
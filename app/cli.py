@@ -0,0 +1,241 @@
+import json
+import click
+
+def register_commands(app):
+    """Registra los comandos de mantenimiento en `flask <comando>`"""
+
+    @app.cli.command('db-upgrade')
+    @click.option('--dry-run', is_flag=True, help='Mostrar los pasos pendientes sin ejecutarlos')
+    def db_upgrade(dry_run):
+        """Aplica las migraciones pendientes del esquema"""
+        from app.migraciones import migrar, version_aplicada, VERSION_ACTUAL
+
+        click.echo(f'Versión actual: {version_aplicada()} (última: {VERSION_ACTUAL})')
+
+        def informar(version, nombre, descripcion):
+            click.echo(f'  [{version}] {nombre}: {descripcion}')
+
+        aplicadas = migrar(dry_run=dry_run, informar=informar)
+        if not aplicadas:
+            click.echo('✅ El esquema está al día')
+        elif dry_run:
+            click.echo(f'{len(aplicadas)} migraciones pendientes (no se ha modificado nada)')
+        else:
+            click.echo(f'✅ {len(aplicadas)} migraciones aplicadas; versión {version_aplicada()}')
+
+    @app.cli.command('db-status')
+    def db_status():
+        """Muestra las migraciones aplicadas y pendientes"""
+        from app.db import obtener_conexion
+        from app.migraciones import migraciones_pendientes, version_aplicada
+
+        if version_aplicada():
+            for version, nombre, aplicada, duracion in obtener_conexion().execute(
+                    'SELECT version, nombre, aplicada, duracion FROM schema_version ORDER BY version'):
+                click.echo(f'✅ {version} {nombre} ({aplicada}, {duracion or 0:.2f} s)')
+        for version, nombre, _ in migraciones_pendientes():
+            click.echo(f'⏳ {version} {nombre}')
+
+    @app.cli.command('check-query-plans')
+    @click.option('--verbose', '-v', is_flag=True, help='Mostrar el plan de cada sentencia')
+    def check_query_plans(verbose):
+        """Falla si alguna consulta del modelo recorre una tabla completa"""
+        from app.planes_consulta import verificar_planes
+
+        fallos = 0
+        for escenario, sentencia, plan, completos in verificar_planes():
+            if completos:
+                fallos += 1
+                click.echo(f'❌ {escenario}: {", ".join(completos)}')
+                click.echo(f'   {sentencia}')
+            elif verbose:
+                click.echo(f'✅ {escenario}: {sentencia}')
+            if verbose or completos:
+                for detalle in plan:
+                    click.echo(f'      {detalle}')
+
+        if fallos:
+            click.echo(f'{fallos} sentencias recorren tablas completas')
+            raise SystemExit(1)
+        click.echo('✅ Ninguna consulta recorre tablas completas')
+
+    @app.cli.command('startup-profile')
+    @click.option('--budget-ms', type=int, default=None,
+                  help='Presupuesto de arranque (por defecto ARRANQUE_PRESUPUESTO_MS)')
+    @click.option('--top', type=int, default=10, show_default=True, help='Paquetes más lentos a mostrar')
+    def startup_profile(budget_ms, top):
+        """Mide el arranque (importaciones y fases de create_app); falla si supera el presupuesto"""
+        from app.perfil_arranque import perfilar_arranque
+
+        presupuesto = budget_ms if budget_ms is not None else app.config['ARRANQUE_PRESUPUESTO_MS']
+        tiempos = perfilar_arranque(top=top)
+
+        click.echo(f"Importación de app: {tiempos['importacion'] * 1000:7.1f} ms")
+        for paquete, segundos in tiempos['paquetes']:
+            click.echo(f'  {paquete:<40} {segundos * 1000:7.1f} ms')
+        click.echo(f"create_app():       {tiempos['create_app'] * 1000:7.1f} ms")
+        for fase, segundos in tiempos['fases']:
+            click.echo(f'  {fase:<40} {segundos * 1000:7.1f} ms')
+        total = tiempos['total'] * 1000
+        click.echo(f"Total: {total:.1f} ms (proceso completo con intérprete: {tiempos['proceso'] * 1000:.1f} ms)")
+
+        if total > presupuesto:
+            click.echo(f'❌ El arranque supera el presupuesto de {presupuesto} ms')
+            raise SystemExit(1)
+        click.echo(f'✅ Dentro del presupuesto de {presupuesto} ms')
+
+    @app.cli.command('assets-build')
+    def assets_build():
+        """Genera app/static/dist: paquetes minificados, CSS crítico, copias con huella,
+        variantes .br/.gz/.zst y manifiesto"""
+        from app.activos import construir_activos
+        from app.paquetes import construir_paquetes, SOLO_DEPURACION
+
+        manifiesto = construir_activos(app.static_folder, fuentes=construir_paquetes(app),
+                                       excluidos=SOLO_DEPURACION)
+        for nombre, entrada in manifiesto.items():
+            variantes = ', '.join(entrada['variantes']) or 'sin comprimir'
+            click.echo(f"{nombre:<28} -> {entrada['ruta']:<36} {entrada['bytes']:>7} bytes ({variantes})")
+        click.echo(f'✅ {len(manifiesto)} activos en {app.static_folder}/dist (reinicie los workers)')
+        if app.config.get('PLANTILLAS_CACHE_BYTECODE'):
+            from app.plantillas import compilar
+            click.echo(f'✅ {len(compilar(app))} plantillas compiladas')
+
+    @app.cli.command('templates-compile')
+    def templates_compile():
+        """Compila las plantillas Jinja en la caché de bytecode compartida por los workers"""
+        from app.plantillas import compilar
+
+        if not app.config.get('PLANTILLAS_CACHE_BYTECODE'):
+            click.echo('❌ PLANTILLAS_CACHE_BYTECODE está desactivado')
+            raise SystemExit(1)
+        tiempos = compilar(app)
+        for nombre, segundos in sorted(tiempos.items()):
+            click.echo(f'{nombre:<38} {segundos * 1000:8.1f} ms')
+        click.echo(f'✅ {len(tiempos)} plantillas en {app.jinja_env.bytecode_cache.directory}')
+
+    @app.cli.command('rebuild-stats')
+    @click.option('--verify-only', is_flag=True, help='Solo informar de las diferencias, sin corregir')
+    def rebuild_stats(verify_only):
+        """Verifica y reconstruye los contadores de estadisticas_solicitudes"""
+        from app.models import reconstruir_estadisticas
+
+        diferencias = reconstruir_estadisticas(corregir=not verify_only)
+        for (categoria, clave), (guardado, real) in sorted(diferencias.items()):
+            click.echo(f'{categoria}[{clave}]: contador={guardado} real={real}')
+
+        if not diferencias:
+            click.echo('✅ Los contadores coinciden con los datos')
+        elif verify_only:
+            click.echo(f'❌ {len(diferencias)} contadores desincronizados')
+            raise SystemExit(1)
+        else:
+            click.echo(f'✅ {len(diferencias)} contadores corregidos')
+
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index():
+        """Regenera desde cero el índice de búsqueda de solicitudes"""
+        from app.models import reconstruir_indice_busqueda, log_sistema
+
+        reconstruir_indice_busqueda()
+        log_sistema('sistema', 'Índice de búsqueda reconstruido')
+        click.echo('✅ Índice de búsqueda reconstruido')
+
+    @app.cli.command('import-solicitudes')
+    @click.argument('ruta', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--format', 'formato', type=click.Choice(['csv', 'jsonl']), default=None,
+                  help='Formato del fichero (por defecto según la extensión)')
+    @click.option('--batch-size', type=click.IntRange(min=1), default=20000, show_default=True, help='Registros por transacción')
+    @click.option('--restart', is_flag=True, help='Ignorar el punto de control y empezar desde el principio')
+    def import_solicitudes(ruta, formato, batch_size, restart):
+        """Importa solicitudes desde un fichero CSV o JSONL (admite .gz)"""
+        from app.importacion import leer_registros, clave_importacion
+        from app.models import importar_solicitudes, reiniciar_importacion
+
+        clave = clave_importacion(ruta)
+        if restart:
+            reiniciar_importacion(clave)
+
+        def progreso(resumen):
+            click.echo(f"{resumen['procesadas']} procesadas, {resumen['insertadas']} insertadas, "
+                       f"{resumen['rechazadas']} rechazadas ({resumen['filas_por_segundo']:.0f} filas/s)")
+
+        try:
+            resumen = importar_solicitudes(leer_registros(ruta, formato), clave=clave,
+                                           tamano_lote=batch_size, usuario='cli', progreso=progreso)
+        except ValueError as e:
+            click.echo(f'❌ {e}')
+            raise SystemExit(1)
+
+        if resumen['completada'] and resumen['reanudada_desde'] == resumen['procesadas']:
+            click.echo('Este fichero ya se importó por completo (use --restart para repetirlo)')
+            return
+        if resumen['reanudada_desde']:
+            click.echo(f"Reanudada desde el registro {resumen['reanudada_desde']}")
+        for numero, error in resumen['errores'][:10]:
+            click.echo(f'   registro {numero}: {error}')
+        if resumen['rechazadas'] > 10:
+            click.echo(f"   ... y {resumen['rechazadas'] - 10} registros rechazados más")
+        click.echo(f"✅ {resumen['insertadas']} solicitudes importadas en {resumen['segundos']:.1f} s "
+                   f"({resumen['filas_por_segundo']:.0f} filas/s)")
+
+    @app.cli.command('spool-drain')
+    @click.option('--directory', default=None, help='Directorio del spool (por defecto INGESTA_DIRECTORIO)')
+    def spool_drain(directory):
+        """Vuelca en la base de datos todas las solicitudes del spool de ingesta.
+
+        Con los workers detenidos: los segmentos abiertos o reclamados se
+        consideran huérfanos sin esperar a que envejezcan.
+        """
+        import os
+        from app.cola_ingesta import ColaIngesta
+
+        cola = ColaIngesta()
+        cola.directorio = directory or app.config.get('INGESTA_DIRECTORIO') \
+            or os.path.join(app.instance_path, 'spool_solicitudes')
+        if not os.path.isdir(cola.directorio):
+            click.echo(f'No existe el directorio {cola.directorio}')
+            return
+        cola.recuperar_huerfanos(antiguedad=0)
+        cola.volcar_pendientes()
+        estadisticas = cola.estadisticas()
+        click.echo(f"✅ {estadisticas['insertadas']} solicitudes insertadas, "
+                   f"{estadisticas['rechazadas']} rechazadas, "
+                   f"{estadisticas['segmentos_volcados']} segmentos volcados "
+                   f"({estadisticas['duplicados_evitados']} ya guardadas antes)")
+
+    @app.cli.command('logs-archive')
+    @click.option('--days', type=int, default=None, help='Días de retención (por defecto LOG_RETENCION_DIAS)')
+    def logs_archive(days):
+        """Archiva en zstd los logs más antiguos que el periodo de retención"""
+        from app.retencion_logs import archivar_logs
+
+        archivadas = archivar_logs(
+            app.config['LOG_DIRECTORIO_ARCHIVO'],
+            dias=days if days is not None else app.config['LOG_RETENCION_DIAS'],
+            lote=app.config['LOG_ARCHIVO_LOTE'],
+            pausa=app.config['LOG_ARCHIVO_PAUSA'],
+        )
+        from app.models import log_sistema
+
+        total = sum(archivadas.values())
+        for mes, cantidad in sorted(archivadas.items()):
+            click.echo(f'{mes}: {cantidad} registros archivados')
+        if total:
+            log_sistema('sistema', f'Logs archivados: {total} registros en {len(archivadas)} meses')
+        click.echo(f'✅ {total} registros movidos al archivo')
+
+    @app.cli.command('logs-read')
+    @click.argument('mes', required=False)
+    @click.option('--tipo', default=None, help='Filtrar por tipo de evento')
+    def logs_read(mes, tipo):
+        """Muestra en NDJSON los logs archivados de un mes (AAAA-MM)"""
+        from app.retencion_logs import leer_archivo_logs, meses_archivados
+
+        directorio = app.config['LOG_DIRECTORIO_ARCHIVO']
+        if mes is None:
+            for disponible in meses_archivados(directorio):
+                click.echo(disponible)
+            return
+        for registro in leer_archivo_logs(directorio, mes, tipo):
+            click.echo(json.dumps(registro, ensure_ascii=False))
@@ -0,0 +1,242 @@
+import os
+import json
+import glob
+import time
+import uuid
+import atexit
+import threading
+from datetime import datetime, timezone
+
+_ABIERTO = '.abierto'
+_SELLADO = '.jsonl'
+_PROCESANDO = '.procesando'
+
+class ColaIngesta:
+    """Cola duradera en disco para las solicitudes de /api/solicitud.
+
+    Cada solicitud validada se añade como una línea JSON al segmento
+    abierto del proceso (fichero de solo anexado, con fsync antes de
+    responder). Un hilo sella el segmento cada `intervalo` segundos (o al
+    llegar a `tamano_segmento` bytes) y vuelca los segmentos sellados de
+    cualquier worker en solicitudes, uno por transacción.
+
+    Estados de un segmento (por nombre de fichero):
+      <pid>-<token>-<n>.abierto            recibiendo solicitudes
+      <pid>-<token>-<n>.jsonl              sellado, pendiente de volcar
+      <pid>-<token>-<n>.jsonl.<pid>.procesando  reclamado por un worker
+
+    Recuperación: los segmentos abiertos de otro proceso o reclamados que
+    no cambian en `antiguedad_huerfanos` segundos pertenecen a un proceso
+    caído y vuelven a quedar pendientes. Cada segmento se registra en la
+    tabla importaciones en la misma transacción que sus filas, así que
+    volcarlo dos veces no duplica solicitudes.
+    """
+
+    def __init__(self):
+        self.habilitada = False
+        self.directorio = None
+        self.intervalo = 0.5
+        self.tamano_segmento = 1024 * 1024
+        self.fsync = True
+        self.antiguedad_huerfanos = 60.0
+        self._pid = None
+        self._token = None
+        self._hilo = None
+        self._detener = None
+        self._lock = threading.Lock()
+        self._segmento = None
+        self._ruta_segmento = None
+        self._bytes_segmento = 0
+        self._secuencia = 0
+        self._stats = {
+            'encoladas': 0,
+            'insertadas': 0,
+            'rechazadas': 0,
+            'segmentos_volcados': 0,
+            'segmentos_recuperados': 0,
+            'duplicados_evitados': 0,
+            'errores': 0,
+        }
+
+    def configurar(self, directorio, intervalo=None, tamano_segmento=None, fsync=None,
+                   antiguedad_huerfanos=None):
+        self.directorio = directorio
+        for nombre, valor in [('intervalo', intervalo), ('tamano_segmento', tamano_segmento),
+                              ('fsync', fsync), ('antiguedad_huerfanos', antiguedad_huerfanos)]:
+            if valor is not None:
+                setattr(self, nombre, valor)
+        os.makedirs(self.directorio, exist_ok=True)
+        self.habilitada = True
+        self._asegurar_hilo()
+
+    def _asegurar_hilo(self):
+        # Tras un fork el hilo y el segmento abierto son del proceso padre
+        if self._pid == os.getpid() and self._hilo is not None and self._hilo.is_alive():
+            return
+        if self._pid != os.getpid():
+            self._lock = threading.Lock()
+        with self._lock:
+            if self._pid != os.getpid() or self._hilo is None or not self._hilo.is_alive():
+                self._pid = os.getpid()
+                self._token = uuid.uuid4().hex[:8]
+                self._segmento = None
+                self._bytes_segmento = 0
+                self._detener = threading.Event()
+                self._hilo = threading.Thread(target=self._bucle, name='cola-ingesta', daemon=True)
+                self._hilo.start()
+
+    # ===== RECEPCIÓN =====
+    def encolar(self, datos):
+        """Guarda la solicitud en el spool; al volver ya es duradera"""
+        self._asegurar_hilo()
+        # La fecha se fija al recibirla (UTC, como CURRENT_TIMESTAMP)
+        registro = dict(datos, fecha=datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'))
+        linea = (json.dumps(registro, ensure_ascii=False) + '\n').encode('utf-8')
+
+        with self._lock:
+            if self._segmento is None:
+                self._secuencia += 1
+                self._ruta_segmento = os.path.join(
+                    self.directorio, f'{self._pid}-{self._token}-{self._secuencia:08d}{_ABIERTO}')
+                self._segmento = open(self._ruta_segmento, 'ab')
+                self._bytes_segmento = 0
+            self._segmento.write(linea)
+            self._segmento.flush()
+            if self.fsync:
+                os.fsync(self._segmento.fileno())
+            self._bytes_segmento += len(linea)
+            self._stats['encoladas'] += 1
+            if self._bytes_segmento >= self.tamano_segmento:
+                self._sellar()
+
+    def _sellar(self):
+        # Con self._lock tomado: el segmento deja de recibir y pasa a pendiente
+        if self._segmento is None:
+            return
+        self._segmento.close()
+        os.replace(self._ruta_segmento, self._ruta_segmento[:-len(_ABIERTO)] + _SELLADO)
+        self._segmento = None
+        self._bytes_segmento = 0
+
+    # ===== VOLCADO =====
+    def _bucle(self):
+        detener = self._detener
+        self.recuperar_huerfanos()
+        while not detener.wait(self.intervalo):
+            self._ciclo()
+        # Apagado ordenado: volcar lo recibido hasta ahora
+        self._ciclo()
+
+    def _ciclo(self):
+        try:
+            with self._lock:
+                self._sellar()
+            self.recuperar_huerfanos()
+            self.volcar_pendientes()
+        except Exception:
+            # Los segmentos siguen en disco: se reintenta en el siguiente ciclo
+            self._stats['errores'] += 1
+
+    def volcar_pendientes(self):
+        """Vuelca en solicitudes los segmentos sellados de todos los workers"""
+        from app.models import guardar_solicitudes_encoladas, reiniciar_importacion
+
+        for ruta in sorted(glob.glob(os.path.join(self.directorio, '*' + _SELLADO))):
+            # El renombrado es atómico: solo un worker reclama cada segmento
+            reclamado = f'{ruta}.{os.getpid()}{_PROCESANDO}'
+            try:
+                os.replace(ruta, reclamado)
+                # El renombrado conserva la fecha: se marca el momento del
+                # reclamo para que nadie lo tome por huérfano
+                os.utime(reclamado)
+            except OSError:
+                continue
+
+            registros = []
+            with open(reclamado, encoding='utf-8') as f:
+                for linea in f:
+                    try:
+                        registros.append(json.loads(linea))
+                    except ValueError:
+                        continue  # línea truncada: nunca se confirmó al cliente
+
+            clave = f'spool:{os.path.basename(ruta)}'
+            try:
+                resultado = guardar_solicitudes_encoladas(registros, clave)
+            except Exception:
+                os.replace(reclamado, ruta)
+                raise
+            if resultado is None:
+                self._stats['duplicados_evitados'] += len(registros)
+            else:
+                self._stats['insertadas'] += resultado[0]
+                self._stats['rechazadas'] += resultado[1]
+            os.remove(reclamado)
+            # Sin el fichero el punto de control ya no hace falta
+            reiniciar_importacion(clave)
+            self._stats['segmentos_volcados'] += 1
+
+    def recuperar_huerfanos(self, antiguedad=None):
+        """Devuelve a pendientes los segmentos de procesos caídos"""
+        antiguedad = self.antiguedad_huerfanos if antiguedad is None else antiguedad
+        propio = f'{os.sep}{self._pid}-{self._token}-'
+        limite = time.time() - antiguedad
+        for ruta in glob.glob(os.path.join(self.directorio, '*' + _ABIERTO)) + \
+                glob.glob(os.path.join(self.directorio, '*' + _PROCESANDO)):
+            if propio in ruta:
+                continue
+            try:
+                if os.path.getmtime(ruta) > limite:
+                    continue
+                if ruta.endswith(_ABIERTO):
+                    destino = ruta[:-len(_ABIERTO)] + _SELLADO
+                else:
+                    destino = ruta[:ruta.index(_SELLADO) + len(_SELLADO)]
+                os.replace(ruta, destino)
+            except OSError:
+                continue
+            self._stats['segmentos_recuperados'] += 1
+
+    def vaciar(self):
+        """Sella el segmento propio y vuelca lo pendiente en este hilo"""
+        with self._lock:
+            self._sellar()
+        self.volcar_pendientes()
+
+    def detener(self, timeout=10.0):
+        """Vuelca lo pendiente y termina el hilo (apagado del worker o salida)"""
+        self.habilitada = False
+        if self._pid != os.getpid() or self._hilo is None or not self._hilo.is_alive():
+            return
+        self._detener.set()
+        self._hilo.join(timeout)
+
+    def estadisticas(self):
+        pendientes = bytes_pendientes = 0
+        mas_antiguo = None
+        if self.directorio and os.path.isdir(self.directorio):
+            for entrada in os.scandir(self.directorio):
+                if not entrada.name.endswith((_ABIERTO, _SELLADO, _PROCESANDO)):
+                    continue
+                info = entrada.stat()
+                pendientes += 1
+                bytes_pendientes += info.st_size
+                mas_antiguo = info.st_mtime if mas_antiguo is None else min(mas_antiguo, info.st_mtime)
+        return dict(self._stats, habilitada=self.habilitada,
+                    segmentos_pendientes=pendientes, bytes_pendientes=bytes_pendientes,
+                    antiguedad_segundos=round(time.time() - mas_antiguo, 1) if mas_antiguo else 0.0)
+
+cola_ingesta = ColaIngesta()
+atexit.register(cola_ingesta.detener)
+
+def init_app(app):
+    """Activa la recepción de solicitudes a través del spool según la configuración"""
+    if not app.config.get('INGESTA_SPOOL'):
+        return
+    cola_ingesta.configurar(
+        app.config.get('INGESTA_DIRECTORIO') or os.path.join(app.instance_path, 'spool_solicitudes'),
+        intervalo=app.config['INGESTA_INTERVALO'],
+        tamano_segmento=app.config['INGESTA_TAMANO_SEGMENTO'],
+        fsync=app.config['INGESTA_FSYNC'],
+        antiguedad_huerfanos=app.config['INGESTA_ANTIGUEDAD_HUERFANOS'],
+    )
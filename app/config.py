@@ -10,6 +10,94 @@ class Config:
     
     # Configuración de base de datos
     DATABASE_PATH = os.environ.get('DATABASE_URL', 'sqlite:///sessvision.db')
+    # Pragmas adicionales/sobrescritos para cada conexión del pool (ver app/db.py)
+    SQLITE_PRAGMAS = {}
+    
+    # Aplicar al arrancar las migraciones pendientes (si no, flask db-upgrade)
+    MIGRACIONES_AUTOMATICAS = os.environ.get('MIGRACIONES_AUTOMATICAS', '1') == '1'
+    
+    # Presupuesto de arranque de un worker (flask startup-profile)
+    ARRANQUE_PRESUPUESTO_MS = int(os.environ.get('ARRANQUE_PRESUPUESTO_MS', 500))
+    
+    # Recepción de /api/solicitud a través de un spool en disco (ver
+    # app/cola_ingesta.py): responde sin esperar al bloqueo de SQLite
+    INGESTA_SPOOL = os.environ.get('INGESTA_SPOOL', '0') == '1'
+    INGESTA_DIRECTORIO = None        # por defecto instance/spool_solicitudes
+    INGESTA_INTERVALO = 0.5          # segundos entre volcados
+    INGESTA_TAMANO_SEGMENTO = 1024 * 1024
+    INGESTA_FSYNC = True
+    INGESTA_ANTIGUEDAD_HUERFANOS = 60  # segundos sin cambios de un segmento de un proceso caído
+    
+    # Reenvíos de /api/solicitud (Idempotency-Key o hash del contenido)
+    IDEMPOTENCIA_TTL = 86400               # segundos que se recuerda cada clave
+    IDEMPOTENCIA_INTERVALO_PURGA = 300     # segundos entre purgas de claves expiradas
+    
+    # Páginas públicas renderizadas una vez por worker (ver app/cache_paginas.py)
+    CACHE_PAGINAS = True
+    CACHE_PAGINAS_PRECALENTAR = True       # renderizarlas al arrancar
+    
+    # Plantillas Jinja compiladas una vez (ver app/plantillas.py)
+    PLANTILLAS_CACHE_BYTECODE = True
+    PLANTILLAS_DIRECTORIO_BYTECODE = None  # por defecto instance/jinja_bytecode
+    PLANTILLAS_CALENTAR = os.environ.get('PLANTILLAS_CALENTAR', '1') == '1'  # gunicorn post_worker_init
+    
+    # Fragmentos renderizados: tarjetas de solicitudes, navegación y pie (ver app/cache_fragmentos.py)
+    FRAGMENTOS_CACHE = True
+    FRAGMENTOS_MAX_BYTES = 16 * 1024 * 1024  # por worker; LRU al superarlo
+    
+    # Cache-Control por tipo de ruta (ver app/cache_http.py)
+    CACHE_CONTROL = {
+        'publica': 'public, max-age=300',
+        'estaticos': 'public, max-age=3600',
+        'estaticos_versionados': 'public, max-age=31536000, immutable',
+        'api_admin': 'private, no-cache',
+        'admin': 'private, no-store',
+        'api': 'no-store',
+    }
+    
+    # Envío de estáticos (ver app/envio_ficheros.py):
+    # sendfile | python | x-sendfile | x-accel-redirect
+    ESTATICOS_ENVIO = os.environ.get('ESTATICOS_ENVIO', 'sendfile')
+    ESTATICOS_X_ACCEL_PREFIJO = '/_estaticos/'  # location internal de nginx
+    # flask_compress lo registra envio_ficheros.init_app (no comprime ficheros)
+    COMPRESS_REGISTER = False
+    
+    # Limitación de peticiones (ver app/limite_peticiones.py): por endpoint,
+    # reglas (ámbito, capacidad, segundos para rellenar la cubeta)
+    LIMITES_HABILITADOS = True
+    LIMITES_DB = None                      # por defecto instance/limites_peticiones.db
+    LIMITES_PETICIONES = {
+        'main.crear_solicitud': [('ip', 5, 60)],
+        'main.admin_login': [('ip', 20, 300), ('usuario', 5, 300)],
+        'main.admin_register': [('ip', 5, 3600)],
+    }
+    
+    # Proxies inversos de confianza delante de la aplicación (nginx): con N > 0
+    # la IP del cliente sale de X-Forwarded-For (ProxyFix). Necesario para
+    # que los límites por IP no compartan una sola cubeta, la del proxy
+    PROXIES_CONFIANZA = int(os.environ.get('PROXIES_CONFIANZA', '0'))
+    
+    # Escritura asíncrona de logs_sistema (ver app/escritor_logs.py)
+    LOG_ASINCRONO = True
+    LOG_COLA_CAPACIDAD = 10000
+    LOG_INTERVALO_FLUSH = 0.5      # segundos entre commits agrupados
+    LOG_LOTE = 500                 # eventos máximos por commit
+    LOG_DESBORDAMIENTO = os.environ.get('LOG_DESBORDAMIENTO', 'bloquear')  # bloquear | descartar | volcar
+    LOG_DIRECTORIO_VOLCADO = None  # por defecto instance/logs_pendientes
+    
+    # Retención de logs_sistema (flask logs-archive)
+    LOG_RETENCION_DIAS = 90
+    LOG_ARCHIVO_LOTE = 1000
+    LOG_ARCHIVO_PAUSA = 0.05       # segundos entre lotes para no bloquear escrituras
+    LOG_DIRECTORIO_ARCHIVO = os.path.join(os.path.dirname(__file__), '..', 'instance', 'archivo_logs')
+    
+    # Paginación del listado de solicitudes
+    SOLICITUDES_POR_PAGINA = 25
+    SOLICITUDES_MAX_POR_PAGINA = 100
+    SOLICITUDES_MAX_ACCION_MASIVA = 500
+    
+    # Exportación en streaming (filas leídas por consulta)
+    EXPORTACION_LOTE = 1000
     
     # Configuración de seguridad
     SESSION_COOKIE_SECURE = False  # Cambiar a True en producción con HTTPS
@@ -22,6 +110,8 @@ class ProductionConfig(Config):
     TESTING = False
     PREFERRED_URL_SCHEME = 'https'
     SESSION_COOKIE_SECURE = True
+    # Sin comprobar en cada render si las plantillas han cambiado
+    TEMPLATES_AUTO_RELOAD = False
 
 class DevelopmentConfig(Config):
     """Configuración para desarrollo"""
@@ -32,6 +122,10 @@ class TestingConfig(Config):
     """Configuración para testing"""
     TESTING = True
     DATABASE_PATH = 'sqlite:///:memory:'
+    LOG_ASINCRONO = False
+    INGESTA_SPOOL = False
+    LIMITES_HABILITADOS = False
+    PLANTILLAS_CACHE_BYTECODE = False
 
 # Configuración por defecto
 config = {
@@ -0,0 +1,220 @@
+import os
+import pathlib
+import sqlite3
+import threading
+import atexit
+from contextlib import contextmanager
+from flask import g, has_app_context
+
+# Pragmas aplicados una sola vez al abrir cada conexión
+PRAGMAS_POR_DEFECTO = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -16000,       # en KiB (≈16 MB por conexión)
+    'mmap_size': 134217728,     # 128 MB
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000,       # ms
+}
+
+# Pragmas que escriben en la base de datos: no se aplican en las
+# conexiones de solo lectura (el modo WAL lo fija la conexión de escritura)
+PRAGMAS_SOLO_ESCRITURA = ('journal_mode',)
+
+def get_db_path():
+    return os.path.join(os.path.dirname(__file__), '..', 'instance', 'sessvision.db')
+
+class PoolConexiones:
+    """Mantiene una conexión SQLite reutilizable por hilo y por proceso.
+
+    Las conexiones heredadas tras un fork (workers de gunicorn) se descartan
+    sin cerrarlas, ya que pertenecen al proceso padre.
+
+    Con `solo_lectura` las conexiones se abren con mode=ro y query_only:
+    cualquier escritura falla con sqlite3.OperationalError. Un pool de
+    lectura sigue la ruta de su `origen` y se cierra con él.
+    """
+
+    def __init__(self, pragmas=None, solo_lectura=False, origen=None):
+        self.pragmas = dict(PRAGMAS_POR_DEFECTO)
+        if pragmas:
+            self.pragmas.update(pragmas)
+        self.solo_lectura = solo_lectura
+        self.origen = origen
+        self._derivados = []
+        if origen is not None:
+            origen._derivados.append(self)
+        self.ruta = None  # None: usar get_db_path()
+        self._reiniciar_estado()
+        self._stats = {
+            'conexiones_creadas': 0,
+            'reutilizaciones': 0,
+            'conexiones_cerradas': 0,
+            'forks_detectados': 0,
+        }
+
+    def _reiniciar_estado(self):
+        self._pid = os.getpid()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._conexiones = {}
+
+    def _verificar_fork(self):
+        if os.getpid() != self._pid:
+            self._reiniciar_estado()
+            self._stats['forks_detectados'] += 1
+
+    def _ruta(self):
+        if self.origen is not None:
+            return self.origen._ruta()
+        return self.ruta or get_db_path()
+
+    def _abrir(self):
+        db_path = self._ruta()
+        # check_same_thread=False solo para poder cerrarlas al salir;
+        # cada conexión se usa exclusivamente desde su propio hilo
+        if self.solo_lectura:
+            uri = pathlib.Path(db_path).resolve().as_uri() + '?mode=ro'
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            pragmas = {nombre: valor for nombre, valor in self.pragmas.items()
+                       if nombre not in PRAGMAS_SOLO_ESCRITURA}
+            pragmas['query_only'] = 'ON'
+        else:
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+            conn = sqlite3.connect(db_path, check_same_thread=False)
+            pragmas = self.pragmas
+        for nombre, valor in pragmas.items():
+            conn.execute(f'PRAGMA {nombre} = {valor}')
+        return conn
+
+    def _purgar_hilos_terminados(self):
+        vivos = {hilo.ident for hilo in threading.enumerate()}
+        for ident in list(self._conexiones):
+            if ident not in vivos:
+                self._cerrar(self._conexiones.pop(ident))
+
+    def _cerrar(self, conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        self._stats['conexiones_cerradas'] += 1
+
+    def obtener(self):
+        """Devuelve la conexión del hilo actual, abriéndola si no existe"""
+        self._verificar_fork()
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            # += no es atómico: sin el cerrojo se pierden incrementos entre hilos
+            with self._lock:
+                self._stats['reutilizaciones'] += 1
+            return conn
+
+        conn = self._abrir()
+        with self._lock:
+            self._purgar_hilos_terminados()
+            self._conexiones[threading.get_ident()] = conn
+            self._stats['conexiones_creadas'] += 1
+        self._local.conn = conn
+        return conn
+
+    def cerrar_todas(self):
+        """Cierra todas las conexiones abiertas por este proceso"""
+        self._verificar_fork()
+        with self._lock:
+            for conn in self._conexiones.values():
+                self._cerrar(conn)
+            self._conexiones.clear()
+        self._local = threading.local()
+        for derivado in self._derivados:
+            derivado.cerrar_todas()
+
+    def cambiar_ruta(self, ruta):
+        """Apunta el pool a otro fichero (herramientas y diagnóstico)"""
+        self.cerrar_todas()
+        self.ruta = ruta
+
+    def estadisticas(self):
+        with self._lock:
+            abiertas = len(self._conexiones)
+        return dict(self._stats, conexiones_abiertas=abiertas, pid=self._pid,
+                    pragmas=dict(self.pragmas), solo_lectura=self.solo_lectura)
+
+pool = PoolConexiones()
+# Consultas del panel e informes: no compiten con la ingesta por el
+# bloqueo de escritura y se pueden escalar sin añadir contención
+pool_lectura = PoolConexiones(solo_lectura=True, origen=pool)
+atexit.register(pool.cerrar_todas)
+
+def obtener_conexion():
+    """Conexión reutilizable del hilo actual"""
+    conn = pool.obtener()
+    if has_app_context():
+        g._sqlite_conn = conn
+    return conn
+
+def obtener_conexion_lectura():
+    """Conexión de solo lectura del hilo actual (escribir con ella es un error)"""
+    conn = pool_lectura.obtener()
+    if has_app_context():
+        g._sqlite_conn_lectura = conn
+    return conn
+
+@contextmanager
+def instantanea():
+    """Lecturas consistentes: todas las consultas del bloque ven la misma
+    versión de la base de datos (snapshot WAL), aunque haya escrituras
+    concurrentes. Los resultados deben consumirse dentro del bloque.
+    """
+    conn = obtener_conexion_lectura()
+    if conn.in_transaction:
+        # Anidada: se comparte la instantánea exterior
+        yield conn
+        return
+    conn.execute('BEGIN')
+    try:
+        # La instantánea se fija con la primera lectura, no con BEGIN
+        conn.execute('SELECT 1 FROM sqlite_master LIMIT 1').fetchall()
+        yield conn
+    finally:
+        conn.rollback()
+
+@contextmanager
+def transaccion(inmediata=False):
+    """Ejecuta un bloque en una transacción: commit al salir, rollback si falla.
+    
+    Con `inmediata=True` el bloqueo de escritura se toma al empezar
+    (BEGIN IMMEDIATE), útil para leer y escribir de forma consistente.
+    """
+    conn = obtener_conexion()
+    if inmediata:
+        conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+def estadisticas_pool():
+    return pool.estadisticas()
+
+def estadisticas_pool_lectura():
+    return pool_lectura.estadisticas()
+
+def _finalizar_contexto(exception=None):
+    # La conexión se conserva para el siguiente request; solo se descarta
+    # cualquier transacción que haya quedado abierta
+    for nombre in ('_sqlite_conn', '_sqlite_conn_lectura'):
+        conn = g.pop(nombre, None)
+        try:
+            if conn is not None and conn.in_transaction:
+                conn.rollback()
+        except sqlite3.ProgrammingError:
+            # Conexión ya cerrada (p. ej. tras pool.cambiar_ruta)
+            pass
+
+def init_app(app):
+    """Configura los pools con los pragmas de la aplicación"""
+    pool.pragmas.update(app.config.get('SQLITE_PRAGMAS', {}))
+    pool_lectura.pragmas.update(app.config.get('SQLITE_PRAGMAS', {}))
+    app.teardown_appcontext(_finalizar_contexto)
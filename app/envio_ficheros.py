@@ -0,0 +1,101 @@
+"""Envío de los ficheros estáticos sin copiarlos por el worker.
+
+Modos (ESTATICOS_ENVIO):
+
+- 'sendfile' (por defecto): el fichero va envuelto en wsgi.file_wrapper y
+  gunicorn lo envía con sendfile(2), del disco al socket sin pasar por
+  Python. Las peticiones Range (206) también: Werkzeug recorta el fichero
+  con un iterador propio que gunicorn tendría que copiar por bloques, así
+  que se vuelven a envolver con el fichero ya posicionado en el rango.
+- 'python': el worker lee y escribe el fichero por bloques (referencia
+  para benchmarks/envio_estaticos.py).
+- 'x-accel-redirect': el worker solo responde con la cabecera y nginx
+  sirve el fichero (rangos y validadores incluidos) desde una location
+  interna:
+
+      location /_estaticos/ {
+          internal;
+          alias /ruta/a/app/static/;
+          gzip_static on;       # variantes .gz de flask assets-build
+          brotli_static on;     # variantes .br (módulo ngx_brotli)
+      }
+
+- 'x-sendfile': igual, con la cabecera X-Sendfile (Apache mod_xsendfile,
+  lighttpd) y la variante precomprimida elegida por la aplicación.
+
+flask_compress no comprime estas respuestas: comprimir al vuelo obliga a
+leer el fichero entero en el worker y rompe Content-Range en las 206.
+"""
+import os
+import mimetypes
+from urllib.parse import quote
+from flask import current_app, request, send_from_directory, abort
+from werkzeug.security import safe_join
+from werkzeug.wsgi import ClosingIterator
+
+MODOS = ('sendfile', 'python', 'x-sendfile', 'x-accel-redirect')
+
+_stats = {'sendfile': 0, 'rangos': 0, 'python': 0, 'delegados': 0}
+
+def _rango_por_sendfile(respuesta, ruta):
+    envoltorio = request.environ.get('wsgi.file_wrapper')
+    rango = respuesta.content_range
+    if envoltorio is None or rango is None or rango.start is None:
+        return respuesta
+    fichero = open(ruta, 'rb')
+    fichero.seek(rango.start)
+    # gunicorn envía Content-Length bytes desde la posición actual
+    respuesta.response = envoltorio(fichero)
+    _stats['rangos'] += 1
+    return respuesta
+
+def _delegar(directorio, nombre, mimetype):
+    ruta = safe_join(directorio, nombre)
+    if ruta is None or not os.path.isfile(ruta):
+        abort(404)
+    respuesta = current_app.response_class(
+        mimetype=mimetype or mimetypes.guess_type(nombre)[0] or 'application/octet-stream')
+    respuesta.headers['X-Accel-Redirect'] = current_app.config['ESTATICOS_X_ACCEL_PREFIJO'] + quote(nombre)
+    return respuesta
+
+def enviar_fichero(directorio, nombre, mimetype=None):
+    """Responde con directorio/nombre según el modo de ESTATICOS_ENVIO"""
+    modo = current_app.config['ESTATICOS_ENVIO']
+    if modo == 'x-accel-redirect':
+        respuesta = _delegar(directorio, nombre, mimetype)
+    elif modo == 'x-sendfile':
+        # USE_X_SENDFILE (init_app); rangos y validadores los resuelve el servidor
+        respuesta = send_from_directory(directorio, nombre, mimetype=mimetype, conditional=False, etag=False)
+    else:
+        respuesta = send_from_directory(directorio, nombre, mimetype=mimetype)
+        if modo == 'python':
+            # Fuera del file_wrapper el servidor itera el fichero por bloques
+            respuesta.response = ClosingIterator(respuesta.response)
+        elif respuesta.status_code == 206:
+            respuesta = _rango_por_sendfile(respuesta, safe_join(directorio, nombre))
+        respuesta.comprimir_al_vuelo = respuesta.status_code != 206
+        _stats['sendfile' if modo == 'sendfile' else 'python'] += 1
+        return respuesta
+    respuesta.comprimir_al_vuelo = False
+    _stats['delegados'] += 1
+    return respuesta
+
+def estadisticas():
+    return dict(_stats, modo=current_app.config['ESTATICOS_ENVIO'])
+
+def init_app(app, compress):
+    """Valida el modo y registra la compresión al vuelo de flask_compress.
+
+    Debe llamarse en lugar del registro automático de Compress
+    (COMPRESS_REGISTER = False), en el mismo punto del arranque.
+    """
+    modo = app.config['ESTATICOS_ENVIO']
+    if modo not in MODOS:
+        raise ValueError(f'ESTATICOS_ENVIO no válido: {modo} (opciones: {", ".join(MODOS)})')
+    app.config['USE_X_SENDFILE'] = modo == 'x-sendfile'
+
+    @app.after_request
+    def comprimir(response):
+        if not getattr(response, 'comprimir_al_vuelo', True):
+            return response
+        return compress.after_request(response)
@@ -0,0 +1,301 @@
+import os
+import json
+import glob
+import queue
+import atexit
+import threading
+import time
+from datetime import datetime, timezone
+from app.db import transaccion
+
+POLITICAS_DESBORDAMIENTO = ('bloquear', 'descartar', 'volcar')
+
+_FIN = object()
+
+# Segundos sin avance tras los que un fichero .procesando se da por abandonado
+CADUCIDAD_PROCESANDO = 600
+
+def _proceso_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # existe, de otro usuario
+    return True
+
+class EscritorLogs:
+    """Escritor en segundo plano para logs_sistema con commit agrupado.
+
+    Los eventos se encolan en memoria (cola acotada) y un hilo los inserta
+    en una sola transacción cada `intervalo` segundos o cada `lote` eventos.
+    Si la cola se llena se aplica la política de desbordamiento:
+    'bloquear' (espera hasta `espera_maxima`), 'descartar' o 'volcar' a
+    ficheros JSONL que se reinsertan cuando la cola vuelve a tener hueco.
+
+    Cada proceso vuelca en su logs-<pid>.jsonl.escribiendo y lo publica
+    (renombrado a logs-<pid>-<n>.jsonl) cuando va a recuperar; los de
+    procesos muertos los publica cualquier worker. Solo los publicados se
+    reclaman, así que nadie lee un fichero en el que aún se escribe.
+    """
+
+    def __init__(self):
+        self.habilitado = False
+        self.capacidad = 10000
+        self.intervalo = 0.5
+        self.lote = 500
+        self.desbordamiento = 'bloquear'
+        self.espera_maxima = 1.0
+        self.directorio_volcado = None
+        self._pid = None
+        self._hilo = None
+        self._cola = None
+        self._lock = threading.Lock()
+        self._stats = {
+            'encolados': 0,
+            'escritos': 0,
+            'lotes': 0,
+            'descartados': 0,
+            'volcados': 0,
+            'recuperados': 0,
+            'errores': 0,
+        }
+
+    def configurar(self, capacidad=None, intervalo=None, lote=None, desbordamiento=None,
+                   espera_maxima=None, directorio_volcado=None):
+        if desbordamiento is not None and desbordamiento not in POLITICAS_DESBORDAMIENTO:
+            raise ValueError(f'Política de desbordamiento no válida: {desbordamiento}')
+        for nombre, valor in [('capacidad', capacidad), ('intervalo', intervalo), ('lote', lote),
+                              ('desbordamiento', desbordamiento), ('espera_maxima', espera_maxima),
+                              ('directorio_volcado', directorio_volcado)]:
+            if valor is not None:
+                setattr(self, nombre, valor)
+        self.habilitado = True
+
+    def _asegurar_hilo(self):
+        # Tras un fork el hilo del proceso padre no existe: se crea otro
+        if self._pid == os.getpid() and self._hilo is not None and self._hilo.is_alive():
+            return
+        with self._lock:
+            if self._pid != os.getpid() or self._hilo is None or not self._hilo.is_alive():
+                self._pid = os.getpid()
+                self._cola = queue.Queue(maxsize=self.capacidad)
+                self._hilo = threading.Thread(target=self._bucle, name='escritor-logs', daemon=True)
+                self._hilo.start()
+
+    def encolar(self, tipo, mensaje, usuario=None):
+        """Añade un evento a la cola; devuelve False si se descartó"""
+        self._asegurar_hilo()
+        # La fecha se fija al encolar para conservar el momento del evento
+        fecha = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        evento = (tipo, mensaje, usuario, fecha)
+
+        try:
+            if self.desbordamiento == 'bloquear':
+                self._cola.put(evento, timeout=self.espera_maxima)
+            else:
+                self._cola.put_nowait(evento)
+        except queue.Full:
+            if self.desbordamiento == 'volcar' and self.directorio_volcado:
+                self._volcar([evento])
+                return True
+            self._stats['descartados'] += 1
+            return False
+
+        self._stats['encolados'] += 1
+        return True
+
+    def _bucle(self):
+        cola = self._cola
+        terminar = False
+        while not terminar:
+            pendientes = []
+            avisos = []
+            try:
+                primero = cola.get(timeout=self.intervalo)
+            except queue.Empty:
+                self._recuperar_volcados()
+                continue
+
+            # Agrupar hasta completar el lote o agotar el intervalo
+            limite = time.monotonic() + self.intervalo
+            elemento = primero
+            while True:
+                if elemento is _FIN:
+                    terminar = True
+                elif isinstance(elemento, threading.Event):
+                    avisos.append(elemento)
+                else:
+                    pendientes.append(elemento)
+
+                if terminar or avisos or len(pendientes) >= self.lote:
+                    break
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    elemento = cola.get(timeout=restante)
+                except queue.Empty:
+                    break
+
+            # Tras vaciar o detener, recoger lo que quede sin esperar
+            if terminar or avisos:
+                while True:
+                    try:
+                        elemento = cola.get_nowait()
+                    except queue.Empty:
+                        break
+                    if isinstance(elemento, threading.Event):
+                        avisos.append(elemento)
+                    elif elemento is not _FIN:
+                        pendientes.append(elemento)
+
+            self._escribir(pendientes)
+            if cola.qsize() < self.capacidad // 2:
+                self._recuperar_volcados()
+            for aviso in avisos:
+                aviso.set()
+
+    def _escribir(self, eventos):
+        if not eventos:
+            return
+        try:
+            with transaccion() as conn:
+                conn.executemany('''
+                    INSERT INTO logs_sistema (tipo, mensaje, usuario, fecha)
+                    VALUES (?, ?, ?, ?)
+                ''', eventos)
+        except Exception:
+            self._stats['errores'] += 1
+            if self.directorio_volcado:
+                # Conservar el lote para reintentarlo más tarde
+                self._volcar(eventos)
+            else:
+                self._stats['descartados'] += len(eventos)
+            return
+        self._stats['escritos'] += len(eventos)
+        self._stats['lotes'] += 1
+
+    def _ruta_escritura(self, pid=None):
+        return os.path.join(self.directorio_volcado, f'logs-{pid or os.getpid()}.jsonl.escribiendo')
+
+    def _volcar(self, eventos):
+        # Solo este proceso escribe en su fichero .escribiendo, y nunca lo
+        # reclaman otros mientras vive: no hay escrituras en un fichero ajeno
+        os.makedirs(self.directorio_volcado, exist_ok=True)
+        with self._lock:
+            with open(self._ruta_escritura(), 'a', encoding='utf-8') as f:
+                for evento in eventos:
+                    f.write(json.dumps(evento, ensure_ascii=False) + '\n')
+        self._stats['volcados'] += len(eventos)
+
+    def _publicar(self, ruta, pid):
+        """Renombra un .escribiendo cerrado a logs-<pid>-<n>.jsonl (reclamable)"""
+        try:
+            os.replace(ruta, os.path.join(self.directorio_volcado, f'logs-{pid}-{time.time_ns()}.jsonl'))
+        except FileNotFoundError:
+            pass  # otro worker lo ha publicado antes
+
+    def _publicar_pendientes(self):
+        # El propio, bajo el mismo cerrojo que las escrituras; los de
+        # procesos que ya no existen, sin cerrojo (nadie escribe en ellos)
+        with self._lock:
+            if os.path.exists(self._ruta_escritura()):
+                self._publicar(self._ruta_escritura(), os.getpid())
+        for ruta in glob.glob(os.path.join(self.directorio_volcado, 'logs-*.jsonl.escribiendo')):
+            try:
+                pid = int(os.path.basename(ruta).split('-')[1].split('.')[0])
+            except ValueError:
+                continue
+            if pid != os.getpid() and not _proceso_vivo(pid):
+                self._publicar(ruta, pid)
+
+    def _reclamar(self, ruta):
+        # El renombrado es atómico: solo un worker reclama cada fichero
+        reclamado = os.path.join(self.directorio_volcado,
+                                 f'{os.path.basename(ruta).split(".jsonl")[0]}.jsonl.{os.getpid()}.procesando')
+        try:
+            os.replace(ruta, reclamado)
+        except OSError:
+            return None
+        return reclamado
+
+    def _recuperar_volcados(self):
+        """Reinserta los eventos volcados a disco por cualquier worker"""
+        if not self.directorio_volcado or not os.path.isdir(self.directorio_volcado):
+            return
+        self._publicar_pendientes()
+        reclamables = glob.glob(os.path.join(self.directorio_volcado, 'logs-*.jsonl'))
+        # Reclamados por un worker que cayó a medias: sin avance desde hace
+        # CADUCIDAD_PROCESANDO (el que procesa renueva la fecha en cada lote).
+        # Los eventos ya insertados de ese fichero se repiten
+        limite = time.time() - CADUCIDAD_PROCESANDO
+        for ruta in glob.glob(os.path.join(self.directorio_volcado, 'logs-*.procesando')):
+            try:
+                if os.path.getmtime(ruta) < limite:
+                    reclamables.append(ruta)
+            except OSError:
+                continue
+
+        for ruta in reclamables:
+            reclamado = self._reclamar(ruta)
+            if reclamado is None:
+                continue
+            with open(reclamado, encoding='utf-8') as f:
+                eventos = []
+                for linea in f:
+                    try:
+                        eventos.append(tuple(json.loads(linea)))
+                    except ValueError:
+                        continue  # línea truncada por una caída
+                    if len(eventos) >= self.lote:
+                        self._escribir(eventos)
+                        self._stats['recuperados'] += len(eventos)
+                        eventos = []
+                        os.utime(reclamado)
+                self._escribir(eventos)
+                self._stats['recuperados'] += len(eventos)
+            os.remove(reclamado)
+
+    def vaciar(self, timeout=5.0):
+        """Espera a que se escriban los eventos encolados hasta ahora"""
+        if self._pid != os.getpid() or self._hilo is None or not self._hilo.is_alive():
+            return True
+        aviso = threading.Event()
+        try:
+            self._cola.put(aviso, timeout=timeout)
+        except queue.Full:
+            return False
+        return aviso.wait(timeout)
+
+    def detener(self, timeout=5.0):
+        """Escribe lo pendiente y termina el hilo (apagado del worker o salida)"""
+        self.habilitado = False
+        if self._pid != os.getpid() or self._hilo is None or not self._hilo.is_alive():
+            return
+        try:
+            self._cola.put(_FIN, timeout=timeout)
+        except queue.Full:
+            return
+        self._hilo.join(timeout)
+
+    def estadisticas(self):
+        en_cola = self._cola.qsize() if self._cola is not None and self._pid == os.getpid() else 0
+        return dict(self._stats, en_cola=en_cola, habilitado=self.habilitado,
+                    desbordamiento=self.desbordamiento, capacidad=self.capacidad)
+
+escritor = EscritorLogs()
+atexit.register(escritor.detener)
+
+def init_app(app):
+    """Activa la escritura asíncrona de logs según la configuración"""
+    if not app.config.get('LOG_ASINCRONO'):
+        return
+    escritor.configurar(
+        capacidad=app.config['LOG_COLA_CAPACIDAD'],
+        intervalo=app.config['LOG_INTERVALO_FLUSH'],
+        lote=app.config['LOG_LOTE'],
+        desbordamiento=app.config['LOG_DESBORDAMIENTO'],
+        directorio_volcado=app.config.get('LOG_DIRECTORIO_VOLCADO')
+            or os.path.join(app.instance_path, 'logs_pendientes'),
+    )
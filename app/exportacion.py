@@ -0,0 +1,83 @@
+"""Exportación en streaming de solicitudes y logs a CSV o NDJSON.
+
+Las filas llegan por lotes desde models (paginación por id, sin mantener
+una lectura abierta entre lotes) y se serializan en bloques de bytes que
+se pueden comprimir al vuelo con gzip o zstd. La memoria usada depende
+del tamaño del lote, no del número de filas.
+"""
+import csv
+import io
+import json
+import zlib
+
+try:
+    from compression import zstd  # Python 3.14+
+except ImportError:
+    try:
+        from backports import zstd
+    except ImportError:
+        zstd = None
+
+FORMATOS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+COMPRESIONES = {
+    'gzip': ('application/gzip', 'gz'),
+    'zstd': ('application/zstd', 'zst'),
+}
+
+def compresiones_disponibles():
+    return [nombre for nombre in COMPRESIONES if nombre != 'zstd' or zstd is not None]
+
+def _csv(columnas, lotes):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM para que Excel detecte UTF-8
+    buffer.write('\ufeff')
+    writer.writerow(columnas)
+    for filas in lotes:
+        writer.writerows(filas)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+def _ndjson(columnas, lotes):
+    for filas in lotes:
+        yield ''.join(
+            json.dumps(dict(zip(columnas, fila)), ensure_ascii=False) + '\n' for fila in filas
+        ).encode('utf-8')
+
+def _comprimir(bloques, compresion):
+    if compresion == 'gzip':
+        compresor = zlib.compressobj(6, zlib.DEFLATED, 31)  # 31: cabecera gzip
+    else:
+        compresor = zstd.ZstdCompressor(level=3)
+    for bloque in bloques:
+        salida = compresor.compress(bloque)
+        if salida:
+            yield salida
+    yield compresor.flush()
+
+def generar_exportacion(columnas, lotes, formato='csv', compresion=None):
+    """Generador de bytes con las filas de `lotes` (iterable de listas de tuplas)"""
+    if formato not in FORMATOS:
+        raise ValueError(f'Formato no válido: {formato}')
+    if compresion is not None and compresion not in compresiones_disponibles():
+        raise ValueError(f'Compresión no válida: {compresion}')
+
+    bloques = _csv(columnas, lotes) if formato == 'csv' else _ndjson(columnas, lotes)
+    if compresion:
+        bloques = _comprimir(bloques, compresion)
+    return bloques
+
+def tipo_y_extension(formato, compresion=None):
+    """(mimetype, extensión) del fichero resultante"""
+    mimetype, extension = FORMATOS[formato]
+    if compresion:
+        mimetype, sufijo = COMPRESIONES[compresion]
+        extension = f'{extension}.{sufijo}'
+    return mimetype, extension
@@ -0,0 +1,91 @@
+"""Claves de idempotencia de /api/solicitud.
+
+La clave viene en la cabecera Idempotency-Key o, si falta, se deriva del
+contenido del formulario: un reenvío idéntico dentro del periodo de
+vigencia devuelve la solicitud original sin escribir nada. Cada clave se
+guarda con la huella del contenido con que se usó; reutilizarla con otro
+contenido es un error del cliente (ClaveReutilizada, 422) y no devuelve
+la solicitud original. Las claves expiradas se borran en segundo plano.
+"""
+import os
+import json
+import atexit
+import hashlib
+import threading
+
+CABECERA = 'Idempotency-Key'
+LONGITUD_MAXIMA = 255
+
+class ClaveReutilizada(ValueError):
+    """La clave de idempotencia ya se usó con otro contenido"""
+
+def huella_contenido(datos, campos):
+    """Hash del contenido de los campos indicados"""
+    # Normalizado: espacios y mayúsculas del email no cambian la huella
+    contenido = [str(datos[campo]).strip() for campo in campos]
+    contenido = [valor.lower() if campo == 'email' else valor for campo, valor in zip(campos, contenido)]
+    return hashlib.sha256(json.dumps(contenido, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+def clave_de_peticion(cabecera, datos, campos):
+    """Clave de la petición: la cabecera si viene, si no un hash del contenido.
+
+    Los prefijos separan ambos espacios de claves. ValueError si la
+    cabecera no es válida.
+    """
+    if cabecera:
+        cabecera = cabecera.strip()
+        if not cabecera or len(cabecera) > LONGITUD_MAXIMA or not cabecera.isprintable():
+            raise ValueError(f'La cabecera {CABECERA} no es válida')
+        return f'h:{cabecera}'
+    return f'c:{huella_contenido(datos, campos)}'
+
+class PurgadorClaves:
+    """Hilo que borra periódicamente las claves expiradas"""
+
+    def __init__(self):
+        self.intervalo = 300.0
+        self._pid = None
+        self._hilo = None
+        self._detener = None
+        self._stats = {'purgadas': 0, 'ejecuciones': 0, 'errores': 0}
+
+    def iniciar(self, intervalo=None):
+        if intervalo is not None:
+            self.intervalo = intervalo
+        # Tras un fork el hilo del proceso padre no existe: se crea otro
+        if self._pid == os.getpid() and self._hilo is not None and self._hilo.is_alive():
+            return
+        self._pid = os.getpid()
+        self._detener = threading.Event()
+        self._hilo = threading.Thread(target=self._bucle, name='purga-idempotencia', daemon=True)
+        self._hilo.start()
+
+    def _bucle(self):
+        from app.models import purgar_claves_idempotencia
+
+        detener = self._detener
+        while not detener.wait(self.intervalo):
+            try:
+                self._stats['purgadas'] += purgar_claves_idempotencia()
+                self._stats['ejecuciones'] += 1
+            except Exception:
+                # Base de datos ocupada: se reintenta en el siguiente ciclo
+                self._stats['errores'] += 1
+
+    def detener(self, timeout=5.0):
+        if self._pid != os.getpid() or self._hilo is None or not self._hilo.is_alive():
+            return
+        self._detener.set()
+        self._hilo.join(timeout)
+
+    def estadisticas(self):
+        return dict(self._stats, intervalo=self.intervalo)
+
+purgador = PurgadorClaves()
+atexit.register(purgador.detener)
+
+def init_app(app):
+    """Arranca la purga de claves expiradas"""
+    if app.testing:
+        return
+    purgador.iniciar(app.config['IDEMPOTENCIA_INTERVALO_PURGA'])
@@ -0,0 +1,54 @@
+"""Lectura en streaming de ficheros CSV o JSONL para la importación masiva.
+
+Los registros se producen de uno en uno (diccionarios) para que
+models.importar_solicitudes los procese por lotes sin cargar el fichero
+completo. Los ficheros .gz se descomprimen al vuelo.
+"""
+import csv
+import gzip
+import json
+import os
+
+FORMATOS = ('csv', 'jsonl')
+
+def detectar_formato(ruta):
+    nombre = ruta[:-3] if ruta.endswith('.gz') else ruta
+    extension = os.path.splitext(nombre)[1].lower()
+    if extension == '.csv':
+        return 'csv'
+    if extension in ('.jsonl', '.ndjson', '.json'):
+        return 'jsonl'
+    raise ValueError(f'No se puede deducir el formato de {ruta}; indique csv o jsonl')
+
+def clave_importacion(ruta):
+    """Identifica el fichero (ruta, tamaño y fecha) para el punto de control"""
+    info = os.stat(ruta)
+    return f'{os.path.abspath(ruta)}:{info.st_size}:{int(info.st_mtime)}'
+
+def _abrir(ruta):
+    # utf-8-sig acepta ficheros con y sin BOM (p. ej. exportados desde Excel)
+    if ruta.endswith('.gz'):
+        return gzip.open(ruta, 'rt', encoding='utf-8-sig', newline='')
+    return open(ruta, encoding='utf-8-sig', newline='')
+
+def leer_registros(ruta, formato=None):
+    """Itera los registros del fichero como diccionarios.
+
+    Las líneas JSON no válidas se entregan como texto para que la
+    importación las cuente como rechazadas sin perder la numeración.
+    """
+    formato = formato or detectar_formato(ruta)
+    if formato not in FORMATOS:
+        raise ValueError(f'Formato no válido: {formato}')
+
+    with _abrir(ruta) as f:
+        if formato == 'csv':
+            yield from csv.DictReader(f)
+            return
+        for linea in f:
+            if not linea.strip():
+                continue
+            try:
+                yield json.loads(linea)
+            except ValueError:
+                yield linea
@@ -0,0 +1,135 @@
+"""Limitación de peticiones por cubetas de fichas (token bucket).
+
+El estado se comparte entre los workers de gunicorn del mismo servidor en
+un fichero SQLite propio (no compite con el bloqueo de escritura de la
+base de datos principal). Cada comprobación es una sola sentencia UPSERT
+... RETURNING que rellena la cubeta según el tiempo transcurrido y
+consume una ficha si la hay, de forma atómica.
+
+Los límites de cada endpoint se definen en LIMITES_PETICIONES:
+    {'main.admin_login': [('ip', 10, 60), ('usuario', 5, 300)]}
+cada regla es (ámbito, capacidad, segundos para rellenar la cubeta).
+El ámbito 'ip' usa request.remote_addr: detrás de un proxy hay que fijar
+PROXIES_CONFIANZA para que sea la del cliente y no la del proxy.
+"""
+import os
+import math
+import time
+import atexit
+from functools import wraps
+from flask import current_app, request, jsonify, flash, render_template
+from app.db import PoolConexiones
+
+# Métodos que nunca se limitan: mostrar el formulario no cuesta nada
+METODOS_LIBRES = ('GET', 'HEAD', 'OPTIONS')
+
+_SQL_CONSUMIR = '''
+    INSERT INTO cubetas (clave, fichas, actualizado, permitido)
+    VALUES (:clave, :capacidad - 1, :ahora, 1)
+    ON CONFLICT (clave) DO UPDATE SET
+        fichas = min(:capacidad, fichas + (:ahora - actualizado) * :ritmo)
+                 - (min(:capacidad, fichas + (:ahora - actualizado) * :ritmo) >= 1),
+        permitido = min(:capacidad, fichas + (:ahora - actualizado) * :ritmo) >= 1,
+        actualizado = :ahora
+    RETURNING permitido, fichas
+'''
+
+# Sin actividad durante un día cualquier cubeta está llena: se puede borrar
+_SQL_PURGAR = 'DELETE FROM cubetas WHERE actualizado < ?'
+_PURGA_CADA = 1000
+
+pool_limites = PoolConexiones(pragmas={
+    # El estado es desechable: no hace falta sincronizar con el disco
+    'synchronous': 'OFF',
+    'cache_size': -2000,
+    'mmap_size': 0,
+})
+atexit.register(pool_limites.cerrar_todas)
+
+_comprobaciones = {'total': 0, 'rechazadas': 0}
+
+def consumir(clave, capacidad, periodo):
+    """Consume una ficha de la cubeta `clave`.
+
+    Devuelve 0 si la petición está permitida o los segundos que faltan
+    para que haya una ficha disponible.
+    """
+    ritmo = capacidad / periodo
+    conn = pool_limites.obtener()
+    ahora = time.time()
+    permitido, fichas = conn.execute(_SQL_CONSUMIR, {
+        'clave': clave, 'capacidad': capacidad, 'ritmo': ritmo, 'ahora': ahora,
+    }).fetchone()
+    _comprobaciones['total'] += 1
+    if _comprobaciones['total'] % _PURGA_CADA == 0:
+        conn.execute(_SQL_PURGAR, (ahora - 86400,))
+    conn.commit()
+    if permitido:
+        return 0
+    _comprobaciones['rechazadas'] += 1
+    return (1 - fichas) / ritmo
+
+def _valor_ambito(ambito):
+    if ambito == 'ip':
+        return request.remote_addr or 'desconocida'
+    if ambito == 'usuario':
+        datos = request.form if request.form else (request.get_json(silent=True) or {})
+        usuario = str(datos.get('username') or '').strip().lower()
+        return usuario or None
+    raise ValueError(f'Ámbito de límite no válido: {ambito}')
+
+def comprobar_limites(endpoint):
+    """Aplica las reglas del endpoint; devuelve los segundos de espera (0 si se permite)"""
+    espera = 0
+    for ambito, capacidad, periodo in current_app.config['LIMITES_PETICIONES'].get(endpoint, ()):
+        valor = _valor_ambito(ambito)
+        if valor is None:
+            continue
+        espera = max(espera, consumir(f'{endpoint}:{ambito}:{valor}', capacidad, periodo))
+    return espera
+
+def limitar_peticiones(plantilla=None):
+    """Decorador: responde 429 con Retry-After si se supera algún límite del endpoint.
+
+    Las peticiones JSON o de /api/ reciben el error en JSON; las de
+    formularios vuelven a mostrar `plantilla` con el mensaje.
+    """
+    def decorador(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not current_app.config.get('LIMITES_HABILITADOS') or request.method in METODOS_LIBRES:
+                return f(*args, **kwargs)
+
+            espera = comprobar_limites(request.endpoint)
+            if not espera:
+                return f(*args, **kwargs)
+
+            segundos = max(1, math.ceil(espera))
+            mensaje = f'Demasiados intentos. Intente de nuevo en {segundos} segundos.'
+            if plantilla is not None and not request.is_json and not request.path.startswith('/api/'):
+                flash(mensaje, 'error')
+                respuesta = current_app.make_response((render_template(plantilla), 429))
+            else:
+                respuesta = current_app.make_response((jsonify({'error': mensaje}), 429))
+            respuesta.headers['Retry-After'] = str(segundos)
+            return respuesta
+        return decorated_function
+    return decorador
+
+def estadisticas():
+    return dict(_comprobaciones, pool=pool_limites.estadisticas())
+
+def init_app(app):
+    """Apunta el estado compartido al fichero configurado y crea la tabla"""
+    pool_limites.cambiar_ruta(app.config.get('LIMITES_DB')
+                              or os.path.join(app.instance_path, 'limites_peticiones.db'))
+    conn = pool_limites.obtener()
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS cubetas (
+            clave TEXT PRIMARY KEY,
+            fichas REAL NOT NULL,
+            actualizado REAL NOT NULL,
+            permitido INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    conn.commit()
@@ -0,0 +1,485 @@
+"""Migraciones versionadas del esquema SQLite.
+
+Cada migración tiene un número de versión, un nombre y una lista de pasos
+que se ejecutan en orden. Un paso es:
+
+- una sentencia SQL, que se ejecuta en su propia transacción (BEGIN
+  IMMEDIATE), de modo que el bloqueo de escritura se libera entre pasos;
+- una función sin argumentos que gestiona sus propias transacciones (su
+  docstring es la descripción que muestra el modo de prueba).
+
+La versión aplicada se guarda en schema_version. Los pasos deben ser
+idempotentes: una migración interrumpida se repite completa y dos workers
+que arranquen a la vez pueden ejecutarla en paralelo sin efectos dobles.
+
+El SQL de cada paso se escribe aquí literal, sin tomarlo de models: una
+migración ya publicada debe ejecutar siempre lo mismo aunque el esquema
+actual cambie después.
+"""
+import sqlite3
+import time
+from app.db import obtener_conexion, transaccion
+from app import models
+
+def en_lotes(tabla, sql, lote=5000, pausa=0.01):
+    """Paso que ejecuta `sql` por rangos de id (:desde, :hasta] de `tabla`.
+
+    Cada rango se confirma por separado, así que un relleno de millones de
+    filas no retiene el bloqueo de escritura más que lo que tarda un lote.
+    """
+    def paso():
+        hasta_final = obtener_conexion().execute(f'SELECT COALESCE(MAX(id), 0) FROM {tabla}').fetchone()[0]
+        desde = 0
+        while desde < hasta_final:
+            with transaccion(inmediata=True) as conn:
+                conn.execute(sql, {'desde': desde, 'hasta': desde + lote})
+            desde += lote
+            time.sleep(pausa)
+    paso.__doc__ = f'En lotes de {lote} filas de {tabla}: {" ".join(sql.split())}'
+    return paso
+
+# ===== PASOS CON LÓGICA =====
+def _columnas_administradores():
+    """Añade a administradores las columnas que faltan en bases antiguas (rol, activo, fecha_creacion, ultimo_login)"""
+    columnas = {
+        'rol': "TEXT DEFAULT 'admin'",
+        'activo': 'BOOLEAN DEFAULT 1',
+        # ALTER TABLE no admite DEFAULT CURRENT_TIMESTAMP en columnas nuevas
+        'fecha_creacion': 'TIMESTAMP NULL',
+        'ultimo_login': 'TIMESTAMP NULL',
+    }
+    with transaccion(inmediata=True) as conn:
+        existentes = {fila[1] for fila in conn.execute('PRAGMA table_info(administradores)')}
+        for columna, definicion in columnas.items():
+            if columna not in existentes:
+                conn.execute(f'ALTER TABLE administradores ADD COLUMN {columna} {definicion}')
+
+def _columna_version_solicitudes():
+    """Añade a solicitudes la columna version (la incrementa cada UPDATE; clave de la caché de fragmentos)"""
+    with transaccion(inmediata=True) as conn:
+        existentes = {fila[1] for fila in conn.execute('PRAGMA table_info(solicitudes)')}
+        if 'version' not in existentes:
+            # Con un DEFAULT constante SQLite no reescribe la tabla
+            conn.execute('ALTER TABLE solicitudes ADD COLUMN version INTEGER NOT NULL DEFAULT 1')
+
+# Triggers de estadisticas_solicitudes que mantienen también la versión
+# (migración 10), como (nombre, sentencia)
+_TRIGGERS_ESTADISTICAS_VERSIONADOS = [
+    ('trg_estadisticas_insert', '''CREATE TRIGGER IF NOT EXISTS trg_estadisticas_insert AFTER INSERT ON solicitudes BEGIN
+        INSERT INTO estadisticas_solicitudes (categoria, clave, cantidad, version)
+        VALUES ('total', '', 1, (SELECT COALESCE(MAX(version), 0) + 1 FROM estadisticas_solicitudes))
+        ON CONFLICT (categoria, clave) DO UPDATE
+        SET cantidad = cantidad + excluded.cantidad, version = excluded.version;
+        INSERT INTO estadisticas_solicitudes (categoria, clave, cantidad, version)
+        VALUES ('no_leidas', '', (NEW.leido IS 0), (SELECT COALESCE(MAX(version), 0) + 1 FROM estadisticas_solicitudes))
+        ON CONFLICT (categoria, clave) DO UPDATE
+        SET cantidad = cantidad + excluded.cantidad, version = excluded.version;
+        INSERT INTO estadisticas_solicitudes (categoria, clave, cantidad, version)
+        VALUES ('estado', COALESCE(NEW.estado, ''), 1, (SELECT COALESCE(MAX(version), 0) + 1 FROM estadisticas_solicitudes))
+        ON CONFLICT (categoria, clave) DO UPDATE
+        SET cantidad = cantidad + excluded.cantidad, version = excluded.version;
+        INSERT INTO estadisticas_solicitudes (categoria, clave, cantidad, version)
+        VALUES ('servicio', COALESCE(NEW.servicio, ''), 1, (SELECT COALESCE(MAX(version), 0) + 1 FROM estadisticas_solicitudes))
+        ON CONFLICT (categoria, clave) DO UPDATE
+        SET cantidad = cantidad + excluded.cantidad, version = excluded.version;
+        INSERT INTO estadisticas_solicitudes (categoria, clave, cantidad, version)
+        VALUES ('dia', COALESCE(DATE(NEW.fecha), ''), 1, (SELECT COALESCE(MAX(version), 0) + 1 FROM estadisticas_solicitudes))
+        ON CONFLICT (categoria, clave) DO UPDATE
+        SET cantidad = cantidad + excluded.cantidad, version = excluded.version;
+    END'''),
+    ('trg_estadisticas_delete', '''CREATE TRIGGER IF NOT EXISTS trg_estadisticas_delete AFTER DELETE ON solicitudes BEGIN
+        INSERT INTO estadisticas_solicitudes (categoria, clave, cantidad, version)
+        VALUES ('total', '', -1, (SELECT COALESCE(MAX(version), 0) + 1 FROM estadisticas_solicitudes))
+        ON CONFLICT (categoria, clave) DO UPDATE
+        SET cantidad = cantidad + excluded.cantidad, version = excluded.version;
+        INSERT INTO estadisticas_solicitudes (categoria, clave, cantidad, version)
+        VALUES ('no_leidas', '', -(OLD.leido IS 0), (SELECT COALESCE(MAX(version), 0) + 1 FROM estadisticas_solicitudes))
+        ON CONFLICT (categoria, clave) DO UPDATE
+        SET cantidad = cantidad + excluded.cantidad, version = excluded.version;
+        INSERT INTO estadisticas_solicitudes (categoria, clave, cantidad, version)
+        VALUES ('estado', COALESCE(OLD.estado, ''), -1, (SELECT COALESCE(MAX(version), 0) + 1 FROM estadisticas_solicitudes))
+        ON CONFLICT (categoria, clave) DO UPDATE
+        SET cantidad = cantidad + excluded.cantidad, version = excluded.version;
+        INSERT INTO estadisticas_solicitudes (categoria, clave, cantidad, version)
+        VALUES ('servicio', COALESCE(OLD.servicio, ''), -1, (SELECT COALESCE(MAX(version), 0) + 1 FROM estadisticas_solicitudes))
+        ON CONFLICT (categoria, clave) DO UPDATE
+        SET cantidad = cantidad + excluded.cantidad, version = excluded.version;
+        INSERT INTO estadisticas_solicitudes (categoria, clave, cantidad, version)
+        VALUES ('dia', COALESCE(DATE(OLD.fecha), ''), -1, (SELECT COALESCE(MAX(version), 0) + 1 FROM estadisticas_solicitudes))
+        ON CONFLICT (categoria, clave) DO UPDATE
+        SET cantidad = cantidad + excluded.cantidad, version = excluded.version;
+    END'''),
+    ('trg_estadisticas_leido', '''CREATE TRIGGER IF NOT EXISTS trg_estadisticas_leido AFTER UPDATE OF leido ON solicitudes
+        WHEN (OLD.leido IS 0) IS NOT (NEW.leido IS 0) BEGIN
+        INSERT INTO estadisticas_solicitudes (categoria, clave, cantidad, version)
+        VALUES ('no_leidas', '', (NEW.leido IS 0) - (OLD.leido IS 0), (SELECT COALESCE(MAX(version), 0) + 1 FROM estadisticas_solicitudes))
+        ON CONFLICT (categoria, clave) DO UPDATE
+        SET cantidad = cantidad + excluded.cantidad, version = excluded.version;
+    END'''),
+    ('trg_estadisticas_estado', '''CREATE TRIGGER IF NOT EXISTS trg_estadisticas_estado
+        AFTER UPDATE OF estado ON solicitudes WHEN COALESCE(OLD.estado, '') IS NOT COALESCE(NEW.estado, '') BEGIN
+        INSERT INTO estadisticas_solicitudes (categoria, clave, cantidad, version)
+        VALUES ('estado', COALESCE(OLD.estado, ''), -1, (SELECT COALESCE(MAX(version), 0) + 1 FROM estadisticas_solicitudes))
+        ON CONFLICT (categoria, clave) DO UPDATE
+        SET cantidad = cantidad + excluded.cantidad, version = excluded.version;
+        INSERT INTO estadisticas_solicitudes (categoria, clave, cantidad, version)
+        VALUES ('estado', COALESCE(NEW.estado, ''), 1, (SELECT COALESCE(MAX(version), 0) + 1 FROM estadisticas_solicitudes))
+        ON CONFLICT (categoria, clave) DO UPDATE
+        SET cantidad = cantidad + excluded.cantidad, version = excluded.version;
+    END'''),
+    ('trg_estadisticas_servicio', '''CREATE TRIGGER IF NOT EXISTS trg_estadisticas_servicio
+        AFTER UPDATE OF servicio ON solicitudes WHEN COALESCE(OLD.servicio, '') IS NOT COALESCE(NEW.servicio, '') BEGIN
+        INSERT INTO estadisticas_solicitudes (categoria, clave, cantidad, version)
+        VALUES ('servicio', COALESCE(OLD.servicio, ''), -1, (SELECT COALESCE(MAX(version), 0) + 1 FROM estadisticas_solicitudes))
+        ON CONFLICT (categoria, clave) DO UPDATE
+        SET cantidad = cantidad + excluded.cantidad, version = excluded.version;
+        INSERT INTO estadisticas_solicitudes (categoria, clave, cantidad, version)
+        VALUES ('servicio', COALESCE(NEW.servicio, ''), 1, (SELECT COALESCE(MAX(version), 0) + 1 FROM estadisticas_solicitudes))
+        ON CONFLICT (categoria, clave) DO UPDATE
+        SET cantidad = cantidad + excluded.cantidad, version = excluded.version;
+    END'''),
+    ('trg_estadisticas_dia', '''CREATE TRIGGER IF NOT EXISTS trg_estadisticas_dia
+        AFTER UPDATE OF fecha ON solicitudes WHEN COALESCE(DATE(OLD.fecha), '') IS NOT COALESCE(DATE(NEW.fecha), '') BEGIN
+        INSERT INTO estadisticas_solicitudes (categoria, clave, cantidad, version)
+        VALUES ('dia', COALESCE(DATE(OLD.fecha), ''), -1, (SELECT COALESCE(MAX(version), 0) + 1 FROM estadisticas_solicitudes))
+        ON CONFLICT (categoria, clave) DO UPDATE
+        SET cantidad = cantidad + excluded.cantidad, version = excluded.version;
+        INSERT INTO estadisticas_solicitudes (categoria, clave, cantidad, version)
+        VALUES ('dia', COALESCE(DATE(NEW.fecha), ''), 1, (SELECT COALESCE(MAX(version), 0) + 1 FROM estadisticas_solicitudes))
+        ON CONFLICT (categoria, clave) DO UPDATE
+        SET cantidad = cantidad + excluded.cantidad, version = excluded.version;
+    END'''),
+]
+
+def _versionar_estadisticas():
+    """Añade a estadisticas_solicitudes la columna version y rehace sus triggers para que la mantengan"""
+    with transaccion(inmediata=True) as conn:
+        existentes = {fila[1] for fila in conn.execute('PRAGMA table_info(estadisticas_solicitudes)')}
+        if 'version' not in existentes:
+            conn.execute('ALTER TABLE estadisticas_solicitudes ADD COLUMN version INTEGER NOT NULL DEFAULT 0')
+        # En la misma transacción: ninguna escritura queda sin contar
+        for nombre, sentencia in _TRIGGERS_ESTADISTICAS_VERSIONADOS:
+            conn.execute(f'DROP TRIGGER IF EXISTS {nombre}')
+            conn.execute(sentencia)
+
+def _huella_claves_idempotencia():
+    """Añade a claves_idempotencia la huella del contenido con que se usó cada clave"""
+    with transaccion(inmediata=True) as conn:
+        existentes = {fila[1] for fila in conn.execute('PRAGMA table_info(claves_idempotencia)')}
+        if 'huella' not in existentes:
+            # Las claves ya guardadas quedan sin huella y no se comprueban
+            conn.execute('ALTER TABLE claves_idempotencia ADD COLUMN huella TEXT')
+
+def _poblar_estadisticas():
+    """Calcula los contadores a partir de las solicitudes existentes si aún no hay ninguno"""
+    with transaccion(inmediata=True) as conn:
+        if conn.execute("SELECT 1 FROM estadisticas_solicitudes WHERE categoria = 'total'").fetchone():
+            return
+        conn.execute('''
+            INSERT INTO estadisticas_solicitudes (categoria, clave, cantidad)
+            SELECT 'total', '', COUNT(*) FROM solicitudes
+            UNION ALL SELECT 'no_leidas', '', COUNT(*) FROM solicitudes WHERE leido = 0
+            UNION ALL SELECT 'estado', COALESCE(estado, ''), COUNT(*) FROM solicitudes GROUP BY 2
+            UNION ALL SELECT 'servicio', COALESCE(servicio, ''), COUNT(*) FROM solicitudes GROUP BY 2
+            UNION ALL SELECT 'dia', COALESCE(DATE(fecha), ''), COUNT(*) FROM solicitudes GROUP BY 2
+        ''')
+
+def _crear_indice_busqueda():
+    """Crea la tabla FTS5 solicitudes_fts con sus triggers y la llena si es nueva"""
+    with transaccion(inmediata=True) as conn:
+        existia = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'solicitudes_fts'").fetchone()
+        # Tabla de contenido externo: el índice no duplica el texto
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS solicitudes_fts USING fts5(
+                nombre, email, telefono, mensaje, notas,
+                content='solicitudes', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2',
+                prefix='2 3'
+            )
+        ''')
+        conn.execute('''CREATE TRIGGER IF NOT EXISTS trg_busqueda_insert AFTER INSERT ON solicitudes BEGIN
+            INSERT INTO solicitudes_fts (rowid, nombre, email, telefono, mensaje, notas)
+            VALUES (NEW.id, NEW.nombre, NEW.email, NEW.telefono, NEW.mensaje, NEW.notas);
+        END''')
+        conn.execute('''CREATE TRIGGER IF NOT EXISTS trg_busqueda_delete AFTER DELETE ON solicitudes BEGIN
+            INSERT INTO solicitudes_fts (solicitudes_fts, rowid, nombre, email, telefono, mensaje, notas)
+            VALUES ('delete', OLD.id, OLD.nombre, OLD.email, OLD.telefono, OLD.mensaje, OLD.notas);
+        END''')
+        conn.execute('''CREATE TRIGGER IF NOT EXISTS trg_busqueda_update
+            AFTER UPDATE OF nombre, email, telefono, mensaje, notas ON solicitudes BEGIN
+            INSERT INTO solicitudes_fts (solicitudes_fts, rowid, nombre, email, telefono, mensaje, notas)
+            VALUES ('delete', OLD.id, OLD.nombre, OLD.email, OLD.telefono, OLD.mensaje, OLD.notas);
+            INSERT INTO solicitudes_fts (rowid, nombre, email, telefono, mensaje, notas)
+            VALUES (NEW.id, NEW.nombre, NEW.email, NEW.telefono, NEW.mensaje, NEW.notas);
+        END''')
+    if not existia:
+        with transaccion(inmediata=True) as conn:
+            conn.execute("INSERT INTO solicitudes_fts (solicitudes_fts) VALUES ('rebuild')")
+            conn.execute("INSERT INTO solicitudes_fts (solicitudes_fts) VALUES ('optimize')")
+
+# ===== MIGRACIONES =====
+MIGRACIONES = [
+    (1, 'esquema_inicial', [
+        '''CREATE TABLE IF NOT EXISTS solicitudes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nombre TEXT NOT NULL,
+            email TEXT NOT NULL,
+            telefono TEXT NOT NULL,
+            servicio TEXT NOT NULL,
+            mensaje TEXT NOT NULL,
+            fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            leido BOOLEAN DEFAULT 0,
+            prioridad INTEGER DEFAULT 1,
+            estado TEXT DEFAULT 'pendiente',
+            notas TEXT DEFAULT '',
+            fecha_contacto TIMESTAMP NULL,
+            fecha_cierre TIMESTAMP NULL
+        )''',
+        '''CREATE TABLE IF NOT EXISTS administradores (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            nombre TEXT NOT NULL,
+            email TEXT NOT NULL,
+            rol TEXT DEFAULT 'admin',
+            activo BOOLEAN DEFAULT 1,
+            fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            ultimo_login TIMESTAMP NULL
+        )''',
+        '''CREATE TABLE IF NOT EXISTS logs_sistema (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tipo TEXT NOT NULL,
+            mensaje TEXT NOT NULL,
+            usuario TEXT,
+            fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''',
+    ]),
+    # Antes en migrate_db.py
+    (2, 'columnas_administradores', [_columnas_administradores]),
+    # Un paso (y una transacción) por índice
+    (3, 'indices', [
+        # Filtros del panel (estado+servicio) ordenados por fecha
+        'CREATE INDEX IF NOT EXISTS idx_solicitudes_estado_servicio_fecha ON solicitudes (estado, servicio, fecha)',
+        # Filtro solo por estado: evita ordenar en memoria todas las filas del estado
+        'CREATE INDEX IF NOT EXISTS idx_solicitudes_estado_fecha ON solicitudes (estado, fecha)',
+        # Filtro solo por servicio y GROUP BY servicio
+        'CREATE INDEX IF NOT EXISTS idx_solicitudes_servicio_fecha ON solicitudes (servicio, fecha)',
+        # Listado sin filtros y rango de los últimos días
+        'CREATE INDEX IF NOT EXISTS idx_solicitudes_fecha ON solicitudes (fecha)',
+        # Parcial: solo filas sin leer (contador de no leídas)
+        'CREATE INDEX IF NOT EXISTS idx_solicitudes_no_leidas ON solicitudes (fecha) WHERE leido = 0',
+        # Ordenaciones prioridad_desc y nombre_asc
+        'CREATE INDEX IF NOT EXISTS idx_solicitudes_prioridad_fecha ON solicitudes (prioridad, fecha)',
+        'CREATE INDEX IF NOT EXISTS idx_solicitudes_nombre ON solicitudes (nombre)',
+        # Comprobación de email duplicado al registrar y listado de administradores
+        'CREATE INDEX IF NOT EXISTS idx_administradores_email ON administradores (email)',
+        'CREATE INDEX IF NOT EXISTS idx_administradores_fecha_creacion ON administradores (fecha_creacion)',
+        # Consultas de logs por tipo y por antigüedad
+        'CREATE INDEX IF NOT EXISTS idx_logs_tipo_fecha ON logs_sistema (tipo, fecha)',
+        'CREATE INDEX IF NOT EXISTS idx_logs_fecha ON logs_sistema (fecha)',
+    ]),
+    (4, 'estadisticas_solicitudes', [
+        '''CREATE TABLE IF NOT EXISTS estadisticas_solicitudes (
+            categoria TEXT NOT NULL,
+            clave TEXT NOT NULL DEFAULT '',
+            cantidad INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (categoria, clave)
+        ) WITHOUT ROWID''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_estadisticas_insert AFTER INSERT ON solicitudes BEGIN
+                INSERT INTO estadisticas_solicitudes (categoria, clave, cantidad)
+                VALUES ('total', '', 1)
+                ON CONFLICT (categoria, clave) DO UPDATE SET cantidad = cantidad + excluded.cantidad;
+                INSERT INTO estadisticas_solicitudes (categoria, clave, cantidad)
+                VALUES ('no_leidas', '', (NEW.leido IS 0))
+                ON CONFLICT (categoria, clave) DO UPDATE SET cantidad = cantidad + excluded.cantidad;
+                INSERT INTO estadisticas_solicitudes (categoria, clave, cantidad)
+                VALUES ('estado', COALESCE(NEW.estado, ''), 1)
+                ON CONFLICT (categoria, clave) DO UPDATE SET cantidad = cantidad + excluded.cantidad;
+                INSERT INTO estadisticas_solicitudes (categoria, clave, cantidad)
+                VALUES ('servicio', COALESCE(NEW.servicio, ''), 1)
+                ON CONFLICT (categoria, clave) DO UPDATE SET cantidad = cantidad + excluded.cantidad;
+                INSERT INTO estadisticas_solicitudes (categoria, clave, cantidad)
+                VALUES ('dia', COALESCE(DATE(NEW.fecha), ''), 1)
+                ON CONFLICT (categoria, clave) DO UPDATE SET cantidad = cantidad + excluded.cantidad;
+            END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_estadisticas_delete AFTER DELETE ON solicitudes BEGIN
+                INSERT INTO estadisticas_solicitudes (categoria, clave, cantidad)
+                VALUES ('total', '', -1)
+                ON CONFLICT (categoria, clave) DO UPDATE SET cantidad = cantidad + excluded.cantidad;
+                INSERT INTO estadisticas_solicitudes (categoria, clave, cantidad)
+                VALUES ('no_leidas', '', -(OLD.leido IS 0))
+                ON CONFLICT (categoria, clave) DO UPDATE SET cantidad = cantidad + excluded.cantidad;
+                INSERT INTO estadisticas_solicitudes (categoria, clave, cantidad)
+                VALUES ('estado', COALESCE(OLD.estado, ''), -1)
+                ON CONFLICT (categoria, clave) DO UPDATE SET cantidad = cantidad + excluded.cantidad;
+                INSERT INTO estadisticas_solicitudes (categoria, clave, cantidad)
+                VALUES ('servicio', COALESCE(OLD.servicio, ''), -1)
+                ON CONFLICT (categoria, clave) DO UPDATE SET cantidad = cantidad + excluded.cantidad;
+                INSERT INTO estadisticas_solicitudes (categoria, clave, cantidad)
+                VALUES ('dia', COALESCE(DATE(OLD.fecha), ''), -1)
+                ON CONFLICT (categoria, clave) DO UPDATE SET cantidad = cantidad + excluded.cantidad;
+            END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_estadisticas_leido AFTER UPDATE OF leido ON solicitudes
+            WHEN (OLD.leido IS 0) IS NOT (NEW.leido IS 0) BEGIN
+                INSERT INTO estadisticas_solicitudes (categoria, clave, cantidad)
+                VALUES ('no_leidas', '', (NEW.leido IS 0) - (OLD.leido IS 0))
+                ON CONFLICT (categoria, clave) DO UPDATE SET cantidad = cantidad + excluded.cantidad;
+            END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_estadisticas_estado
+            AFTER UPDATE OF estado ON solicitudes WHEN COALESCE(OLD.estado, '') IS NOT COALESCE(NEW.estado, '') BEGIN
+                INSERT INTO estadisticas_solicitudes (categoria, clave, cantidad)
+                VALUES ('estado', COALESCE(OLD.estado, ''), -1)
+                ON CONFLICT (categoria, clave) DO UPDATE SET cantidad = cantidad + excluded.cantidad;
+                INSERT INTO estadisticas_solicitudes (categoria, clave, cantidad)
+                VALUES ('estado', COALESCE(NEW.estado, ''), 1)
+                ON CONFLICT (categoria, clave) DO UPDATE SET cantidad = cantidad + excluded.cantidad;
+            END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_estadisticas_servicio
+            AFTER UPDATE OF servicio ON solicitudes WHEN COALESCE(OLD.servicio, '') IS NOT COALESCE(NEW.servicio, '') BEGIN
+                INSERT INTO estadisticas_solicitudes (categoria, clave, cantidad)
+                VALUES ('servicio', COALESCE(OLD.servicio, ''), -1)
+                ON CONFLICT (categoria, clave) DO UPDATE SET cantidad = cantidad + excluded.cantidad;
+                INSERT INTO estadisticas_solicitudes (categoria, clave, cantidad)
+                VALUES ('servicio', COALESCE(NEW.servicio, ''), 1)
+                ON CONFLICT (categoria, clave) DO UPDATE SET cantidad = cantidad + excluded.cantidad;
+            END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_estadisticas_dia
+            AFTER UPDATE OF fecha ON solicitudes WHEN COALESCE(DATE(OLD.fecha), '') IS NOT COALESCE(DATE(NEW.fecha), '') BEGIN
+                INSERT INTO estadisticas_solicitudes (categoria, clave, cantidad)
+                VALUES ('dia', COALESCE(DATE(OLD.fecha), ''), -1)
+                ON CONFLICT (categoria, clave) DO UPDATE SET cantidad = cantidad + excluded.cantidad;
+                INSERT INTO estadisticas_solicitudes (categoria, clave, cantidad)
+                VALUES ('dia', COALESCE(DATE(NEW.fecha), ''), 1)
+                ON CONFLICT (categoria, clave) DO UPDATE SET cantidad = cantidad + excluded.cantidad;
+            END''',
+        _poblar_estadisticas,
+    ]),
+    (5, 'busqueda_texto_completo', [_crear_indice_busqueda]),
+    (6, 'importaciones', [
+        '''CREATE TABLE IF NOT EXISTS importaciones (
+            clave TEXT PRIMARY KEY,
+            procesadas INTEGER NOT NULL DEFAULT 0,
+            insertadas INTEGER NOT NULL DEFAULT 0,
+            rechazadas INTEGER NOT NULL DEFAULT 0,
+            completada BOOLEAN NOT NULL DEFAULT 0,
+            actualizado TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''',
+    ]),
+    # Filas insertadas con NULL explícito (versiones antiguas): los
+    # contadores y los filtros del panel esperan los valores por defecto
+    (7, 'valores_por_defecto_solicitudes', [
+        en_lotes('solicitudes', '''
+            UPDATE solicitudes
+            SET leido = COALESCE(leido, 0),
+                prioridad = COALESCE(prioridad, 1),
+                estado = COALESCE(estado, 'pendiente'),
+                notas = COALESCE(notas, '')
+            WHERE id > :desde AND id <= :hasta
+              AND (leido IS NULL OR prioridad IS NULL OR estado IS NULL OR notas IS NULL)
+        '''),
+    ]),
+    # Reintentos del formulario (ver app/idempotencia.py)
+    (8, 'claves_idempotencia', [
+        '''CREATE TABLE IF NOT EXISTS claves_idempotencia (
+            clave TEXT PRIMARY KEY,
+            solicitud_id INTEGER NOT NULL,
+            expira TIMESTAMP NOT NULL
+        ) WITHOUT ROWID''',
+        'CREATE INDEX IF NOT EXISTS idx_claves_idempotencia_expira ON claves_idempotencia (expira)',
+    ]),
+    # Versión de cada fila para la caché de fragmentos (app/cache_fragmentos.py)
+    (9, 'version_solicitudes', [_columna_version_solicitudes]),
+    # Sincronización por versión del dashboard (/api/admin/estadisticas?since=)
+    (10, 'version_estadisticas', [
+        _versionar_estadisticas,
+        'CREATE INDEX IF NOT EXISTS idx_estadisticas_version ON estadisticas_solicitudes (version)',
+    ]),
+    # Reutilización de una clave de idempotencia con otro contenido (422)
+    (11, 'huella_idempotencia', [_huella_claves_idempotencia]),
+]
+
+VERSION_ACTUAL = MIGRACIONES[-1][0]
+
+def version_aplicada():
+    """Versión del esquema registrada en la base de datos (0 si no hay ninguna)"""
+    try:
+        return obtener_conexion().execute('SELECT MAX(version) FROM schema_version').fetchone()[0] or 0
+    except sqlite3.OperationalError:
+        return 0
+
+def migraciones_pendientes():
+    actual = version_aplicada()
+    return [migracion for migracion in MIGRACIONES if migracion[0] > actual]
+
+def describir_paso(paso):
+    if callable(paso):
+        return (paso.__doc__ or paso.__name__).strip()
+    return ' '.join(paso.split())
+
+def migrar(dry_run=False, informar=None):
+    """Aplica en orden las migraciones pendientes.
+
+    Con `dry_run` no se modifica nada: solo se informa de los pasos.
+    `informar(version, nombre, descripcion)` se llama antes de cada paso.
+    Devuelve la lista de (version, nombre) aplicadas o pendientes.
+    """
+    pendientes = migraciones_pendientes()
+    if not dry_run and pendientes:
+        with transaccion() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    nombre TEXT NOT NULL,
+                    aplicada TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    duracion REAL
+                )
+            ''')
+
+    for version, nombre, pasos in pendientes:
+        inicio = time.perf_counter()
+        for paso in pasos:
+            if informar is not None:
+                informar(version, nombre, describir_paso(paso))
+            if dry_run:
+                continue
+            if callable(paso):
+                paso()
+            else:
+                with transaccion(inmediata=True) as conn:
+                    conn.execute(paso)
+        if not dry_run:
+            with transaccion() as conn:
+                conn.execute('''
+                    INSERT OR IGNORE INTO schema_version (version, nombre, duracion) VALUES (?, ?, ?)
+                ''', (version, nombre, time.perf_counter() - inicio))
+
+    if pendientes and not dry_run:
+        models.log_sistema('sistema', f'Esquema actualizado a la versión {VERSION_ACTUAL} '
+                                      f'({", ".join(nombre for _, nombre, _ in pendientes)})')
+    return [(version, nombre) for version, nombre, _ in pendientes]
+
+def init_app(app):
+    """Comprueba la versión del esquema al arrancar.
+
+    Si está al día solo cuesta una consulta. Con MIGRACIONES_AUTOMATICAS
+    se aplican las pendientes; si no, la aplicación responde 503 hasta que
+    se ejecute `flask db-upgrade` (los comandos de flask siguen disponibles).
+    """
+    if version_aplicada() >= VERSION_ACTUAL:
+        return
+    if app.config.get('MIGRACIONES_AUTOMATICAS', True):
+        migrar()
+        return
+
+    app.logger.warning(f'Esquema en la versión {version_aplicada()}, se requiere {VERSION_ACTUAL}: '
+                       f'ejecute "flask db-upgrade"')
+    estado = {'al_dia': False}
+
+    @app.before_request
+    def _esquema_pendiente():
+        if estado['al_dia']:
+            return None
+        if version_aplicada() >= VERSION_ACTUAL:
+            estado['al_dia'] = True
+            return None
+        return 'Base de datos en mantenimiento', 503
@@ -1,313 +1,936 @@
-import sqlite3
-import os
 from datetime import datetime, timedelta
 import json
+import base64
+import binascii
+import re
+import time
+from itertools import islice
+from dataclasses import dataclass
+from typing import Optional
 from werkzeug.security import generate_password_hash, check_password_hash
+from app.db import obtener_conexion, obtener_conexion_lectura, instantanea, transaccion
+from app.escritor_logs import escritor
+from app.cache_fragmentos import invalidar_solicitudes
+from app.idempotencia import ClaveReutilizada
 
-def get_db_path():
-    return os.path.join(os.path.dirname(__file__), '..', 'instance', 'sessvision.db')
+class _FilaCompatible:
+    """Acceso tipo diccionario (fila['campo']) para el código existente"""
+    __slots__ = ()
+    
+    def __getitem__(self, clave):
+        try:
+            return getattr(self, clave)
+        except AttributeError:
+            raise KeyError(clave) from None
+
+@dataclass(slots=True)
+class Solicitud(_FilaCompatible):
+    """Fila de solicitudes; jsonify la serializa como diccionario"""
+    id: int
+    nombre: str
+    email: str
+    telefono: str
+    servicio: str
+    mensaje: str
+    fecha: str
+    leido: bool
+    prioridad: int
+    estado: str
+    notas: Optional[str]
+    fecha_contacto: Optional[str]
+    fecha_cierre: Optional[str]
+    version: int = 1  # se incrementa en cada UPDATE (caché de fragmentos)
+    rango: Optional[float] = None  # solo en búsquedas ordenadas por relevancia
+    
+    @classmethod
+    def desde_fila(cls, row):
+        return cls(row[0], row[1], row[2], row[3], row[4], row[5], row[6], bool(row[7]),
+                   row[8], row[9], row[10], row[11], row[12], row[13])
+
+@dataclass(slots=True)
+class Administrador(_FilaCompatible):
+    """Fila de administradores sin la contraseña"""
+    id: int
+    username: str
+    nombre: str
+    email: str
+    rol: str
+    activo: bool
+    fecha_creacion: str
+    ultimo_login: Optional[str]
+    
+    @classmethod
+    def desde_fila(cls, row):
+        return cls(row[0], row[1], row[2], row[3], row[4], bool(row[5]), row[6], row[7])
 
 def log_sistema(tipo, mensaje, usuario=None):
     """Registra un evento en el log del sistema"""
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        INSERT INTO logs_sistema (tipo, mensaje, usuario)
-        VALUES (?, ?, ?)
-    ''', (tipo, mensaje, usuario))
-    
-    conn.commit()
-    conn.close()
+    # Con el escritor asíncrono activo el evento se agrupa con otros en un
+    # único commit; si no, se inserta directamente
+    if escritor.habilitado:
+        escritor.encolar(tipo, mensaje, usuario)
+        return
+    
+    with transaccion() as conn:
+        conn.execute('''
+            INSERT INTO logs_sistema (tipo, mensaje, usuario)
+            VALUES (?, ?, ?)
+        ''', (tipo, mensaje, usuario))
 
-def init_db():
-    """Inicializa la base de datos con tablas mejoradas"""
-    db_path = get_db_path()
-    os.makedirs(os.path.dirname(db_path), exist_ok=True)
-    
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    # Tabla de solicitudes mejorada
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS solicitudes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nombre TEXT NOT NULL,
-            email TEXT NOT NULL,
-            telefono TEXT NOT NULL,
-            servicio TEXT NOT NULL,
-            mensaje TEXT NOT NULL,
-            fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            leido BOOLEAN DEFAULT 0,
-            prioridad INTEGER DEFAULT 1,
-            estado TEXT DEFAULT 'pendiente',
-            notas TEXT DEFAULT '',
-            fecha_contacto TIMESTAMP NULL,
-            fecha_cierre TIMESTAMP NULL
-        )
-    ''')
-    
-    # Tabla de administradores mejorada
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS administradores (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            nombre TEXT NOT NULL,
-            email TEXT NOT NULL,
-            rol TEXT DEFAULT 'admin',
-            activo BOOLEAN DEFAULT 1,
-            fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            ultimo_login TIMESTAMP NULL
-        )
-    ''')
-    
-    # Tabla de logs del sistema
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS logs_sistema (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            tipo TEXT NOT NULL,
-            mensaje TEXT NOT NULL,
-            usuario TEXT,
-            fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # NO crear administrador por defecto
-    conn.commit()
-    conn.close()
-    
-    log_sistema('sistema', 'Base de datos inicializada correctamente')
+# Versión de los contadores: la mayor de sus filas. Cada ajuste marca la
+# fila con la siguiente, así que crece con cada cambio y `version > ?`
+# devuelve los contadores modificados desde una versión dada
+_SIGUIENTE_VERSION = '(SELECT COALESCE(MAX(version), 0) + 1 FROM estadisticas_solicitudes)'
 
-def guardar_solicitud(nombre, email, telefono, servicio, mensaje):
-    """Guarda una nueva solicitud de servicio"""
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
-    
+def _ajuste_contador(categoria, clave, delta):
+    return f'''
+        INSERT INTO estadisticas_solicitudes (categoria, clave, cantidad, version)
+        VALUES ('{categoria}', {clave}, {delta}, {_SIGUIENTE_VERSION})
+        ON CONFLICT (categoria, clave) DO UPDATE
+        SET cantidad = cantidad + excluded.cantidad, version = excluded.version;
+    '''
+
+def _triggers_estadisticas():
+    """Triggers que mantienen estadisticas_solicitudes (cantidad y versión)
+    en la misma transacción que cada INSERT, UPDATE o DELETE sobre solicitudes"""
+    alta = ''.join([
+        _ajuste_contador('total', "''", 1),
+        _ajuste_contador('no_leidas', "''", '(NEW.leido IS 0)'),
+        _ajuste_contador('estado', "COALESCE(NEW.estado, '')", 1),
+        _ajuste_contador('servicio', "COALESCE(NEW.servicio, '')", 1),
+        _ajuste_contador('dia', "COALESCE(DATE(NEW.fecha), '')", 1),
+    ])
+    baja = ''.join([
+        _ajuste_contador('total', "''", -1),
+        _ajuste_contador('no_leidas', "''", '-(OLD.leido IS 0)'),
+        _ajuste_contador('estado', "COALESCE(OLD.estado, '')", -1),
+        _ajuste_contador('servicio', "COALESCE(OLD.servicio, '')", -1),
+        _ajuste_contador('dia', "COALESCE(DATE(OLD.fecha), '')", -1),
+    ])
+    triggers = [
+        f'CREATE TRIGGER IF NOT EXISTS trg_estadisticas_insert AFTER INSERT ON solicitudes BEGIN {alta} END',
+        f'CREATE TRIGGER IF NOT EXISTS trg_estadisticas_delete AFTER DELETE ON solicitudes BEGIN {baja} END',
+        f'''CREATE TRIGGER IF NOT EXISTS trg_estadisticas_leido AFTER UPDATE OF leido ON solicitudes
+           WHEN (OLD.leido IS 0) IS NOT (NEW.leido IS 0)
+           BEGIN {_ajuste_contador('no_leidas', "''", '(NEW.leido IS 0) - (OLD.leido IS 0)')} END''',
+    ]
+    # categoría -> (columna vigilada, clave del contador)
+    agrupaciones = {
+        'estado': ('estado', "COALESCE({fila}.estado, '')"),
+        'servicio': ('servicio', "COALESCE({fila}.servicio, '')"),
+        'dia': ('fecha', "COALESCE(DATE({fila}.fecha), '')"),
+    }
+    for categoria, (columna, clave) in agrupaciones.items():
+        viejo = clave.format(fila='OLD')
+        nuevo = clave.format(fila='NEW')
+        triggers.append(f'''CREATE TRIGGER IF NOT EXISTS trg_estadisticas_{categoria}
+           AFTER UPDATE OF {columna} ON solicitudes WHEN {viejo} IS NOT {nuevo}
+           BEGIN {_ajuste_contador(categoria, viejo, -1)}{_ajuste_contador(categoria, nuevo, 1)} END''')
+    return triggers
+
+_COLUMNAS_FTS = 'nombre, email, telefono, mensaje, notas'
+# Pesos bm25 por columna (mismo orden): un acierto en nombre o email pesa más
+PESOS_BUSQUEDA = '10.0, 5.0, 5.0, 1.0, 1.0'
+
+TRIGGERS_BUSQUEDA = [
+    f'''CREATE TRIGGER IF NOT EXISTS trg_busqueda_insert AFTER INSERT ON solicitudes BEGIN
+        INSERT INTO solicitudes_fts (rowid, {_COLUMNAS_FTS})
+        VALUES (NEW.id, NEW.nombre, NEW.email, NEW.telefono, NEW.mensaje, NEW.notas);
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS trg_busqueda_delete AFTER DELETE ON solicitudes BEGIN
+        INSERT INTO solicitudes_fts (solicitudes_fts, rowid, {_COLUMNAS_FTS})
+        VALUES ('delete', OLD.id, OLD.nombre, OLD.email, OLD.telefono, OLD.mensaje, OLD.notas);
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS trg_busqueda_update AFTER UPDATE OF {_COLUMNAS_FTS} ON solicitudes BEGIN
+        INSERT INTO solicitudes_fts (solicitudes_fts, rowid, {_COLUMNAS_FTS})
+        VALUES ('delete', OLD.id, OLD.nombre, OLD.email, OLD.telefono, OLD.mensaje, OLD.notas);
+        INSERT INTO solicitudes_fts (rowid, {_COLUMNAS_FTS})
+        VALUES (NEW.id, NEW.nombre, NEW.email, NEW.telefono, NEW.mensaje, NEW.notas);
+    END''',
+]
+
+def reconstruir_indice_busqueda():
+    """Regenera desde cero el índice FTS5 a partir de la tabla solicitudes"""
+    with transaccion() as conn:
+        conn.execute("INSERT INTO solicitudes_fts (solicitudes_fts) VALUES ('rebuild')")
+        conn.execute("INSERT INTO solicitudes_fts (solicitudes_fts) VALUES ('optimize')")
+
+PALABRAS_URGENTES = ['urgente', 'emergencia', 'inmediato', 'ya', 'ahora']
+_PATRON_URGENTE = re.compile('|'.join(map(re.escape, PALABRAS_URGENTES)))
+
+def calcular_prioridad(mensaje):
+    """3 (alta) si el mensaje contiene alguna palabra urgente; 1 (baja) si no"""
+    return 3 if _PATRON_URGENTE.search(mensaje.lower()) else 1
+
+def _solicitud_por_clave(conn, clave_idempotencia, huella=None):
+    """Id de la solicitud ya guardada con esa clave (None si no hay o expiró).
+    
+    ClaveReutilizada si la clave se guardó con una huella distinta de
+    `huella` (las claves anteriores a la huella no se comprueban).
+    """
+    fila = conn.execute('''
+        SELECT solicitud_id, huella FROM claves_idempotencia WHERE clave = ? AND expira > CURRENT_TIMESTAMP
+    ''', (clave_idempotencia,)).fetchone()
+    if fila is None:
+        return None
+    if huella is not None and fila[1] is not None and fila[1] != huella:
+        raise ClaveReutilizada('La clave de idempotencia ya se usó con otro contenido')
+    return fila[0]
+
+def _registrar_clave(conn, clave_idempotencia, solicitud_id, ttl, huella=None):
+    conn.execute('''
+        INSERT OR REPLACE INTO claves_idempotencia (clave, solicitud_id, expira, huella)
+        VALUES (?, ?, datetime('now', ?), ?)
+    ''', (clave_idempotencia, solicitud_id, f'+{int(ttl)} seconds', huella))
+
+def guardar_solicitud(nombre, email, telefono, servicio, mensaje, clave_idempotencia=None, ttl=86400,
+                      huella=None):
+    """Guarda una nueva solicitud de servicio.
+    
+    Con `clave_idempotencia` un reenvío dentro de `ttl` segundos devuelve
+    el id de la solicitud original sin escribir nada. Si la clave se usó
+    con otro contenido (`huella` distinta, ver app/idempotencia.py) lanza
+    ClaveReutilizada. Devuelve (id, nueva).
+    """
     # Determinar prioridad automáticamente
-    prioridad = 1  # baja por defecto
-    palabras_urgentes = ['urgente', 'emergencia', 'inmediato', 'ya', 'ahora']
-    if any(palabra in mensaje.lower() for palabra in palabras_urgentes):
-        prioridad = 3  # alta
-    
-    cursor.execute('''
-        INSERT INTO solicitudes (nombre, email, telefono, servicio, mensaje, prioridad)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (nombre, email, telefono, servicio, mensaje, prioridad))
-    
-    conn.commit()
-    solicitud_id = cursor.lastrowid
-    conn.close()
+    prioridad = calcular_prioridad(mensaje)
+    
+    # Inmediata: dos reenvíos simultáneos no pueden pasar ambos la comprobación
+    with transaccion(inmediata=clave_idempotencia is not None) as conn:
+        if clave_idempotencia is not None:
+            original = _solicitud_por_clave(conn, clave_idempotencia, huella)
+            if original is not None:
+                return original, False
+        cursor = conn.execute('''
+            INSERT INTO solicitudes (nombre, email, telefono, servicio, mensaje, prioridad)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (nombre, email, telefono, servicio, mensaje, prioridad))
+        solicitud_id = cursor.lastrowid
+        if clave_idempotencia is not None:
+            _registrar_clave(conn, clave_idempotencia, solicitud_id, ttl, huella)
     
     # Log del sistema
     log_sistema('solicitud', f'Nueva solicitud de {nombre} para {servicio}', 'sistema')
     
-    return solicitud_id
+    return solicitud_id, True
 
-def obtener_solicitudes(filtro_estado=None, filtro_servicio=None, orden='fecha_desc'):
-    """Obtiene solicitudes con filtros y ordenación"""
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
-    
-    query = '''
-        SELECT id, nombre, email, telefono, servicio, mensaje, 
-               datetime(fecha) as fecha, leido, prioridad, estado, notas,
-               datetime(fecha_contacto) as fecha_contacto,
-               datetime(fecha_cierre) as fecha_cierre
-        FROM solicitudes 
-    '''
-    
-    params = []
+def buscar_clave_idempotencia(clave_idempotencia, huella=None):
+    """Id de la solicitud guardada con esa clave, si sigue vigente"""
+    return _solicitud_por_clave(obtener_conexion_lectura(), clave_idempotencia, huella)
+
+def purgar_claves_idempotencia(lote=1000):
+    """Borra claves expiradas por lotes; devuelve cuántas se borraron"""
+    total = 0
+    while True:
+        with transaccion() as conn:
+            borradas = conn.execute('''
+                DELETE FROM claves_idempotencia WHERE clave IN (
+                    SELECT clave FROM claves_idempotencia WHERE expira <= CURRENT_TIMESTAMP LIMIT ?
+                )
+            ''', (lote,)).rowcount
+        total += borradas
+        if borradas < lote:
+            return total
+
+CAMPOS_IMPORTACION = ('nombre', 'email', 'telefono', 'servicio', 'mensaje')
+
+_SQL_IMPORTACION = '''
+    INSERT INTO solicitudes (nombre, email, telefono, servicio, mensaje, prioridad, fecha)
+    VALUES (?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+'''
+
+# Contadores de las filas con id > ?, agregados en una sola sentencia
+# (con una versión nueva, como los triggers, para /api/admin/estadisticas?since=)
+_SQL_CONTADORES_IMPORTACION = f'''
+    INSERT INTO estadisticas_solicitudes (categoria, clave, cantidad, version)
+    SELECT *, {_SIGUIENTE_VERSION} FROM (
+        SELECT 'total', '', COUNT(*) FROM solicitudes WHERE id > :desde
+        UNION ALL SELECT 'no_leidas', '', COALESCE(SUM(leido IS 0), 0) FROM solicitudes WHERE id > :desde
+        UNION ALL SELECT 'estado', COALESCE(estado, ''), COUNT(*) FROM solicitudes WHERE id > :desde GROUP BY 2
+        UNION ALL SELECT 'servicio', COALESCE(servicio, ''), COUNT(*) FROM solicitudes WHERE id > :desde GROUP BY 2
+        UNION ALL SELECT 'dia', COALESCE(DATE(fecha), ''), COUNT(*) FROM solicitudes WHERE id > :desde GROUP BY 2
+    ) WHERE true
+    ON CONFLICT (categoria, clave) DO UPDATE
+    SET cantidad = cantidad + excluded.cantidad, version = excluded.version
+'''
+
+def _triggers_alta():
+    """Triggers AFTER INSERT de solicitudes que la importación sustituye por lotes"""
+    return {
+        'trg_estadisticas_insert': _triggers_estadisticas()[0],
+        'trg_busqueda_insert': TRIGGERS_BUSQUEDA[0],
+    }
+
+def _preparar_importacion(datos):
+    """Valida un registro de entrada y devuelve la tupla a insertar"""
+    if not isinstance(datos, dict):
+        raise ValueError('Registro no válido')
+    
+    valores = []
+    for campo in CAMPOS_IMPORTACION:
+        valor = datos.get(campo)
+        if valor is None or not str(valor).strip():
+            raise ValueError(f'El campo {campo} es requerido')
+        valores.append(str(valor).strip())
+    if '@' not in valores[1]:
+        raise ValueError('El email no es válido')
+    
+    fecha = datos.get('fecha') or None
+    if fecha is not None:
+        try:
+            fecha = datetime.fromisoformat(str(fecha)).strftime('%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            raise ValueError(f'Fecha no válida: {fecha}') from None
+    
+    valores.append(calcular_prioridad(valores[4]))
+    valores.append(fecha)
+    return valores
+
+def _insertar_importacion(conn, filas):
+    # Dentro de la transacción los triggers por fila se sustituyen por una
+    # actualización de contadores y del índice FTS por lote; como el DDL
+    # es transaccional, otras conexiones nunca ven la tabla sin triggers
+    desde = conn.execute('SELECT COALESCE(MAX(id), 0) FROM solicitudes').fetchone()[0]
+    triggers = _triggers_alta()
+    for nombre in triggers:
+        conn.execute(f'DROP TRIGGER IF EXISTS {nombre}')
+    
+    conn.executemany(_SQL_IMPORTACION, filas)
+    conn.execute(_SQL_CONTADORES_IMPORTACION, {'desde': desde})
+    conn.execute(f'''
+        INSERT INTO solicitudes_fts (rowid, {_COLUMNAS_FTS})
+        SELECT id, {_COLUMNAS_FTS} FROM solicitudes WHERE id > ?
+    ''', (desde,))
+    
+    for sentencia in triggers.values():
+        conn.execute(sentencia)
+
+def importar_solicitudes(registros, clave=None, tamano_lote=20000, usuario=None, progreso=None):
+    """Importa solicitudes en bloque desde un iterable de diccionarios.
+    
+    Cada lote de `tamano_lote` registros se valida, se clasifica por
+    prioridad y se inserta con executemany en una sola transacción. Con
+    `clave` el avance se guarda en la tabla importaciones dentro de esa
+    misma transacción, de modo que una importación interrumpida se reanuda
+    desde el último lote confirmado sin duplicar filas. `progreso` recibe
+    el resumen parcial tras cada lote.
+    """
+    if tamano_lote < 1:
+        raise ValueError('tamano_lote debe ser al menos 1')
+    resumen = {'procesadas': 0, 'insertadas': 0, 'rechazadas': 0, 'errores': [],
+               'reanudada_desde': 0, 'completada': False}
+    
+    if clave is not None:
+        previa = obtener_conexion().execute('''
+            SELECT procesadas, insertadas, rechazadas, completada FROM importaciones WHERE clave = ?
+        ''', (clave,)).fetchone()
+        if previa:
+            resumen.update(procesadas=previa[0], insertadas=previa[1], rechazadas=previa[2],
+                           reanudada_desde=previa[0], completada=bool(previa[3]))
+            if resumen['completada']:
+                resumen.update(segundos=0.0, filas_por_segundo=0.0)
+                return resumen
+            registros = islice(registros, previa[0], None)
+    
+    inicio = time.perf_counter()
+    registros = iter(registros)
+    while True:
+        bloque = list(islice(registros, tamano_lote))
+        filas = []
+        for numero, datos in enumerate(bloque, resumen['procesadas'] + 1):
+            try:
+                filas.append(_preparar_importacion(datos))
+            except ValueError as e:
+                resumen['rechazadas'] += 1
+                if len(resumen['errores']) < 100:
+                    resumen['errores'].append((numero, str(e)))
+        resumen['procesadas'] += len(bloque)
+        resumen['insertadas'] += len(filas)
+        resumen['completada'] = len(bloque) < tamano_lote
+        
+        with transaccion(inmediata=True) as conn:
+            if filas:
+                _insertar_importacion(conn, filas)
+            if clave is not None:
+                conn.execute('''
+                    INSERT INTO importaciones (clave, procesadas, insertadas, rechazadas, completada, actualizado)
+                    VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                    ON CONFLICT (clave) DO UPDATE SET
+                        procesadas = excluded.procesadas, insertadas = excluded.insertadas,
+                        rechazadas = excluded.rechazadas, completada = excluded.completada,
+                        actualizado = excluded.actualizado
+                ''', (clave, resumen['procesadas'], resumen['insertadas'], resumen['rechazadas'],
+                      resumen['completada']))
+        
+        segundos = time.perf_counter() - inicio
+        nuevas = resumen['procesadas'] - resumen['reanudada_desde']
+        resumen.update(segundos=segundos, filas_por_segundo=nuevas / segundos if segundos else 0.0)
+        if progreso is not None:
+            progreso(resumen)
+        if resumen['completada']:
+            break
+    
+    origen = f' ({clave})' if clave else ''
+    log_sistema('solicitud', f"Importación masiva{origen}: {resumen['insertadas']} solicitudes insertadas, "
+                             f"{resumen['rechazadas']} rechazadas", usuario)
+    return resumen
+
+def guardar_solicitudes_encoladas(registros, clave):
+    """Inserta en una transacción las solicitudes de un segmento de la cola de ingesta.
+    
+    `clave` identifica el segmento y se registra en importaciones en la
+    misma transacción: si el proceso cae antes de borrar el fichero, el
+    segmento no se vuelve a insertar. Los registros con clave_idempotencia
+    ya guardada se omiten, con el mismo contenido o con otro. Devuelve (insertadas, rechazadas) o
+    None si el segmento ya estaba guardado.
+    """
+    filas = []
+    for datos in registros:
+        try:
+            filas.append((_preparar_importacion(datos), datos.get('clave_idempotencia'),
+                          datos.get('ttl_idempotencia', 86400), datos.get('huella_idempotencia')))
+        except ValueError:
+            continue
+    rechazadas = len(registros) - len(filas)
+    
+    with transaccion(inmediata=True) as conn:
+        if conn.execute('SELECT 1 FROM importaciones WHERE clave = ?', (clave,)).fetchone():
+            return None
+        # Segmentos pequeños: los triggers por fila cuestan menos que
+        # rehacerlos como en _insertar_importacion. Fila a fila para
+        # descartar reenvíos (también los que llegan en el mismo segmento)
+        nuevas = []
+        for fila, clave_idempotencia, ttl, huella in filas:
+            if clave_idempotencia is not None:
+                try:
+                    if _solicitud_por_clave(conn, clave_idempotencia, huella) is not None:
+                        continue
+                except ClaveReutilizada:
+                    # Misma clave con otro contenido encolada antes de guardar
+                    # la primera: ambas se confirmaron con 202, se queda la primera
+                    continue
+                solicitud_id = conn.execute(_SQL_IMPORTACION, fila).lastrowid
+                _registrar_clave(conn, clave_idempotencia, solicitud_id, ttl, huella)
+            else:
+                conn.execute(_SQL_IMPORTACION, fila)
+            nuevas.append(fila)
+        filas = nuevas
+        conn.execute('''
+            INSERT INTO importaciones (clave, procesadas, insertadas, rechazadas, completada)
+            VALUES (?, ?, ?, ?, 1)
+        ''', (clave, len(registros), len(filas), rechazadas))
+    
+    for fila in filas:
+        log_sistema('solicitud', f'Nueva solicitud de {fila[0]} para {fila[3]}', 'sistema')
+    return len(filas), rechazadas
+
+def reiniciar_importacion(clave):
+    """Olvida el punto de control de una importación"""
+    with transaccion() as conn:
+        conn.execute('DELETE FROM importaciones WHERE clave = ?', (clave,))
+
+_COLUMNAS_EXPORTACION = '''
+    SELECT id, nombre, email, telefono, servicio, mensaje, 
+           datetime(fecha) as fecha, leido, prioridad, estado, notas,
+           datetime(fecha_contacto) as fecha_contacto,
+           datetime(fecha_cierre) as fecha_cierre
+    FROM solicitudes 
+'''
+
+# El panel además necesita la versión de cada fila
+_COLUMNAS_SOLICITUD = _COLUMNAS_EXPORTACION.replace(' FROM solicitudes', ', version FROM solicitudes', 1)
+
+# Claves de ordenación de cada modo; el id siempre desempata para que el
+# cursor identifique una posición única
+ORDENES_SOLICITUDES = {
+    'fecha_desc': ('DESC', ('fecha', 'id')),
+    'fecha_asc': ('ASC', ('fecha', 'id')),
+    'prioridad_desc': ('DESC', ('prioridad', 'fecha', 'id')),
+    'nombre_asc': ('ASC', ('nombre', 'id')),
+    # Solo con búsqueda de texto: bm25 (menor es más relevante)
+    'relevancia': ('ASC', ('rango', 'id')),
+}
+
+_EXPRESIONES_ORDEN = {
+    'fecha': 'solicitudes.fecha',
+    'prioridad': 'solicitudes.prioridad',
+    'nombre': 'solicitudes.nombre',
+    'id': 'solicitudes.id',
+    'rango': 'busqueda.rango',
+}
+
+def _filtros_solicitudes(filtro_estado, filtro_servicio):
+    """Condiciones WHERE y parámetros para los filtros del panel"""
     where_conditions = []
+    params = []
     
     if filtro_estado and filtro_estado != 'todos':
-        where_conditions.append('estado = ?')
+        where_conditions.append('solicitudes.estado = ?')
         params.append(filtro_estado)
     
     if filtro_servicio and filtro_servicio != 'todos':
-        where_conditions.append('servicio = ?')
+        where_conditions.append('solicitudes.servicio = ?')
         params.append(filtro_servicio)
     
+    return where_conditions, params
+
+def obtener_solicitudes(filtro_estado=None, filtro_servicio=None, orden='fecha_desc', limite=None):
+    """Obtiene solicitudes con filtros y ordenación.
+    
+    Devuelve una lista de Solicitud; la consulta termina (y libera su
+    instantánea de lectura) antes de volver. Las exportaciones, que sí
+    necesitan recorrer por partes, usan exportar_solicitudes.
+    """
+    cursor = obtener_conexion_lectura().cursor()
+    
+    query = _COLUMNAS_SOLICITUD
+    where_conditions, params = _filtros_solicitudes(filtro_estado, filtro_servicio)
+    
     if where_conditions:
         query += ' WHERE ' + ' AND '.join(where_conditions)
     
     # Ordenación
     if orden == 'fecha_desc':
-        query += ' ORDER BY fecha DESC'
+        query += ' ORDER BY solicitudes.fecha DESC'
     elif orden == 'fecha_asc':
-        query += ' ORDER BY fecha ASC'
+        query += ' ORDER BY solicitudes.fecha ASC'
     elif orden == 'prioridad_desc':
-        query += ' ORDER BY prioridad DESC, fecha DESC'
+        query += ' ORDER BY solicitudes.prioridad DESC, solicitudes.fecha DESC'
     elif orden == 'nombre_asc':
-        query += ' ORDER BY nombre ASC'
+        query += ' ORDER BY solicitudes.nombre ASC'
+    
+    if limite is not None:
+        query += ' LIMIT ?'
+        params.append(limite)
     
     cursor.execute(query, params)
     
-    solicitudes = []
-    for row in cursor.fetchall():
-        solicitudes.append({
-            'id': row[0],
-            'nombre': row[1],
-            'email': row[2],
-            'telefono': row[3],
-            'servicio': row[4],
-            'mensaje': row[5],
-            'fecha': row[6],
-            'leido': bool(row[7]),
-            'prioridad': row[8],
-            'estado': row[9],
-            'notas': row[10],
-            'fecha_contacto': row[11],
-            'fecha_cierre': row[12]
-        })
-    
-    conn.close()
-    return solicitudes
+    return [Solicitud.desde_fila(fila) for fila in cursor]
 
-def obtener_estadisticas():
-    """Obtiene estadísticas para el dashboard"""
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
-    
-    # Total solicitudes
-    cursor.execute('SELECT COUNT(*) FROM solicitudes')
-    total = cursor.fetchone()[0]
-    
-    # Solicitudes no leídas
-    cursor.execute('SELECT COUNT(*) FROM solicitudes WHERE leido = 0')
-    no_leidas = cursor.fetchone()[0]
-    
-    # Solicitudes por estado
-    cursor.execute('SELECT estado, COUNT(*) FROM solicitudes GROUP BY estado')
-    por_estado = dict(cursor.fetchall())
-    
-    # Solicitudes por servicio
-    cursor.execute('SELECT servicio, COUNT(*) FROM solicitudes GROUP BY servicio')
-    por_servicio = dict(cursor.fetchall())
+COLUMNAS_EXPORTACION_SOLICITUDES = (
+    'id', 'nombre', 'email', 'telefono', 'servicio', 'mensaje', 'fecha', 'leido',
+    'prioridad', 'estado', 'notas', 'fecha_contacto', 'fecha_cierre'
+)
+COLUMNAS_EXPORTACION_LOGS = ('id', 'tipo', 'mensaje', 'usuario', 'fecha')
+
+def _lotes_por_id(query, where_conditions, params, lote, tabla):
+    """Recorre una consulta en lotes de `lote` filas avanzando por id.
+    
+    Cada lote es una consulta independiente, así que entre lotes no queda
+    ninguna lectura abierta que retenga el WAL ni la conexión.
+    """
+    ultimo_id = 0
+    while True:
+        condiciones = where_conditions + [f'{tabla}.id > ?']
+        filas = obtener_conexion_lectura().execute(
+            query + ' WHERE ' + ' AND '.join(condiciones) + f' ORDER BY {tabla}.id LIMIT ?',
+            params + [ultimo_id, lote]).fetchall()
+        if not filas:
+            return
+        yield filas
+        if len(filas) < lote:
+            return
+        ultimo_id = filas[-1][0]
+
+def exportar_solicitudes(filtro_estado=None, filtro_servicio=None, lote=1000):
+    """Lotes de tuplas (COLUMNAS_EXPORTACION_SOLICITUDES) con los filtros del panel"""
+    where_conditions, params = _filtros_solicitudes(filtro_estado, filtro_servicio)
+    # Recorrer por clave primaria y filtrar: con los índices de los filtros
+    # cada lote tendría que ordenar por id todas las filas coincidentes
+    return _lotes_por_id(_COLUMNAS_EXPORTACION + 'NOT INDEXED', where_conditions, params, lote, 'solicitudes')
+
+def exportar_logs(tipo=None, lote=1000):
+    """Lotes de tuplas (COLUMNAS_EXPORTACION_LOGS) de logs_sistema"""
+    where_conditions, params = ([], []) if tipo is None else (['logs_sistema.tipo = ?'], [tipo])
+    query = 'SELECT id, tipo, mensaje, usuario, datetime(fecha) AS fecha FROM logs_sistema NOT INDEXED'
+    return _lotes_por_id(query, where_conditions, params, lote, 'logs_sistema')
+
+def codificar_cursor(orden, solicitud):
+    """Codifica la posición de una solicitud como cursor opaco"""
+    _, claves = ORDENES_SOLICITUDES[orden]
+    datos = json.dumps({'o': orden, 'k': [solicitud[clave] for clave in claves]},
+                       separators=(',', ':'))
+    return base64.urlsafe_b64encode(datos.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decodificar_cursor(orden, cursor):
+    """Devuelve los valores de la clave de ordenación; ValueError si no es válido"""
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        datos = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        valores = datos['k']
+    except (ValueError, TypeError, KeyError, binascii.Error) as e:
+        raise ValueError('Cursor no válido') from e
+    
+    _, claves = ORDENES_SOLICITUDES[orden]
+    if datos.get('o') != orden or not isinstance(valores, list) or len(valores) != len(claves):
+        raise ValueError('El cursor no corresponde a la ordenación solicitada')
+    return valores
+
+def consulta_busqueda(texto):
+    """Convierte el texto del buscador en una consulta FTS5 segura.
+    
+    Cada palabra se busca como prefijo y todas deben aparecer; la sintaxis
+    FTS5 del usuario (comillas, operadores) se ignora. None si no hay palabras.
+    """
+    palabras = re.findall(r'\w+', texto or '')
+    if not palabras:
+        return None
+    return ' '.join(f'"{palabra}"*' for palabra in palabras)
+
+def obtener_pagina_solicitudes(filtro_estado=None, filtro_servicio=None, orden='fecha_desc',
+                               cursor=None, direccion='siguiente', limite=25, q=None):
+    """Obtiene una página de solicitudes mediante paginación por cursor (keyset).
+    
+    `cursor` marca la posición de la última fila vista (o la primera si
+    `direccion` es 'anterior'). Con `q` se filtra por búsqueda de texto
+    completo, combinable con los filtros y con cualquier ordenación.
+    Devuelve las solicitudes de la página y los cursores para avanzar y
+    retroceder (None si no hay más páginas).
+    """
+    busqueda = consulta_busqueda(q)
+    if orden not in ORDENES_SOLICITUDES or (orden == 'relevancia' and not busqueda):
+        orden = 'fecha_desc'
+    sentido, claves = ORDENES_SOLICITUDES[orden]
+    hacia_atras = direccion == 'anterior' and cursor is not None
+    
+    query = _COLUMNAS_SOLICITUD
+    where_conditions, params = _filtros_solicitudes(filtro_estado, filtro_servicio)
+    
+    if busqueda and orden == 'relevancia':
+        query = query.replace(' FROM solicitudes', ', busqueda.rango FROM solicitudes', 1)
+        query += f'''
+            JOIN (SELECT rowid AS id_fts, bm25(solicitudes_fts, {PESOS_BUSQUEDA}) AS rango
+                  FROM solicitudes_fts WHERE solicitudes_fts MATCH ?) AS busqueda
+              ON busqueda.id_fts = solicitudes.id
+        '''
+        params.insert(0, busqueda)
+    elif busqueda:
+        where_conditions.append(
+            'solicitudes.id IN (SELECT rowid FROM solicitudes_fts WHERE solicitudes_fts MATCH ?)')
+        params.append(busqueda)
+    
+    columnas = ', '.join(_EXPRESIONES_ORDEN[clave] for clave in claves)
+    if cursor is not None:
+        valores = decodificar_cursor(orden, cursor)
+        operador = '<' if (sentido == 'DESC') != hacia_atras else '>'
+        marcadores = ', '.join('?' for _ in claves)
+        where_conditions.append(f'({columnas}) {operador} ({marcadores})')
+        params.extend(valores)
     
-    # Solicitudes de los últimos 7 días
-    cursor.execute('''
-        SELECT DATE(fecha), COUNT(*) 
-        FROM solicitudes 
-        WHERE fecha >= date('now', '-7 days')
-        GROUP BY DATE(fecha)
-    ''')
-    ultimos_7_dias = dict(cursor.fetchall())
+    if where_conditions:
+        query += ' WHERE ' + ' AND '.join(where_conditions)
     
-    conn.close()
+    # Para retroceder se recorre el índice en sentido inverso y luego se
+    # restablece el orden de la página
+    sentido_consulta = sentido
+    if hacia_atras:
+        sentido_consulta = 'ASC' if sentido == 'DESC' else 'DESC'
+    query += ' ORDER BY ' + ', '.join(f'{_EXPRESIONES_ORDEN[clave]} {sentido_consulta}' for clave in claves)
+    query += ' LIMIT ?'
+    params.append(limite + 1)
+    
+    filas = obtener_conexion_lectura().execute(query, params).fetchall()
+    hay_mas = len(filas) > limite
+    solicitudes = []
+    for row in filas[:limite]:
+        solicitud = Solicitud.desde_fila(row)
+        if orden == 'relevancia':
+            solicitud.rango = row[14]
+        solicitudes.append(solicitud)
+    if hacia_atras:
+        solicitudes.reverse()
+    
+    siguiente = anterior = None
+    if solicitudes:
+        if hacia_atras:
+            # Se llega desde una página posterior, que por tanto existe
+            siguiente = codificar_cursor(orden, solicitudes[-1])
+            if hay_mas:
+                anterior = codificar_cursor(orden, solicitudes[0])
+        else:
+            if hay_mas:
+                siguiente = codificar_cursor(orden, solicitudes[-1])
+            if cursor is not None:
+                anterior = codificar_cursor(orden, solicitudes[0])
     
     return {
-        'total': total,
-        'no_leidas': no_leidas,
-        'por_estado': por_estado,
-        'por_servicio': por_servicio,
-        'ultimos_7_dias': ultimos_7_dias
+        'solicitudes': solicitudes,
+        'siguiente': siguiente,
+        'anterior': anterior,
+        'orden': orden,
+        'limite': limite
+    }
+
+_AGRUPADAS = {'estado': 'por_estado', 'servicio': 'por_servicio', 'dia': 'ultimos_7_dias'}
+
+def obtener_estadisticas():
+    """Obtiene estadísticas para el dashboard, con la versión de los contadores"""
+    # Lectura de los contadores mantenidos por triggers: el coste no depende
+    # del número de solicitudes
+    filas = obtener_conexion_lectura().execute('''
+        SELECT categoria, clave, cantidad FROM estadisticas_solicitudes
+        WHERE categoria IN ('total', 'no_leidas', 'estado', 'servicio')
+        UNION ALL
+        SELECT categoria, clave, cantidad FROM estadisticas_solicitudes
+        WHERE categoria = 'dia' AND clave >= date('now', '-7 days')
+        UNION ALL
+        SELECT 'version', '', COALESCE(MAX(version), 0) FROM estadisticas_solicitudes
+    ''').fetchall()
+    
+    estadisticas = {
+        'total': 0,
+        'no_leidas': 0,
+        'por_estado': {},
+        'por_servicio': {},
+        'ultimos_7_dias': {}
     }
+    for categoria, clave, cantidad in filas:
+        if categoria in _AGRUPADAS:
+            if cantidad > 0:
+                estadisticas[_AGRUPADAS[categoria]][clave] = cantidad
+        else:
+            estadisticas[categoria] = cantidad
+    
+    return estadisticas
+
+def version_estadisticas():
+    """Versión actual de los contadores (lectura de un extremo del índice)"""
+    return obtener_conexion_lectura().execute(
+        'SELECT COALESCE(MAX(version), 0) FROM estadisticas_solicitudes').fetchone()[0]
+
+def obtener_cambios_estadisticas(desde):
+    """Contadores modificados después de la versión `desde`.
+    
+    Mismo formato que obtener_estadisticas, con 'parcial': True y solo las
+    claves que han cambiado; en las agrupadas un 0 significa que la clave
+    desaparece. Los días que salen de la ventana de 7 días no se notifican:
+    el cliente los descarta por fecha.
+    """
+    filas = obtener_conexion_lectura().execute('''
+        SELECT categoria, clave, cantidad, version FROM estadisticas_solicitudes
+        WHERE version > ? AND (categoria != 'dia' OR clave >= date('now', '-7 days'))
+    ''', (desde,)).fetchall()
+    
+    cambios = {'parcial': True, 'version': desde}
+    for categoria, clave, cantidad, version in filas:
+        cambios['version'] = max(cambios['version'], version)
+        if categoria in _AGRUPADAS:
+            cambios.setdefault(_AGRUPADAS[categoria], {})[clave] = cantidad
+        else:
+            cambios[categoria] = cantidad
+    
+    return cambios
+
+def _contadores_reales(conn):
+    """Recalcula los contadores a partir de la tabla solicitudes"""
+    contadores = {
+        ('total', ''): conn.execute('SELECT COUNT(*) FROM solicitudes').fetchone()[0],
+        ('no_leidas', ''): conn.execute('SELECT COUNT(*) FROM solicitudes WHERE leido = 0').fetchone()[0],
+    }
+    agregados = {
+        'estado': "SELECT COALESCE(estado, ''), COUNT(*) FROM solicitudes GROUP BY 1",
+        'servicio': "SELECT COALESCE(servicio, ''), COUNT(*) FROM solicitudes GROUP BY 1",
+        'dia': "SELECT COALESCE(DATE(fecha), ''), COUNT(*) FROM solicitudes GROUP BY 1",
+    }
+    for categoria, query in agregados.items():
+        for clave, cantidad in conn.execute(query):
+            contadores[(categoria, clave)] = cantidad
+    return contadores
+
+def reconstruir_estadisticas(corregir=True):
+    """Compara los contadores con los datos reales y, si se pide, los rehace.
+    
+    Devuelve un diccionario {(categoria, clave): (contador, real)} con las
+    diferencias encontradas antes de corregir. La comprobación sin corregir
+    se hace sobre una instantánea de lectura, sin bloquear la ingesta.
+    """
+    with (transaccion(inmediata=True) if corregir else instantanea()) as conn:
+        reales = _contadores_reales(conn)
+        guardados = {
+            (categoria, clave): cantidad
+            for categoria, clave, cantidad in conn.execute(
+                'SELECT categoria, clave, cantidad FROM estadisticas_solicitudes')
+        }
+        
+        diferencias = {}
+        for clave in set(reales) | set(guardados):
+            real = reales.get(clave, 0)
+            guardado = guardados.get(clave, 0)
+            if real != guardado:
+                diferencias[clave] = (guardado, real)
+        
+        if corregir and diferencias:
+            # Solo las filas erróneas, con una versión nueva: los clientes
+            # sincronizados por versión reciben la corrección
+            version = conn.execute(f'SELECT {_SIGUIENTE_VERSION}').fetchone()[0]
+            conn.executemany('''
+                INSERT INTO estadisticas_solicitudes (categoria, clave, cantidad, version)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (categoria, clave) DO UPDATE
+                SET cantidad = excluded.cantidad, version = excluded.version
+            ''', [(categoria, clave, real, version) for (categoria, clave), (_, real) in diferencias.items()])
+    
+    if corregir and diferencias:
+        log_sistema('sistema', f'Estadísticas reconstruidas ({len(diferencias)} contadores corregidos)')
+    
+    return diferencias
 
 def marcar_como_leido(solicitud_id):
     """Marca una solicitud como leída"""
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
-    
-    cursor.execute('UPDATE solicitudes SET leido = 1 WHERE id = ?', (solicitud_id,))
-    conn.commit()
-    success = cursor.rowcount > 0
-    conn.close()
+    with transaccion() as conn:
+        cursor = conn.execute('UPDATE solicitudes SET leido = 1, version = version + 1 WHERE id = ?', (solicitud_id,))
+        success = cursor.rowcount > 0
     
     if success:
+        invalidar_solicitudes([solicitud_id])
         log_sistema('solicitud', f'Solicitud {solicitud_id} marcada como leída')
     
     return success
 
 def actualizar_estado(solicitud_id, estado, notas=''):
     """Actualiza el estado de una solicitud"""
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
-    
-    if estado == 'contactado':
-        cursor.execute('''
-            UPDATE solicitudes 
-            SET estado = ?, notas = ?, fecha_contacto = CURRENT_TIMESTAMP 
-            WHERE id = ?
-        ''', (estado, notas, solicitud_id))
-    elif estado == 'cerrado':
-        cursor.execute('''
-            UPDATE solicitudes 
-            SET estado = ?, notas = ?, fecha_cierre = CURRENT_TIMESTAMP 
-            WHERE id = ?
-        ''', (estado, notas, solicitud_id))
-    else:
-        cursor.execute('''
-            UPDATE solicitudes 
-            SET estado = ?, notas = ? 
-            WHERE id = ?
-        ''', (estado, notas, solicitud_id))
-    
-    conn.commit()
-    success = cursor.rowcount > 0
-    conn.close()
+    with transaccion() as conn:
+        if estado == 'contactado':
+            cursor = conn.execute('''
+                UPDATE solicitudes 
+                SET estado = ?, notas = ?, fecha_contacto = CURRENT_TIMESTAMP, version = version + 1
+                WHERE id = ?
+            ''', (estado, notas, solicitud_id))
+        elif estado == 'cerrado':
+            cursor = conn.execute('''
+                UPDATE solicitudes 
+                SET estado = ?, notas = ?, fecha_cierre = CURRENT_TIMESTAMP, version = version + 1
+                WHERE id = ?
+            ''', (estado, notas, solicitud_id))
+        else:
+            cursor = conn.execute('''
+                UPDATE solicitudes 
+                SET estado = ?, notas = ?, version = version + 1
+                WHERE id = ?
+            ''', (estado, notas, solicitud_id))
+        success = cursor.rowcount > 0
     
     if success:
+        invalidar_solicitudes([solicitud_id])
         log_sistema('solicitud', f'Solicitud {solicitud_id} actualizada a estado: {estado}')
     
     return success
 
 def eliminar_solicitud(solicitud_id):
     """Elimina una solicitud"""
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
-    
-    # Primero obtenemos los datos para el log
-    cursor.execute('SELECT nombre, servicio FROM solicitudes WHERE id = ?', (solicitud_id,))
-    resultado = cursor.fetchone()
-    
-    cursor.execute('DELETE FROM solicitudes WHERE id = ?', (solicitud_id,))
-    conn.commit()
-    success = cursor.rowcount > 0
-    conn.close()
+    with transaccion() as conn:
+        cursor = conn.cursor()
+        
+        # Primero obtenemos los datos para el log
+        cursor.execute('SELECT nombre, servicio FROM solicitudes WHERE id = ?', (solicitud_id,))
+        resultado = cursor.fetchone()
+        
+        cursor.execute('DELETE FROM solicitudes WHERE id = ?', (solicitud_id,))
+        success = cursor.rowcount > 0
     
+    if success:
+        invalidar_solicitudes([solicitud_id])
     if success and resultado:
         log_sistema('solicitud', f'Solicitud eliminada: {resultado[0]} - {resultado[1]}')
     
     return success
 
+ACCIONES_MASIVAS = ('marcar_leido', 'actualizar_estado', 'eliminar')
+
+_SQL_ESTADO = {
+    'contactado': '''
+        UPDATE solicitudes
+        SET estado = ?, notas = ?, fecha_contacto = CURRENT_TIMESTAMP, version = version + 1
+        WHERE id = ?
+    ''',
+    'cerrado': '''
+        UPDATE solicitudes
+        SET estado = ?, notas = ?, fecha_cierre = CURRENT_TIMESTAMP, version = version + 1
+        WHERE id = ?
+    ''',
+    'pendiente': '''
+        UPDATE solicitudes
+        SET estado = ?, notas = ?, version = version + 1
+        WHERE id = ?
+    ''',
+}
+
+def aplicar_accion_masiva(ids, accion, estado=None, notas='', usuario=None):
+    """Aplica una acción a varias solicitudes en una sola transacción.
+    
+    Devuelve {id: True/False} (False si la solicitud no existe) y deja un
+    único registro en el log con el resumen de la operación.
+    """
+    if accion not in ACCIONES_MASIVAS:
+        raise ValueError(f'Acción no válida: {accion}')
+    if accion == 'actualizar_estado' and estado not in _SQL_ESTADO:
+        raise ValueError('Estado no válido')
+    
+    ids = list(dict.fromkeys(int(solicitud_id) for solicitud_id in ids))
+    if not ids:
+        return {}
+    
+    with transaccion(inmediata=True) as conn:
+        existentes = {row[0] for row in conn.execute(
+            'SELECT id FROM solicitudes WHERE id IN (SELECT value FROM json_each(?))',
+            (json.dumps(ids),))}
+        filas = [solicitud_id for solicitud_id in ids if solicitud_id in existentes]
+        
+        if accion == 'marcar_leido':
+            conn.executemany('UPDATE solicitudes SET leido = 1, version = version + 1 WHERE id = ?',
+                             [(solicitud_id,) for solicitud_id in filas])
+        elif accion == 'actualizar_estado':
+            conn.executemany(_SQL_ESTADO[estado],
+                             [(estado, notas, solicitud_id) for solicitud_id in filas])
+        else:
+            conn.executemany('DELETE FROM solicitudes WHERE id = ?',
+                             [(solicitud_id,) for solicitud_id in filas])
+    
+    if filas:
+        invalidar_solicitudes(filas)
+        descripcion = {
+            'marcar_leido': 'marcadas como leídas',
+            'actualizar_estado': f'actualizadas a estado: {estado}',
+            'eliminar': 'eliminadas',
+        }[accion]
+        muestra = ', '.join(str(solicitud_id) for solicitud_id in filas[:20])
+        if len(filas) > 20:
+            muestra += f'... (+{len(filas) - 20})'
+        log_sistema('solicitud', f'{len(filas)} solicitudes {descripcion}: {muestra}', usuario)
+    
+    return {solicitud_id: solicitud_id in existentes for solicitud_id in ids}
+
 def registrar_admin(username, password, nombre, email, rol='admin'):
     """Registra un nuevo administrador"""
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
-    
-    # Verificar si el usuario ya existe
-    cursor.execute('SELECT id FROM administradores WHERE username = ?', (username,))
-    if cursor.fetchone():
-        conn.close()
-        return False, "El nombre de usuario ya existe"
-    
-    # Verificar si el email ya existe
-    cursor.execute('SELECT id FROM administradores WHERE email = ?', (email,))
-    if cursor.fetchone():
-        conn.close()
-        return False, "El email ya está registrado"
-    
-    # Crear hash de la contraseña
-    password_hash = generate_password_hash(password)
-    
-    # Insertar nuevo administrador
-    cursor.execute('''
-        INSERT INTO administradores (username, password_hash, nombre, email, rol)
-        VALUES (?, ?, ?, ?, ?)
-    ''', (username, password_hash, nombre, email, rol))
-    
-    conn.commit()
-    admin_id = cursor.lastrowid
-    conn.close()
+    with transaccion() as conn:
+        cursor = conn.cursor()
+        
+        # Verificar si el usuario ya existe
+        cursor.execute('SELECT id FROM administradores WHERE username = ?', (username,))
+        if cursor.fetchone():
+            return False, "El nombre de usuario ya existe"
+        
+        # Verificar si el email ya existe
+        cursor.execute('SELECT id FROM administradores WHERE email = ?', (email,))
+        if cursor.fetchone():
+            return False, "El email ya está registrado"
+        
+        # Crear hash de la contraseña
+        password_hash = generate_password_hash(password)
+        
+        # Insertar nuevo administrador
+        cursor.execute('''
+            INSERT INTO administradores (username, password_hash, nombre, email, rol)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (username, password_hash, nombre, email, rol))
+        admin_id = cursor.lastrowid
     
     log_sistema('registro', f'Nuevo administrador registrado: {nombre} ({username})')
     return True, admin_id
 
 def verificar_admin(username, password):
     """Verifica las credenciales del administrador y actualiza último login"""
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
+    cursor = obtener_conexion().cursor()
     
     cursor.execute('''
         SELECT id, username, password_hash, nombre, email, rol, activo 
@@ -319,30 +942,26 @@ def verificar_admin(username, password):
     
     if admin and check_password_hash(admin[2], password):
         # Actualizar último login
-        cursor.execute('''
-            UPDATE administradores 
-            SET ultimo_login = CURRENT_TIMESTAMP 
-            WHERE id = ?
-        ''', (admin[0],))
-        conn.commit()
+        with transaccion() as conn:
+            conn.execute('''
+                UPDATE administradores 
+                SET ultimo_login = CURRENT_TIMESTAMP 
+                WHERE id = ?
+            ''', (admin[0],))
         
-        admin_data = {
+        return {
             'id': admin[0],
             'username': admin[1],
             'nombre': admin[3],
             'email': admin[4],
             'rol': admin[5]
         }
-        conn.close()
-        return admin_data
     
-    conn.close()
     return None
 
 def obtener_administradores():
     """Obtiene todos los administradores (excepto contraseñas)"""
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
+    cursor = obtener_conexion_lectura().cursor()
     
     cursor.execute('''
         SELECT id, username, nombre, email, rol, activo, fecha_creacion, ultimo_login
@@ -350,36 +969,17 @@ def obtener_administradores():
         ORDER BY fecha_creacion DESC
     ''')
     
-    admins = []
-    for row in cursor.fetchall():
-        admins.append({
-            'id': row[0],
-            'username': row[1],
-            'nombre': row[2],
-            'email': row[3],
-            'rol': row[4],
-            'activo': bool(row[5]),
-            'fecha_creacion': row[6],
-            'ultimo_login': row[7]
-        })
-    
-    conn.close()
-    return admins
+    return [Administrador.desde_fila(fila) for fila in cursor]
 
 def actualizar_estado_admin(admin_id, activo):
     """Activa o desactiva un administrador"""
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        UPDATE administradores 
-        SET activo = ? 
-        WHERE id = ?
-    ''', (activo, admin_id))
-    
-    conn.commit()
-    success = cursor.rowcount > 0
-    conn.close()
+    with transaccion() as conn:
+        cursor = conn.execute('''
+            UPDATE administradores 
+            SET activo = ? 
+            WHERE id = ?
+        ''', (activo, admin_id))
+        success = cursor.rowcount > 0
     
     if success:
         estado = "activado" if activo else "desactivado"
@@ -389,11 +989,9 @@ def actualizar_estado_admin(admin_id, activo):
 
 def obtener_primer_admin():
     """Verifica si existe al menos un administrador en el sistema"""
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
+    cursor = obtener_conexion().cursor()
     
     cursor.execute('SELECT COUNT(*) FROM administradores')
     count = cursor.fetchone()[0]
-    conn.close()
     
-    return count > 0
\ No newline at end of file
+    return count > 0
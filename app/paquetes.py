@@ -0,0 +1,408 @@
+"""Paquetes de CSS/JS para producción (flask assets-build).
+
+Cada página carga solo su paquete: las públicas publico.css/publico.js y
+el panel admin.css/admin.js (los de las públicas más los del panel). Al
+compilar:
+
+- se minifica el código quitando comentarios (salvo los /*! de licencia)
+  y espacios, sin renombrar ni reescribir nada;
+- se quitan las llamadas a console.log/console.debug, y las ayudas de
+  depuración (SOLO_DEPURACION) no se publican;
+- publico.css pierde las reglas cuyos selectores no aparecen en ninguna
+  página pública ni en su JS (main.css incluye también los estilos del
+  panel);
+- se extrae el CSS crítico de index.html: las reglas que afectan a la
+  cabecera y a la primera sección, que la plantilla incrusta en <style>
+  para pintar sin esperar al paquete.
+
+Sin compilar (o en modo debug) las plantillas enlazan los ficheros
+originales de cada paquete (ver urls_paquete en app/activos.py).
+"""
+import re
+from html.parser import HTMLParser
+
+# Paquete -> ficheros de app/static, en orden
+PAQUETES = {
+    'paquetes/publico.css': ('css/main.css',),
+    'paquetes/publico.js': ('js/main.js',),
+    'paquetes/admin.css': ('css/main.css', 'css/admin.css'),
+    'paquetes/admin.js': ('js/main.js', 'js/admin.js'),
+}
+
+# Paquetes que se recortan a los selectores usados en las páginas públicas
+PAQUETES_PUBLICOS = ('paquetes/publico.css',)
+
+# Clases que el JS compone en tiempo de ejecución (main.js: `alert-${type}`)
+# y que por tanto no aparecen enteras ni en el HTML ni en el código
+SELECTORES_CONSERVADOS = ('alert-success', 'alert-error')
+
+# Páginas con CSS crítico incrustado: endpoint -> nombre en el manifiesto
+PAGINAS_CRITICAS = {'main.index': 'criticos/index.css'}
+
+# Ayudas de depuración de app/static que no se copian a dist
+SOLO_DEPURACION = ('js/debug.js', 'css/emergency.css')
+
+# ===== JS =====
+
+# Tras estas palabras una / empieza una expresión regular, no una división
+_PALABRAS_ANTES_DE_REGEX = {'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new',
+                            'delete', 'void', 'throw', 'instanceof', 'yield', 'await'}
+
+_CONSOLA_DEPURACION = re.compile(r'(?<![\w$.])console\.(?:log|debug)\s*\(')
+
+def _fin_cadena(codigo, i):
+    comilla = codigo[i]
+    j = i + 1
+    while j < len(codigo):
+        c = codigo[j]
+        if c == '\\':
+            j += 2
+            continue
+        if c == comilla:
+            return j + 1
+        if comilla == '`' and codigo.startswith('${', j):
+            j = _fin_interpolacion(codigo, j + 2)
+            continue
+        j += 1
+    return len(codigo)
+
+def _fin_interpolacion(codigo, j):
+    profundidad = 1
+    while j < len(codigo):
+        c = codigo[j]
+        if c in '\'"`':
+            j = _fin_cadena(codigo, j)
+            continue
+        if c == '{':
+            profundidad += 1
+        elif c == '}':
+            profundidad -= 1
+            if profundidad == 0:
+                return j + 1
+        j += 1
+    return j
+
+def _fin_regex(codigo, i):
+    j = i + 1
+    en_clase = False
+    while j < len(codigo) and codigo[j] != '\n':
+        c = codigo[j]
+        if c == '\\':
+            j += 2
+            continue
+        if c == '[':
+            en_clase = True
+        elif c == ']':
+            en_clase = False
+        elif c == '/' and not en_clase:
+            j += 1
+            while j < len(codigo) and codigo[j].isalpha():
+                j += 1
+            return j
+        j += 1
+    return i + 1  # no era una expresión regular
+
+def _empieza_regex(previo, codigo_previo):
+    if previo is None or previo in '(,=:[!&|?{};+-*%<>~^':
+        return True
+    if previo.isalnum() or previo in '_$':
+        palabra = re.search(r'[\w$]+$', codigo_previo)
+        return palabra is not None and palabra.group() in _PALABRAS_ANTES_DE_REGEX
+    return False
+
+def _trozos_js(codigo):
+    """Divide el código en trozos ('codigo' | 'cadena' | 'regex' | 'comentario', texto)"""
+    trozos = []
+    actual = []
+    previo = None  # último carácter significativo (cadenas y regex cuentan como operando)
+
+    def cerrar_codigo():
+        if actual:
+            trozos.append(('codigo', ''.join(actual)))
+            actual.clear()
+
+    i = 0
+    while i < len(codigo):
+        c = codigo[i]
+        siguiente = codigo[i + 1:i + 2]
+        if c in '\'"`':
+            fin, tipo = _fin_cadena(codigo, i), 'cadena'
+        elif c == '/' and siguiente == '/':
+            fin = codigo.find('\n', i)
+            fin, tipo = (len(codigo) if fin == -1 else fin), 'comentario'
+        elif c == '/' and siguiente == '*':
+            fin = codigo.find('*/', i + 2)
+            fin, tipo = (len(codigo) if fin == -1 else fin + 2), 'comentario'
+        elif c == '/' and _empieza_regex(previo, ''.join(actual)) and _fin_regex(codigo, i) > i + 1:
+            fin, tipo = _fin_regex(codigo, i), 'regex'
+        else:
+            actual.append(c)
+            if not c.isspace():
+                previo = c
+            i += 1
+            continue
+        cerrar_codigo()
+        trozos.append((tipo, codigo[i:fin]))
+        if tipo != 'comentario':
+            previo = 'a'
+        i = fin
+    cerrar_codigo()
+    return trozos
+
+def quitar_depuracion(codigo):
+    """Sustituye las llamadas a console.log/console.debug por `void 0`"""
+    trozos = _trozos_js(codigo)
+    salida = []
+    profundidad = 0  # paréntesis abiertos de la llamada que se está quitando
+    for tipo, texto in trozos:
+        if profundidad:
+            if tipo != 'codigo':
+                continue
+            for posicion, c in enumerate(texto):
+                profundidad += (c == '(') - (c == ')')
+                if not profundidad:
+                    texto = texto[posicion + 1:]
+                    break
+            else:
+                continue
+        if tipo == 'codigo':
+            while True:
+                llamada = _CONSOLA_DEPURACION.search(texto)
+                if llamada is None:
+                    break
+                salida.append(texto[:llamada.start()] + 'void 0')
+                texto = texto[llamada.end():]
+                profundidad = 1
+                for posicion, c in enumerate(texto):
+                    profundidad += (c == '(') - (c == ')')
+                    if not profundidad:
+                        texto = texto[posicion + 1:]
+                        break
+                else:
+                    texto = ''
+                    break
+        salida.append(texto)
+    return ''.join(salida)
+
+def _compactar_js(texto):
+    texto = re.sub(r'[ \t]*\n\s*', '\n', texto)
+    texto = re.sub(r'[ \t]+', ' ', texto)
+    texto = re.sub(r' ?([{}()\[\];,:=<>!?&|]) ?', r'\1', texto)
+    # Saltos de línea que no pueden cambiar la inserción automática de ;
+    texto = re.sub(r'([;{,(\[:])\n', r'\1', texto)
+    return re.sub(r'\n([}\]),;.])', r'\1', texto)
+
+def minificar_js(codigo):
+    salida = []
+    pendiente = []  # código y comentarios (como espacio) entre dos cadenas
+    for tipo, texto in _trozos_js(codigo):
+        if tipo == 'comentario' and not texto.startswith('/*!'):
+            pendiente.append('\n' if texto.startswith('//') or '\n' in texto else ' ')
+        elif tipo in ('codigo', 'comentario'):
+            pendiente.append(texto + '\n' if tipo == 'comentario' else texto)
+        else:
+            salida.append(_compactar_js(''.join(pendiente)))
+            pendiente.clear()
+            salida.append(texto)
+    salida.append(_compactar_js(''.join(pendiente)))
+    return ''.join(salida).strip() + '\n'
+
+# ===== CSS =====
+
+def _trozos_css(css):
+    """(es_literal, texto): cadenas y comentarios /*! se conservan tal cual"""
+    trozos = []
+    for parte in re.split(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|/\*.*?\*/)', css, flags=re.S):
+        if parte.startswith('/*') and not parte.startswith('/*!'):
+            trozos.append((False, ' '))
+        elif parte:
+            trozos.append((parte[0] in '"\'/', parte))
+    return trozos
+
+def minificar_css(css):
+    salida = []
+    for literal, texto in _trozos_css(css):
+        if not literal:
+            texto = re.sub(r'\s+', ' ', texto)
+            texto = re.sub(r' ?([{};,>~]) ?', r'\1', texto)
+            texto = re.sub(r': ', ':', texto)
+            texto = texto.replace(' !important', '!important').replace(';}', '}')
+        salida.append(texto)
+    return ''.join(salida).strip() + '\n'
+
+def _fin_bloque(css, i):
+    """Posición tras la } que cierra el bloque abierto antes de `i`"""
+    profundidad = 1
+    while i < len(css):
+        c = css[i]
+        if c in '"\'':
+            i = _fin_cadena(css, i)
+            continue
+        if c == '{':
+            profundidad += 1
+        elif c == '}':
+            profundidad -= 1
+            if profundidad == 0:
+                return i + 1
+        i += 1
+    return i
+
+def _reglas_css(css):
+    """Reglas de primer nivel de un CSS minificado: (preludio, cuerpo o None)"""
+    reglas = []
+    i = 0
+    while i < len(css):
+        if css[i].isspace():
+            i += 1
+            continue
+        if css.startswith('/*', i):
+            fin = css.find('*/', i) + 2
+            reglas.append((css[i:fin], None))
+            i = fin
+            continue
+        apertura = re.compile(r'[{;]').search(css, i)
+        if apertura is None:
+            break
+        if apertura.group() == ';':
+            reglas.append((css[i:apertura.end()], None))
+            i = apertura.end()
+            continue
+        fin = _fin_bloque(css, apertura.end())
+        reglas.append((css[i:apertura.start()].strip(), css[apertura.end():fin - 1]))
+        i = fin
+    return reglas
+
+def _dividir_selectores(preludio):
+    selectores, profundidad, inicio = [], 0, 0
+    for posicion, c in enumerate(preludio):
+        if c in '([':
+            profundidad += 1
+        elif c in ')]':
+            profundidad -= 1
+        elif c == ',' and not profundidad:
+            selectores.append(preludio[inicio:posicion])
+            inicio = posicion + 1
+    selectores.append(preludio[inicio:])
+    return selectores
+
+def _selector_aplicable(selector, nombres):
+    # Cuentan etiquetas, clases e ids; pseudoclases, pseudoelementos y
+    # atributos se ignoran (la regla se conserva si el resto aparece)
+    simplificado = re.sub(r'\[[^\]]*\]', '', selector)
+    simplificado = re.sub(r'::?[\w-]+(\((?:[^()]|\([^()]*\))*\))?', '', simplificado)
+    return all(nombre in nombres for nombre in re.findall(r'[.#]?(-?[A-Za-z_][\w-]*)', simplificado))
+
+def filtrar_css(css, nombres, criticos=False):
+    """Reglas de `css` (minificado) que pueden aplicarse con `nombres`.
+
+    Con `criticos` se descartan también las animaciones (@keyframes).
+    """
+    salida = []
+    for preludio, cuerpo in _reglas_css(css):
+        if cuerpo is None:
+            salida.append(preludio)
+        elif preludio.startswith(('@media', '@supports')):
+            interior = filtrar_css(cuerpo, nombres, criticos)
+            if interior:
+                salida.append(f'{preludio}{{{interior}}}')
+        elif preludio.startswith('@'):
+            if not (criticos and 'keyframes' in preludio):
+                salida.append(f'{preludio}{{{cuerpo}}}')
+        else:
+            selectores = [s for s in _dividir_selectores(preludio) if _selector_aplicable(s, nombres)]
+            if selectores:
+                salida.append(f"{','.join(selectores)}{{{cuerpo}}}")
+    return ''.join(salida)
+
+class _NombresHTML(HTMLParser):
+    """Etiquetas, clases e ids de un documento (o hasta su primera sección)"""
+
+    def __init__(self, solo_primera_seccion=False):
+        super().__init__()
+        self.nombres = {'html', 'body'}
+        self.solo_primera_seccion = solo_primera_seccion
+        self.en_main = False
+        self.secciones = 0
+        self.terminado = False
+
+    def handle_starttag(self, etiqueta, atributos):
+        if self.terminado:
+            return
+        self.nombres.add(etiqueta)
+        for atributo, valor in atributos:
+            if atributo == 'class' and valor:
+                self.nombres.update(valor.split())
+            elif atributo == 'id' and valor:
+                self.nombres.add(valor)
+        if etiqueta == 'main':
+            self.en_main = True
+        elif etiqueta == 'section' and self.en_main:
+            self.secciones += 1
+
+    def handle_endtag(self, etiqueta):
+        if etiqueta == 'section' and self.en_main and self.secciones:
+            self.secciones -= 1
+            if not self.secciones and self.solo_primera_seccion:
+                self.terminado = True
+
+def nombres_html(html, solo_primera_seccion=False):
+    analizador = _NombresHTML(solo_primera_seccion)
+    analizador.feed(html)
+    return analizador.nombres
+
+def nombres_js(codigo):
+    """Palabras del JS: clases que se añaden desde el código (en exceso, por seguridad)"""
+    return set(re.findall(r'[A-Za-z_][\w-]*', codigo))
+
+# ===== Compilación =====
+
+def _paginas_publicas(app):
+    """HTML de cada página pública (las de @pagina_en_cache): {endpoint: html}"""
+    paginas = {}
+    for regla in app.url_map.iter_rules():
+        vista = app.view_functions.get(regla.endpoint)
+        if not getattr(vista, 'pagina_en_cache', False) or regla.arguments:
+            continue
+        with app.test_request_context(regla.rule):
+            respuesta = app.make_response(vista())
+            paginas[regla.endpoint] = respuesta.get_data(as_text=True)
+    return paginas
+
+def construir_paquetes(app):
+    """Paquetes y CSS crítico como {nombre en el manifiesto: bytes}"""
+    leidos = {}
+
+    def leer(fichero):
+        if fichero not in leidos:
+            with open(f'{app.static_folder}/{fichero}', encoding='utf-8') as f:
+                leidos[fichero] = f.read()
+        return leidos[fichero]
+
+    paquetes = {}
+    for nombre, ficheros in PAQUETES.items():
+        if nombre.endswith('.js'):
+            # Cada fichero termina su última sentencia antes del siguiente
+            codigo = ';\n'.join(quitar_depuracion(leer(f)) for f in ficheros)
+            paquetes[nombre] = minificar_js(codigo)
+        else:
+            paquetes[nombre] = minificar_css('\n'.join(leer(f) for f in ficheros))
+
+    # Las vistas renderizan con CACHE_PAGINAS desactivada (HTML sin comprimir)
+    cache_paginas = app.config.get('CACHE_PAGINAS')
+    app.config['CACHE_PAGINAS'] = False
+    try:
+        paginas = _paginas_publicas(app)
+    finally:
+        app.config['CACHE_PAGINAS'] = cache_paginas
+
+    usados = nombres_js(paquetes['paquetes/publico.js']) | set(SELECTORES_CONSERVADOS)
+    for html in paginas.values():
+        usados |= nombres_html(html)
+    for nombre in PAQUETES_PUBLICOS:
+        paquetes[nombre] = filtrar_css(paquetes[nombre], usados) + '\n'
+
+    for endpoint, nombre in PAGINAS_CRITICAS.items():
+        visibles = nombres_html(paginas[endpoint], solo_primera_seccion=True)
+        paquetes[nombre] = filtrar_css(paquetes['paquetes/publico.css'], visibles, criticos=True) + '\n'
+
+    return {nombre: contenido.encode('utf-8') for nombre, contenido in paquetes.items()}
@@ -0,0 +1,63 @@
+"""Perfil del arranque de la aplicación (flask startup-profile).
+
+El arranque se mide en un proceso nuevo para que las importaciones no
+estén ya en caché: `python -X importtime` informa del tiempo de importación de
+cada módulo y create_app() devuelve la duración de cada fase.
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+_SCRIPT = '''
+import json, time
+inicio = time.perf_counter()
+from app import create_app
+importacion = time.perf_counter() - inicio
+app = create_app()
+total = time.perf_counter() - inicio
+print(json.dumps({
+    'importacion': importacion,
+    'create_app': total - importacion,
+    'total': total,
+    'fases': app.extensions['tiempos_arranque'],
+}))
+'''
+
+def _paquetes_mas_lentos(salida_importtime, top):
+    # Formato: "import time: self [us] | cumulative | imported package".
+    # Se suma el tiempo propio de cada módulo en su paquete de primer nivel
+    # (flask, jinja2, app...), así el coste se atribuye a quien lo causa.
+    paquetes = {}
+    for linea in salida_importtime.splitlines():
+        if not linea.startswith('import time:'):
+            continue
+        partes = linea[len('import time:'):].split('|')
+        if len(partes) != 3 or not partes[0].strip().isdigit():
+            continue
+        paquete = partes[2].strip().split('.')[0]
+        paquetes[paquete] = paquetes.get(paquete, 0) + int(partes[0]) / 1e6
+    return sorted(paquetes.items(), key=lambda paquete: paquete[1], reverse=True)[:top]
+
+def perfilar_arranque(top=10):
+    """Arranca la aplicación en un proceso nuevo y devuelve los tiempos en segundos.
+
+    {'total', 'importacion', 'create_app', 'fases': [(fase, s)],
+     'paquetes': [(paquete, s de importación)], 'proceso': s incluido el intérprete}
+    """
+    entorno = dict(os.environ)
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    entorno['PYTHONPATH'] = os.pathsep.join(filter(None, [raiz, entorno.get('PYTHONPATH')]))
+
+    inicio = time.perf_counter()
+    resultado = subprocess.run([sys.executable, '-X', 'importtime', '-c', _SCRIPT],
+                               capture_output=True, text=True, cwd=os.getcwd(), env=entorno)
+    proceso = time.perf_counter() - inicio
+    if resultado.returncode != 0:
+        raise RuntimeError(f'El arranque falló:\n{resultado.stderr[-2000:]}')
+
+    tiempos = json.loads(resultado.stdout.strip().splitlines()[-1])
+    tiempos['paquetes'] = _paquetes_mas_lentos(resultado.stderr, top)
+    tiempos['proceso'] = proceso
+    return tiempos
@@ -0,0 +1,131 @@
+"""Regresión de planes de consulta de app/models.py.
+
+Ejecuta las funciones del modelo contra una base de datos temporal con el
+esquema real, captura cada sentencia SQL que emiten y comprueba con
+EXPLAIN QUERY PLAN que ninguna recorre una tabla completa.
+"""
+import os
+import re
+import tempfile
+from contextlib import contextmanager
+from app.db import pool, obtener_conexion, obtener_conexion_lectura
+from app.escritor_logs import escritor
+from app import models
+from app.migraciones import migrar
+
+# "SCAN tabla" sin índice; los recorridos de índices (USING INDEX /
+# USING COVERING INDEX) y de tablas virtuales se consideran aceptables
+_RECORRIDO_COMPLETO = re.compile(r'^SCAN (\w+)$')
+_SENTENCIAS_CON_PLAN = ('SELECT', 'UPDATE', 'DELETE', 'INSERT', 'WITH')
+
+@contextmanager
+def _base_temporal():
+    # Los logs se escriben de forma síncrona para capturarlos en este hilo
+    asincrono = escritor.habilitado
+    escritor.detener()
+    ruta_anterior = pool.ruta
+    with tempfile.TemporaryDirectory() as directorio:
+        pool.cambiar_ruta(os.path.join(directorio, 'planes.db'))
+        try:
+            yield
+        finally:
+            pool.cambiar_ruta(ruta_anterior)
+            escritor.habilitado = asincrono
+
+@contextmanager
+def _capturar(sentencias):
+    conexiones = (obtener_conexion(), obtener_conexion_lectura())
+    for conn in conexiones:
+        conn.set_trace_callback(sentencias.append)
+    try:
+        yield
+    finally:
+        for conn in conexiones:
+            conn.set_trace_callback(None)
+
+def _escenarios():
+    """Llamadas representativas de cada función de consulta del modelo"""
+    yield 'log_sistema', lambda: models.log_sistema('sistema', 'planes')
+    yield 'guardar_solicitud', lambda: models.guardar_solicitud(
+        'Ana', 'ana@example.com', '555', 'Video Vigilancia', 'Es urgente')
+    yield 'importar_solicitudes', lambda: models.importar_solicitudes([
+        {'nombre': 'Importada', 'email': 'imp@example.com', 'telefono': '558',
+         'servicio': 'Video Vigilancia', 'mensaje': 'Consulta importada', 'fecha': '2025-01-02'},
+    ], clave='planes')
+    yield 'guardar_solicitudes_encoladas', lambda: models.guardar_solicitudes_encoladas([
+        {'nombre': 'Encolada', 'email': 'cola@example.com', 'telefono': '559',
+         'servicio': 'Alarmas de Intrusión', 'mensaje': 'Desde el spool', 'fecha': '2025-01-03 10:00:00'},
+    ], 'spool:planes')
+    yield 'guardar_solicitud(clave_idempotencia)', lambda: [models.guardar_solicitud(
+        'Ana', 'ana@example.com', '555', 'Video Vigilancia', 'Reenvío', clave_idempotencia='planes')
+        for _ in range(2)]
+    yield 'buscar_clave_idempotencia', lambda: models.buscar_clave_idempotencia('planes')
+    yield 'purgar_claves_idempotencia', models.purgar_claves_idempotencia
+    yield 'reiniciar_importacion', lambda: models.reiniciar_importacion('spool:planes')
+
+    for orden in models.ORDENES_SOLICITUDES:
+        for estado, servicio in [(None, None), ('pendiente', None),
+                                 (None, 'Video Vigilancia'), ('pendiente', 'Video Vigilancia')]:
+            if orden != 'relevancia':
+                yield (f'obtener_solicitudes({estado}, {servicio}, {orden})',
+                       lambda e=estado, s=servicio, o=orden: models.obtener_solicitudes(e, s, o))
+
+            def paginar(e=estado, s=servicio, o=orden):
+                pagina = models.obtener_pagina_solicitudes(e, s, o, limite=1)
+                if pagina['siguiente']:
+                    models.obtener_pagina_solicitudes(e, s, o, pagina['siguiente'], 'siguiente', 1)
+                    models.obtener_pagina_solicitudes(e, s, o, pagina['siguiente'], 'anterior', 1)
+            yield f'obtener_pagina_solicitudes({estado}, {servicio}, {orden})', paginar
+
+            def buscar(e=estado, s=servicio, o=orden):
+                pagina = models.obtener_pagina_solicitudes(e, s, o, limite=1, q='consulta')
+                if pagina['siguiente']:
+                    models.obtener_pagina_solicitudes(e, s, o, pagina['siguiente'], 'anterior', 1, 'consulta')
+            yield f'obtener_pagina_solicitudes({estado}, {servicio}, {orden}, q)', buscar
+
+    yield 'obtener_estadisticas', models.obtener_estadisticas
+    yield 'version_estadisticas', models.version_estadisticas
+    yield 'obtener_cambios_estadisticas', lambda: models.obtener_cambios_estadisticas(1)
+    for estado, servicio in [(None, None), ('pendiente', None),
+                             (None, 'Video Vigilancia'), ('pendiente', 'Video Vigilancia')]:
+        yield (f'exportar_solicitudes({estado}, {servicio})',
+               lambda e=estado, s=servicio: list(models.exportar_solicitudes(e, s, lote=1)))
+    yield 'exportar_logs', lambda: list(models.exportar_logs(lote=1))
+    yield 'exportar_logs(tipo)', lambda: list(models.exportar_logs('sistema', lote=1))
+    yield 'marcar_como_leido', lambda: models.marcar_como_leido(1)
+    for estado in ('contactado', 'cerrado', 'pendiente'):
+        yield f'actualizar_estado({estado})', lambda e=estado: models.actualizar_estado(1, e, 'nota')
+    yield 'registrar_admin', lambda: models.registrar_admin('planes', 'secreto', 'Planes', 'planes@example.com')
+    yield 'verificar_admin', lambda: models.verificar_admin('planes', 'secreto')
+    yield 'obtener_administradores', models.obtener_administradores
+    yield 'obtener_solicitudes(limite)', lambda: models.obtener_solicitudes(limite=5)
+    yield 'actualizar_estado_admin', lambda: models.actualizar_estado_admin(1, True)
+    yield 'obtener_primer_admin', models.obtener_primer_admin
+    yield 'aplicar_accion_masiva(marcar_leido)', lambda: models.aplicar_accion_masiva([1, 2], 'marcar_leido')
+    yield ('aplicar_accion_masiva(actualizar_estado)',
+           lambda: models.aplicar_accion_masiva([1, 2], 'actualizar_estado', 'cerrado', 'nota'))
+    yield 'eliminar_solicitud', lambda: models.eliminar_solicitud(1)
+    yield 'aplicar_accion_masiva(eliminar)', lambda: models.aplicar_accion_masiva([2, 99], 'eliminar')
+
+def verificar_planes():
+    """Devuelve [(escenario, sentencia, [detalle del plan], recorridos_completos)]"""
+    resultados = []
+    with _base_temporal():
+        migrar()
+        # Dos filas para que existan páginas siguiente/anterior
+        models.guardar_solicitud('Luis', 'luis@example.com', '556', 'Video Vigilancia', 'Consulta')
+        models.guardar_solicitud('Eva', 'eva@example.com', '557', 'Video Vigilancia', 'Otra consulta')
+
+        for nombre, funcion in _escenarios():
+            sentencias = []
+            with _capturar(sentencias):
+                funcion()
+
+            conn = obtener_conexion()
+            for sentencia in sentencias:
+                if not sentencia.lstrip().upper().startswith(_SENTENCIAS_CON_PLAN):
+                    continue
+                plan = [fila[3] for fila in conn.execute('EXPLAIN QUERY PLAN ' + sentencia)]
+                completos = [detalle for detalle in plan if _RECORRIDO_COMPLETO.match(detalle)]
+                resultados.append((nombre, ' '.join(sentencia.split()), plan, completos))
+    return resultados
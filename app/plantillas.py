@@ -0,0 +1,46 @@
+"""Caché de bytecode de Jinja y calentamiento de los workers.
+
+Cada worker nuevo (tras un despliegue o al reciclarse) tenía que analizar
+y compilar cada plantilla en su primera visita. Con la caché de bytecode
+la compilación se hace una vez (`flask templates-compile`, también dentro
+de `flask assets-build`) y los workers solo cargan el código ya
+compilado. La clave de cada entrada incluye el hash del fuente, así que
+una plantilla modificada se vuelve a compilar sola.
+
+calentar() carga todas las plantillas y hace una petición GET a cada ruta
+sin parámetros; gunicorn la llama en post_worker_init, antes de que el
+worker acepte tráfico (PLANTILLAS_CALENTAR).
+"""
+import os
+import time
+from jinja2 import FileSystemBytecodeCache
+
+def compilar(app):
+    """Compila todas las plantillas (y guarda su bytecode); devuelve {nombre: segundos}"""
+    tiempos = {}
+    for nombre in app.jinja_env.list_templates():
+        inicio = time.perf_counter()
+        app.jinja_env.get_template(nombre)
+        tiempos[nombre] = time.perf_counter() - inicio
+    return tiempos
+
+def calentar(app):
+    """Carga las plantillas y visita cada ruta GET sin parámetros; devuelve {ruta: estado}"""
+    compilar(app)
+    estados = {}
+    cliente = app.test_client()
+    for regla in app.url_map.iter_rules():
+        if 'GET' not in regla.methods or regla.arguments or regla.endpoint == 'static':
+            continue
+        respuesta = cliente.get(regla.rule)
+        estados[regla.rule] = respuesta.status_code
+        respuesta.close()
+    return estados
+
+def init_app(app):
+    """Activa la caché de bytecode (PLANTILLAS_CACHE_BYTECODE)"""
+    if not app.config.get('PLANTILLAS_CACHE_BYTECODE'):
+        return
+    directorio = app.config.get('PLANTILLAS_DIRECTORIO_BYTECODE') or os.path.join(app.instance_path, 'jinja_bytecode')
+    os.makedirs(directorio, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directorio)
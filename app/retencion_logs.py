@@ -0,0 +1,136 @@
+"""Retención de logs_sistema con archivo mensual comprimido en zstd.
+
+Las filas más antiguas que el periodo de retención se copian por lotes a
+ficheros `logs-AAAA-MM.ndjson.zst` (un frame zstd por lote) y después se
+borran de la base de datos. Cada lote se confirma en disco antes del
+DELETE, y un diario permite completar o deshacer un lote interrumpido
+sin duplicar filas ni dejar frames corruptos en el archivo.
+"""
+import os
+import re
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from app.db import obtener_conexion, transaccion
+
+try:
+    from compression import zstd  # Python 3.14+
+except ImportError:
+    from backports import zstd
+
+_MES = re.compile(r'^\d{4}-\d{2}$')
+_DIARIO = 'diario.json'
+
+def _ruta_mes(directorio, mes):
+    return os.path.join(directorio, f'logs-{mes}.ndjson.zst')
+
+def _escribir_diario(directorio, estado):
+    ruta = os.path.join(directorio, _DIARIO)
+    temporal = ruta + '.tmp'
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(estado, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporal, ruta)
+
+def _recuperar(directorio):
+    """Completa o deshace un lote interrumpido según el diario.
+
+    Fase 'escribiendo': se truncan los ficheros al tamaño previo para no
+    dejar frames a medias (las filas siguen en la base de datos).
+    Fase 'borrando': el lote ya está en disco; solo falta el DELETE.
+    """
+    ruta = os.path.join(directorio, _DIARIO)
+    if not os.path.exists(ruta):
+        return
+    with open(ruta, encoding='utf-8') as f:
+        estado = json.load(f)
+
+    if estado['fase'] == 'escribiendo':
+        for fichero, tamano in estado['tamanos'].items():
+            if os.path.exists(fichero):
+                with open(fichero, 'r+b') as f:
+                    f.truncate(tamano)
+    else:
+        with transaccion() as conn:
+            conn.executemany('DELETE FROM logs_sistema WHERE id = ?', [(i,) for i in estado['ids']])
+    os.remove(ruta)
+
+def archivar_logs(directorio, dias=90, lote=1000, pausa=0.05, nivel=9):
+    """Mueve al archivo las filas de logs_sistema con más de `dias` de antigüedad.
+
+    Trabaja en lotes de `lote` filas con una pausa entre ellos para no
+    retener el bloqueo de escritura. Devuelve {mes: filas archivadas}.
+    """
+    os.makedirs(directorio, exist_ok=True)
+    # Resolver un lote interrumpido en una ejecución anterior
+    _recuperar(directorio)
+
+    limite = (datetime.now(timezone.utc) - timedelta(days=dias)).strftime('%Y-%m-%d %H:%M:%S')
+    archivadas = {}
+    conn = obtener_conexion()
+
+    while True:
+        filas = conn.execute('''
+            SELECT id, tipo, mensaje, usuario, fecha
+            FROM logs_sistema
+            WHERE fecha < ?
+            ORDER BY fecha, id
+            LIMIT ?
+        ''', (limite, lote)).fetchall()
+        if not filas:
+            break
+
+        por_mes = {}
+        for id_, tipo, mensaje, usuario, fecha in filas:
+            registro = {'id': id_, 'tipo': tipo, 'mensaje': mensaje, 'usuario': usuario, 'fecha': fecha}
+            por_mes.setdefault(str(fecha)[:7], []).append(registro)
+
+        tamanos = {}
+        for mes in por_mes:
+            ruta = _ruta_mes(directorio, mes)
+            tamanos[ruta] = os.path.getsize(ruta) if os.path.exists(ruta) else 0
+        _escribir_diario(directorio, {'fase': 'escribiendo', 'tamanos': tamanos})
+
+        for mes, registros in por_mes.items():
+            with open(_ruta_mes(directorio, mes), 'ab') as destino:
+                with zstd.open(destino, 'wt', encoding='utf-8', level=nivel) as f:
+                    for registro in registros:
+                        f.write(json.dumps(registro, ensure_ascii=False) + '\n')
+                destino.flush()
+                os.fsync(destino.fileno())
+            archivadas[mes] = archivadas.get(mes, 0) + len(registros)
+
+        _escribir_diario(directorio, {'fase': 'borrando', 'ids': [fila[0] for fila in filas]})
+        _recuperar(directorio)
+
+        if len(filas) < lote:
+            break
+        time.sleep(pausa)
+
+    return archivadas
+
+def meses_archivados(directorio):
+    """Lista de meses (AAAA-MM) disponibles en el archivo"""
+    if not os.path.isdir(directorio):
+        return []
+    meses = []
+    for nombre in os.listdir(directorio):
+        if nombre.startswith('logs-') and nombre.endswith('.ndjson.zst'):
+            mes = nombre[len('logs-'):-len('.ndjson.zst')]
+            if _MES.match(mes):
+                meses.append(mes)
+    return sorted(meses)
+
+def leer_archivo_logs(directorio, mes, tipo=None):
+    """Itera los registros archivados de un mes sin restaurarlos en la base de datos"""
+    if not _MES.match(mes):
+        raise ValueError('El mes debe tener el formato AAAA-MM')
+    ruta = _ruta_mes(directorio, mes)
+    if not os.path.exists(ruta):
+        return
+    with zstd.open(ruta, 'rt', encoding='utf-8') as f:
+        for linea in f:
+            registro = json.loads(linea)
+            if tipo is None or registro['tipo'] == tipo:
+                yield registro
@@ -1,17 +1,37 @@
-from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for, flash
+from flask import (
+    Blueprint, render_template, request, jsonify, session, redirect, url_for, flash, current_app,
+    Response, stream_with_context
+)
 from app.models import (
-    guardar_solicitud, obtener_solicitudes, obtener_estadisticas,
-    marcar_como_leido, actualizar_estado, eliminar_solicitud, 
-    verificar_admin, registrar_admin, obtener_administradores, actualizar_estado_admin, log_sistema
+    guardar_solicitud, obtener_solicitudes, obtener_pagina_solicitudes, obtener_estadisticas,
+    version_estadisticas, obtener_cambios_estadisticas,
+    marcar_como_leido, actualizar_estado, eliminar_solicitud, aplicar_accion_masiva, ACCIONES_MASIVAS,
+    verificar_admin, registrar_admin, obtener_administradores, actualizar_estado_admin, log_sistema,
+    exportar_solicitudes, exportar_logs, COLUMNAS_EXPORTACION_SOLICITUDES, COLUMNAS_EXPORTACION_LOGS,
+    buscar_clave_idempotencia
 )
 from app.auth import admin_required
+from app.cache_http import politica_cache, estadisticas as estadisticas_http
+from app.cache_paginas import pagina_en_cache, estadisticas as estadisticas_paginas
+from app.cache_fragmentos import fragmentos
+from app.cola_ingesta import cola_ingesta
+from app.db import estadisticas_pool, estadisticas_pool_lectura, instantanea
+from app.envio_ficheros import estadisticas as estadisticas_estaticos
+from app.escritor_logs import escritor
+from app.exportacion import generar_exportacion, tipo_y_extension, FORMATOS, compresiones_disponibles
+from app.idempotencia import (
+    clave_de_peticion, huella_contenido, purgador, ClaveReutilizada, CABECERA as CABECERA_IDEMPOTENCIA
+)
+from app.limite_peticiones import limitar_peticiones, estadisticas as estadisticas_limites
 import json
+import re
 from datetime import datetime, timedelta
 
 main_bp = Blueprint('main', __name__)
 
 # ===== RUTAS PÚBLICAS =====
 @main_bp.route('/')
+@pagina_en_cache
 def index():
     return render_template('index.html')
 
@@ -24,22 +44,32 @@ def admin_redirect():
         return redirect(url_for('main.admin_login'))
 
 @main_bp.route('/servicios/video-vigilancia')
+@pagina_en_cache
 def video_vigilancia():
     return render_template('services/video_vigilancia.html')
 
 @main_bp.route('/servicios/controles-acceso')
+@pagina_en_cache
 def controles_acceso():
     return render_template('services/controles_acceso.html')
 
 @main_bp.route('/servicios/alarmas-intrusion')
+@pagina_en_cache
 def alarmas_intrusion():
     return render_template('services/alarmas_intrusion.html')
 
 @main_bp.route('/servicios/sistemas-anti-incendios')
+@pagina_en_cache
 def sistemas_anti_incendios():
     return render_template('services/sistemas_anti_incendios.html')
 
+def _respuesta_repetida(mensaje, solicitud_id):
+    respuesta = jsonify({'success': True, 'message': mensaje, 'id': solicitud_id})
+    respuesta.headers['Idempotent-Replayed'] = 'true'
+    return respuesta
+
 @main_bp.route('/api/solicitud', methods=['POST'])
+@limitar_peticiones()
 def crear_solicitud():
     try:
         data = request.get_json()
@@ -53,26 +83,56 @@ def crear_solicitud():
         if '@' not in data['email']:
             return jsonify({'error': 'El email no es válido'}), 400
         
-        solicitud_id = guardar_solicitud(
+        # Reenvíos del formulario (conexiones inestables): misma respuesta
+        # que el envío original, sin escribir nada
+        try:
+            clave = clave_de_peticion(request.headers.get(CABECERA_IDEMPOTENCIA), data, required_fields)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        # Una clave reutilizada con otro contenido no devuelve la original: 422
+        huella = huella_contenido(data, required_fields)
+        ttl = current_app.config['IDEMPOTENCIA_TTL']
+        mensaje = '¡Solicitud enviada exitosamente! Nos pondremos en contacto pronto.'
+        
+        if cola_ingesta.habilitada:
+            original = buscar_clave_idempotencia(clave, huella)
+            if original is not None:
+                return _respuesta_repetida(mensaje, original)
+            # Se confirma en cuanto está en disco; el hilo de la cola la
+            # inserta en solicitudes junto con otras (y descarta reenvíos)
+            registro = {campo: data[campo] for campo in required_fields}
+            cola_ingesta.encolar(dict(registro, clave_idempotencia=clave, ttl_idempotencia=ttl,
+                                      huella_idempotencia=huella))
+            return jsonify({'success': True, 'message': mensaje}), 202
+        
+        solicitud_id, nueva = guardar_solicitud(
             data['nombre'],
             data['email'],
             data['telefono'],
             data['servicio'],
-            data['mensaje']
+            data['mensaje'],
+            clave_idempotencia=clave,
+            ttl=ttl,
+            huella=huella
         )
+        if not nueva:
+            return _respuesta_repetida(mensaje, solicitud_id)
         
         return jsonify({
             'success': True,
-            'message': '¡Solicitud enviada exitosamente! Nos pondremos en contacto pronto.',
+            'message': mensaje,
             'id': solicitud_id
         }), 200
         
+    except ClaveReutilizada as e:
+        return jsonify({'error': str(e)}), 422
     except Exception as e:
         log_sistema('error', f'Error al crear solicitud: {str(e)}')
         return jsonify({'error': 'Error al procesar la solicitud'}), 500
 
 # ===== RUTAS DE AUTENTICACIÓN MEJORADAS =====
 @main_bp.route('/admin/login', methods=['GET', 'POST'])
+@limitar_peticiones(plantilla='admin/login.html')
 def admin_login():
     # Si ya está logueado, redirigir al dashboard
     if session.get('admin_logged_in'):
@@ -105,6 +165,7 @@ def admin_login():
     return render_template('admin/login.html')
 
 @main_bp.route('/admin/register', methods=['GET', 'POST'])
+@limitar_peticiones(plantilla='admin/register.html')
 def admin_register():
     # Si ya está logueado, redirigir al dashboard
     if session.get('admin_logged_in'):
@@ -154,31 +215,57 @@ def admin_logout():
 @main_bp.route('/admin/dashboard')
 @admin_required
 def admin_dashboard():
-    estadisticas = obtener_estadisticas()
-    
-    # Obtener solicitudes recientes (últimas 5)
-    solicitudes_recientes = obtener_solicitudes(orden='fecha_desc')[:5]
+    # Contadores y recientes de la misma instantánea: coinciden entre sí
+    # aunque entren solicitudes mientras se consulta
+    with instantanea():
+        estadisticas = obtener_estadisticas()
+        
+        # Obtener solicitudes recientes (últimas 5)
+        solicitudes_recientes = obtener_solicitudes(orden='fecha_desc', limite=5)
     
     return render_template('admin/dashboard.html',
                          estadisticas=estadisticas,
                          solicitudes_recientes=solicitudes_recientes,
                          admin_nombre=session.get('admin_nombre'))
 
+def _parametros_listado():
+    """Lee filtros, ordenación y paginación comunes al panel y a la API"""
+    por_pagina = current_app.config['SOLICITUDES_POR_PAGINA']
+    maximo = current_app.config['SOLICITUDES_MAX_POR_PAGINA']
+    limite = request.args.get('limite', por_pagina, type=int)
+    q = request.args.get('q', '').strip()
+    
+    return {
+        'filtro_estado': request.args.get('estado', 'todos'),
+        'filtro_servicio': request.args.get('servicio', 'todos'),
+        # Con búsqueda, por defecto los resultados más relevantes primero
+        'orden': request.args.get('orden') or ('relevancia' if q else 'fecha_desc'),
+        'q': q or None,
+        'cursor': request.args.get('cursor') or None,
+        'direccion': request.args.get('dir', 'siguiente'),
+        'limite': max(1, min(limite, maximo))
+    }
+
 @main_bp.route('/admin/solicitudes')
 @admin_required
 def admin_solicitudes():
-    # Filtros
-    filtro_estado = request.args.get('estado', 'todos')
-    filtro_servicio = request.args.get('servicio', 'todos')
-    orden = request.args.get('orden', 'fecha_desc')
+    # Filtros y paginación
+    parametros = _parametros_listado()
     
-    solicitudes = obtener_solicitudes(filtro_estado, filtro_servicio, orden)
+    try:
+        pagina = obtener_pagina_solicitudes(**parametros)
+    except ValueError:
+        # Cursor manipulado o de otra ordenación: volver a la primera página
+        parametros['cursor'] = None
+        pagina = obtener_pagina_solicitudes(**parametros)
     
     return render_template('admin/solicitudes.html',
-                         solicitudes=solicitudes,
-                         filtro_estado=filtro_estado,
-                         filtro_servicio=filtro_servicio,
-                         orden=orden,
+                         solicitudes=pagina['solicitudes'],
+                         pagina=pagina,
+                         filtro_estado=parametros['filtro_estado'],
+                         filtro_servicio=parametros['filtro_servicio'],
+                         q=parametros['q'] or '',
+                         orden=pagina['orden'],
                          admin_nombre=session.get('admin_nombre'))
 
 # ===== GESTIÓN DE ADMINISTRADORES =====
@@ -263,16 +350,158 @@ def api_eliminar_solicitud(solicitud_id):
         log_sistema('error', f'Error al eliminar solicitud: {str(e)}', session.get('admin_username'))
         return jsonify({'error': 'Error interno del servidor'}), 500
 
+@main_bp.route('/api/admin/solicitudes/bulk', methods=['POST'])
+@admin_required
+def api_solicitudes_bulk():
+    """Aplica una misma acción a varias solicitudes en una sola transacción"""
+    data = request.get_json(silent=True) or {}
+    ids = data.get('ids')
+    accion = data.get('accion')
+    estado = data.get('estado')
+    notas = data.get('notas', '')
+    
+    # type() y no isinstance(): true/false de JSON son bool, subclase de int
+    if not isinstance(ids, list) or not ids or not all(type(i) is int for i in ids):
+        return jsonify({'error': 'Debe indicar una lista de ids'}), 400
+    if len(ids) > current_app.config['SOLICITUDES_MAX_ACCION_MASIVA']:
+        return jsonify({'error': 'Demasiadas solicitudes en una sola acción'}), 400
+    if accion not in ACCIONES_MASIVAS:
+        return jsonify({'error': 'Acción no válida'}), 400
+    if accion == 'actualizar_estado' and estado not in ['pendiente', 'contactado', 'cerrado']:
+        return jsonify({'error': 'Estado no válido'}), 400
+    if notas is not None and not isinstance(notas, str):
+        return jsonify({'error': 'Notas no válidas'}), 400
+    
+    try:
+        resultados = aplicar_accion_masiva(ids, accion, estado, notas,
+                                           session.get('admin_username'))
+    except Exception as e:
+        log_sistema('error', f'Error en acción masiva: {str(e)}', session.get('admin_username'))
+        return jsonify({'error': 'Error interno del servidor'}), 500
+    
+    return jsonify({
+        'success': True,
+        'procesadas': sum(resultados.values()),
+        'resultados': [
+            {'id': solicitud_id, 'success': ok} if ok
+            else {'id': solicitud_id, 'success': False, 'error': 'Solicitud no encontrada'}
+            for solicitud_id, ok in resultados.items()
+        ]
+    })
+
+@main_bp.route('/api/admin/solicitudes')
+@admin_required
+def api_solicitudes():
+    try:
+        pagina = obtener_pagina_solicitudes(**_parametros_listado())
+        return jsonify(pagina)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        log_sistema('error', f'Error al listar solicitudes: {str(e)}', session.get('admin_username'))
+        return jsonify({'error': 'Error interno del servidor'}), 500
+
+def _respuesta_exportacion(nombre, columnas, lotes):
+    """Respuesta en streaming con el formato y la compresión pedidos"""
+    formato = request.args.get('formato', 'csv')
+    compresion = request.args.get('compresion') or None
+    if formato not in FORMATOS:
+        return jsonify({'error': 'Formato no válido'}), 400
+    if compresion is not None and compresion not in compresiones_disponibles():
+        return jsonify({'error': 'Compresión no válida'}), 400
+    
+    mimetype, extension = tipo_y_extension(formato, compresion)
+    fichero = f'{nombre}-{datetime.now().strftime("%Y%m%d-%H%M%S")}.{extension}'
+    log_sistema('admin', f'Exportación {fichero}', session.get('admin_username'))
+    return Response(
+        stream_with_context(generar_exportacion(columnas, lotes, formato, compresion)),
+        mimetype=mimetype,
+        headers={
+            'Content-Disposition': f'attachment; filename="{fichero}"',
+            'Cache-Control': 'no-store',
+            # Evitar que un proxy acumule la respuesta completa
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+@main_bp.route('/api/admin/exportar/solicitudes')
+@admin_required
+@politica_cache('admin')
+def api_exportar_solicitudes():
+    """Exporta las solicitudes (con los filtros del panel) en CSV o NDJSON"""
+    lotes = exportar_solicitudes(request.args.get('estado', 'todos'),
+                                 request.args.get('servicio', 'todos'),
+                                 current_app.config['EXPORTACION_LOTE'])
+    return _respuesta_exportacion('solicitudes', COLUMNAS_EXPORTACION_SOLICITUDES, lotes)
+
+@main_bp.route('/api/admin/exportar/logs')
+@admin_required
+@politica_cache('admin')
+def api_exportar_logs():
+    """Exporta logs_sistema en CSV o NDJSON"""
+    lotes = exportar_logs(request.args.get('tipo') or None, current_app.config['EXPORTACION_LOTE'])
+    return _respuesta_exportacion('logs', COLUMNAS_EXPORTACION_LOGS, lotes)
+
+# flask_compress añade al ETag fuerte la codificación usada ("estadisticas-N:gzip")
+_SUFIJO_CODIFICACION = re.compile(r':(?:gzip|deflate|br|zstd)$')
+
+def _etag_enviado(etag):
+    """Valor de If-None-Match que corresponde a etag, con o sin sufijo de codificación"""
+    if request.if_none_match.star_tag:
+        return etag
+    for enviado in request.if_none_match:
+        if _SUFIJO_CODIFICACION.sub('', enviado) == etag:
+            return enviado
+    return None
+
 @main_bp.route('/api/admin/estadisticas')
 @admin_required
 def api_estadisticas():
+    """Contadores del dashboard; con ?since=<versión> solo los que han cambiado.
+    
+    La versión de los contadores es también el ETag: si no ha cambiado se
+    responde 304 sin leer ningún contador.
+    """
     try:
-        estadisticas = obtener_estadisticas()
-        return jsonify(estadisticas)
+        version = version_estadisticas()
+        desde = request.args.get('since', type=int)
+        etag = f'estadisticas-{version}'
+        enviado = _etag_enviado(etag)
+        if desde == version or enviado:
+            # El 304 repite el ETag que tiene el cliente (el de la versión comprimida)
+            respuesta = current_app.response_class(status=304)
+            respuesta.set_etag(enviado or etag)
+            return respuesta
+        # Una versión futura (base restaurada) obliga a la carga completa
+        if desde is not None and desde < version:
+            estadisticas = obtener_cambios_estadisticas(desde)
+        else:
+            estadisticas = obtener_estadisticas()
+        respuesta = jsonify(estadisticas)
+        respuesta.set_etag(f'estadisticas-{estadisticas["version"]}')
+        return respuesta
     except Exception as e:
         log_sistema('error', f'Error al obtener estadísticas: {str(e)}', session.get('admin_username'))
         return jsonify({'error': 'Error interno del servidor'}), 500
 
+@main_bp.route('/api/admin/metricas')
+@admin_required
+@politica_cache('admin')
+def api_metricas():
+    """Métricas internas del worker"""
+    return jsonify({
+        'pool': estadisticas_pool(),
+        'pool_lectura': estadisticas_pool_lectura(),
+        'logs': escritor.estadisticas(),
+        'ingesta': cola_ingesta.estadisticas(),
+        'idempotencia': purgador.estadisticas(),
+        'limites': estadisticas_limites(),
+        'paginas': estadisticas_paginas(),
+        'http': estadisticas_http(),
+        'estaticos': estadisticas_estaticos(),
+        'fragmentos': fragmentos.estadisticas()
+    })
+
 @main_bp.route('/health-check')
 def health_check():
     return jsonify({
@@ -5,10 +5,22 @@ class AdminPanel {
     }
 
     init() {
+        // Contadores con los que se ha renderizado el dashboard (con su versión)
+        this.estadisticas = this.leerEstadisticasIniciales();
         this.setupEventListeners();
         this.loadStats();
     }
 
+    leerEstadisticasIniciales() {
+        const datos = document.getElementById('chart-data');
+        if (!datos || !datos.dataset.estadisticas) return null;
+        try {
+            return JSON.parse(datos.dataset.estadisticas);
+        } catch (error) {
+            return null;
+        }
+    }
+
     setupEventListeners() {
         // Marcar como leído
         document.addEventListener('click', (e) => {
@@ -32,6 +44,104 @@ class AdminPanel {
                 this.eliminarSolicitud(btn.dataset.id);
             }
         });
+
+        // Selección múltiple
+        document.addEventListener('change', (e) => {
+            if (e.target.matches('#bulk-select-all')) {
+                document.querySelectorAll('.bulk-select').forEach(checkbox => {
+                    checkbox.checked = e.target.checked;
+                });
+                this.actualizarSeleccion();
+            } else if (e.target.matches('.bulk-select')) {
+                this.actualizarSeleccion();
+            } else if (e.target.matches('#bulk-estado') && e.target.value) {
+                this.accionMasiva('actualizar_estado', { estado: e.target.value });
+                e.target.value = '';
+            }
+        });
+
+        document.addEventListener('click', (e) => {
+            const btn = e.target.closest('.bulk-action-btn');
+            if (btn) {
+                this.accionMasiva(btn.dataset.accion);
+            }
+        });
+    }
+
+    idsSeleccionados() {
+        return Array.from(document.querySelectorAll('.bulk-select:checked'))
+            .map(checkbox => parseInt(checkbox.value, 10));
+    }
+
+    actualizarSeleccion() {
+        const ids = this.idsSeleccionados();
+        const contador = document.getElementById('bulk-count');
+        if (contador) contador.textContent = ids.length;
+
+        document.querySelectorAll('.bulk-action-btn, #bulk-estado').forEach(control => {
+            control.disabled = ids.length === 0;
+        });
+        document.querySelectorAll('.bulk-select').forEach(checkbox => {
+            const card = checkbox.closest('.solicitud-card');
+            if (card) card.classList.toggle('selected', checkbox.checked);
+        });
+
+        const todas = document.getElementById('bulk-select-all');
+        if (todas) {
+            const total = document.querySelectorAll('.bulk-select').length;
+            todas.checked = total > 0 && ids.length === total;
+        }
+    }
+
+    async accionMasiva(accion, datos = {}) {
+        const ids = this.idsSeleccionados();
+        if (ids.length === 0) return;
+
+        if (accion === 'eliminar' &&
+            !confirm(`¿Está seguro de que desea eliminar ${ids.length} solicitudes? Esta acción no se puede deshacer.`)) {
+            return;
+        }
+
+        try {
+            const response = await fetch('/api/admin/solicitudes/bulk', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'X-Requested-With': 'XMLHttpRequest'
+                },
+                body: JSON.stringify({ ids, accion, ...datos })
+            });
+
+            const result = await response.json();
+
+            if (!response.ok) {
+                this.showNotification('Error: ' + result.error, 'error');
+                return;
+            }
+
+            result.resultados.forEach(resultado => {
+                if (!resultado.success) return;
+                if (accion === 'marcar_leido') {
+                    this.actualizarUI(resultado.id, 'leido');
+                } else if (accion === 'actualizar_estado') {
+                    this.actualizarUI(resultado.id, 'estado', datos.estado);
+                } else {
+                    this.removerSolicitudUI(resultado.id);
+                }
+            });
+
+            const fallidas = result.resultados.length - result.procesadas;
+            if (fallidas > 0) {
+                this.showNotification(`${result.procesadas} solicitudes actualizadas, ${fallidas} no encontradas`, 'info');
+            } else {
+                this.showNotification(`${result.procesadas} solicitudes actualizadas`, 'success');
+            }
+            this.actualizarSeleccion();
+            this.actualizarEstadisticas();
+        } catch (error) {
+            console.error('Error:', error);
+            this.showNotification('Error de conexión', 'error');
+        }
     }
 
     async marcarComoLeido(solicitudId) {
@@ -74,6 +184,7 @@ class AdminPanel {
             if (response.ok) {
                 this.showNotification(`Estado actualizado a ${estado}`, 'success');
                 this.actualizarUI(solicitudId, 'estado', estado);
+                this.actualizarEstadisticas();
             } else {
                 this.showNotification('Error: ' + result.error, 'error');
             }
@@ -128,6 +239,8 @@ class AdminPanel {
                     statusBadge.textContent = this.getEstadoText(datos);
                     statusBadge.className = `status status-${datos}`;
                 }
+                const statusSelect = solicitudCard.querySelector('.status-select');
+                if (statusSelect) statusSelect.value = datos;
                 break;
         }
     }
@@ -152,24 +265,63 @@ class AdminPanel {
     }
 
     async loadStats() {
+        // Con una versión conocida solo se piden los cambios: 304 si no hay ninguno
+        const url = this.estadisticas
+            ? `/api/admin/estadisticas?since=${this.estadisticas.version}`
+            : '/api/admin/estadisticas';
         try {
-            const response = await fetch('/api/admin/estadisticas');
+            const response = await fetch(url);
+            if (response.status === 304) return;
             if (response.ok) {
-                const stats = await response.json();
-                this.updateStatsDisplay(stats);
+                this.aplicarEstadisticas(await response.json());
+                this.updateStatsDisplay(this.estadisticas);
             }
         } catch (error) {
             console.error('Error cargando estadísticas:', error);
         }
     }
 
+    aplicarEstadisticas(datos) {
+        if (!datos.parcial || !this.estadisticas) {
+            this.estadisticas = datos;
+            return;
+        }
+        // Respuesta parcial: solo los contadores modificados (0 = la clave desaparece)
+        for (const [clave, valor] of Object.entries(datos)) {
+            if (clave === 'parcial') continue;
+            if (valor !== null && typeof valor === 'object') {
+                const grupo = this.estadisticas[clave] || (this.estadisticas[clave] = {});
+                for (const [nombre, cantidad] of Object.entries(valor)) {
+                    if (cantidad > 0) grupo[nombre] = cantidad;
+                    else delete grupo[nombre];
+                }
+            } else {
+                this.estadisticas[clave] = valor;
+            }
+        }
+        this.descartarDiasAntiguos();
+    }
+
+    descartarDiasAntiguos() {
+        // El servidor no notifica los días que salen de la ventana: mismo
+        // límite que date('now', '-7 days') de SQLite (fecha UTC)
+        const dias = this.estadisticas && this.estadisticas.ultimos_7_dias;
+        if (!dias) return;
+        const limite = new Date(Date.now() - 7 * 86400000).toISOString().slice(0, 10);
+        for (const dia of Object.keys(dias)) {
+            if (dia < limite) delete dias[dia];
+        }
+    }
+
     updateStatsDisplay(stats) {
         // Actualizar contadores en tiempo real si es necesario
         const totalEl = document.getElementById('total-solicitudes');
-        const unreadEl = document.getElementById('unread-solicitudes');
+        const unreadEl = document.getElementById('no-leidas') || document.getElementById('unread-solicitudes');
+        const contactadosEl = document.getElementById('contactados');
         
         if (totalEl) totalEl.textContent = stats.total;
         if (unreadEl) unreadEl.textContent = stats.no_leidas;
+        if (contactadosEl) contactadosEl.textContent = (stats.por_estado || {}).contactado || 0;
     }
 
     actualizarEstadisticas() {
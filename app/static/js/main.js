@@ -3,6 +3,9 @@
     'use strict';
     
     const SESSVision = {
+        // Envío del formulario aún sin confirmar: { body, clave }
+        envioPendiente: null,
+        
         init() {
             this.initNavigation();
             this.initSmoothScroll();
@@ -126,16 +129,27 @@
                 mensaje: document.getElementById('mensaje').value.trim()
             };
             
+            // La misma clave en cada reintento del mismo contenido: el
+            // servidor devuelve la solicitud original en vez de duplicarla
+            const body = JSON.stringify(formData);
+            if (!this.envioPendiente || this.envioPendiente.body !== body) {
+                this.envioPendiente = { body, clave: this.generarClaveIdempotencia() };
+            }
+            
             try {
                 const response = await fetch('/api/solicitud', {
                     method: 'POST',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify(formData)
+                    headers: {
+                        'Content-Type': 'application/json',
+                        'Idempotency-Key': this.envioPendiente.clave
+                    },
+                    body
                 });
                 
                 const result = await response.json();
                 
                 if (response.ok) {
+                    this.envioPendiente = null;
                     this.showAlert(alertDiv, result.message, 'success');
                     form.reset();
                 } else {
@@ -151,6 +165,13 @@
             }
         },
         
+        generarClaveIdempotencia() {
+            if (window.crypto && crypto.randomUUID) {
+                return crypto.randomUUID();
+            }
+            return Date.now().toString(36) + Math.random().toString(36).slice(2);
+        },
+        
         initScrollEffects() {
             const navbar = document.querySelector('.navbar');
             if (!navbar) return;
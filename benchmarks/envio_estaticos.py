@@ -0,0 +1,142 @@
+"""Ocupación del worker y rendimiento al servir estáticos según ESTATICOS_ENVIO.
+
+Arranca gunicorn con un único worker sync por modo y le pide los ficheros
+de app/static (completos y con Range) y un fichero grande generado. Para
+cada carga mide peticiones por segundo, MB/s y el tiempo de CPU que el
+worker dedica a cada petición (utime + stime de /proc, incluido el
+sendfile del kernel): es el tiempo durante el que el worker no puede
+atender otra petición.
+
+En 'x-accel-redirect' no hay nginx delante: se mide solo lo que hace el
+worker (responder la cabecera); el fichero lo enviaría nginx.
+
+Uso: python benchmarks/envio_estaticos.py [peticiones por carga] [MB del fichero grande]
+"""
+import os
+import sys
+import time
+import shutil
+import socket
+import tempfile
+import subprocess
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, RAIZ)
+
+MODOS = ['python', 'sendfile', 'x-accel-redirect']
+CLIENTES = 4
+
+def crear_app():
+    """Fábrica para gunicorn: base de datos y estáticos temporales"""
+    from app import create_app
+    from app.db import pool
+    pool.cambiar_ruta(os.path.join(os.environ['BENCH_DIRECTORIO'], 'bench.db'))
+    app = create_app('production')
+    app.config['LIMITES_HABILITADOS'] = False
+    app.static_folder = os.path.join(os.environ['BENCH_DIRECTORIO'], 'static')
+    return app
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def _cpu_proceso(pid):
+    with open(f'/proc/{pid}/stat') as f:
+        campos = f.read().rsplit(')', 1)[1].split()
+    return (int(campos[11]) + int(campos[12])) / os.sysconf('SC_CLK_TCK')
+
+def _worker(maestro):
+    for _ in range(100):
+        try:
+            with open(f'/proc/{maestro}/task/{maestro}/children') as f:
+                hijos = f.read().split()
+        except FileNotFoundError:
+            hijos = []
+        if hijos:
+            return int(hijos[0])
+        time.sleep(0.1)
+    raise RuntimeError('gunicorn no ha arrancado ningún worker')
+
+def _pedir(puerto, ruta, cabeceras):
+    conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=30)
+    try:
+        conexion.request('GET', ruta, headers=cabeceras)
+        respuesta = conexion.getresponse()
+        cuerpo = respuesta.read()
+        assert respuesta.status in (200, 206), (ruta, respuesta.status)
+        return len(cuerpo)
+    finally:
+        conexion.close()
+
+def _esperar(puerto):
+    for _ in range(200):
+        try:
+            return _pedir(puerto, '/health-check', {})
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError('gunicorn no responde')
+
+def _medir(puerto, worker, peticiones):
+    inicio_cpu = _cpu_proceso(worker)
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(CLIENTES) as clientes:
+        enviados = sum(clientes.map(lambda p: _pedir(puerto, *p), peticiones))
+    duracion = time.perf_counter() - inicio
+    cpu = _cpu_proceso(worker) - inicio_cpu
+    return len(peticiones) / duracion, enviados / duracion / 1e6, cpu * 1000 / len(peticiones)
+
+def _cargas(directorio_static, peticiones, nombre_grande):
+    activos = []
+    for raiz, _, ficheros in os.walk(directorio_static):
+        for fichero in ficheros:
+            nombre = os.path.relpath(os.path.join(raiz, fichero), directorio_static)
+            if nombre != nombre_grande:
+                activos.append(f'/static/{nombre}')
+    activos.sort()
+    repetir = lambda rutas, cabeceras: [(r, cabeceras) for r in rutas] * (peticiones // len(rutas) or 1)
+    return {
+        'app/static completos': repetir(activos, {}),
+        'app/static con Range': repetir(activos, {'Range': 'bytes=0-4095'}),
+        f'{nombre_grande} completo': repetir([f'/static/{nombre_grande}'], {})[:max(1, peticiones // 10)],
+        f'{nombre_grande} con Range': repetir([f'/static/{nombre_grande}'], {'Range': 'bytes=1048576-2097151'}),
+    }
+
+def main(peticiones, megas):
+    with tempfile.TemporaryDirectory() as directorio:
+        directorio_static = os.path.join(directorio, 'static')
+        shutil.copytree(os.path.join(RAIZ, 'app', 'static'), directorio_static,
+                        ignore=shutil.ignore_patterns('dist'))
+        nombre_grande = 'video_demo.bin'
+        with open(os.path.join(directorio_static, nombre_grande), 'wb') as f:
+            f.write(os.urandom(megas * 1024 * 1024))
+        cargas = _cargas(directorio_static, peticiones, nombre_grande)
+
+        print(f'{CLIENTES} clientes, 1 worker sync, fichero grande de {megas} MB\n')
+        print(f'{"modo":<18} {"carga":<28} {"r/s":>9} {"MB/s":>9} {"CPU worker/pet.":>16}')
+        for modo in MODOS:
+            puerto = _puerto_libre()
+            entorno = dict(os.environ, ESTATICOS_ENVIO=modo, BENCH_DIRECTORIO=directorio)
+            # cwd temporal: sin gunicorn.conf.py ni logs/ en el repositorio
+            maestro = subprocess.Popen(
+                [sys.executable, '-m', 'gunicorn', '-w', '1', '-b', f'127.0.0.1:{puerto}',
+                 '--pythonpath', f'{RAIZ},{os.path.dirname(os.path.abspath(__file__))}',
+                 '--log-level', 'warning', 'envio_estaticos:crear_app()'],
+                cwd=directorio, env=entorno)
+            try:
+                _esperar(puerto)
+                worker = _worker(maestro.pid)
+                for nombre, carga in cargas.items():
+                    _medir(puerto, worker, carga[:CLIENTES])  # calentar
+                    por_segundo, megas_segundo, cpu_ms = _medir(puerto, worker, carga)
+                    print(f'{modo:<18} {nombre:<28} {por_segundo:9.0f} {megas_segundo:9.1f} {cpu_ms:13.2f} ms')
+            finally:
+                maestro.terminate()
+                maestro.wait()
+            print()
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 400,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 8)
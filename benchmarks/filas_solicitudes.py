@@ -0,0 +1,67 @@
+"""Compara memoria y tiempo de las filas de solicitudes.
+
+Antes: lista de diccionarios de 13 claves construida con fetchall().
+Ahora: lista de Solicitud (dataclass con __slots__).
+
+Uso: python benchmarks/filas_solicitudes.py [filas]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.db import pool, transaccion
+from app.escritor_logs import escritor
+from app import models
+from app.migraciones import migrar
+
+def _poblar(filas):
+    servicios = ['Video Vigilancia', 'Controles de Acceso', 'Alarmas de Intrusión', 'Sistemas Anti Incendios']
+    with transaccion() as conn:
+        conn.executemany('''
+            INSERT INTO solicitudes (nombre, email, telefono, servicio, mensaje)
+            VALUES (?, ?, ?, ?, ?)
+        ''', ((f'Cliente {i}', f'cliente{i}@example.com', f'555{i:06d}', servicios[i % 4],
+               f'Solicitud de instalación número {i}') for i in range(filas)))
+
+def _como_diccionarios():
+    # Implementación anterior de obtener_solicitudes
+    cursor = models.obtener_conexion().cursor()
+    cursor.execute(models._COLUMNAS_SOLICITUD + ' ORDER BY solicitudes.fecha DESC')
+    return [{
+        'id': row[0], 'nombre': row[1], 'email': row[2], 'telefono': row[3],
+        'servicio': row[4], 'mensaje': row[5], 'fecha': row[6], 'leido': bool(row[7]),
+        'prioridad': row[8], 'estado': row[9], 'notas': row[10],
+        'fecha_contacto': row[11], 'fecha_cierre': row[12]
+    } for row in cursor.fetchall()]
+
+def _medir(nombre, funcion):
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    resultado = funcion()
+    duracion = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'{nombre:<42} {duracion * 1000:9.1f} ms {pico / 1024 / 1024:9.1f} MiB')
+    return resultado
+
+def main(filas):
+    escritor.detener()
+    with tempfile.TemporaryDirectory() as directorio:
+        pool.cambiar_ruta(os.path.join(directorio, 'bench.db'))
+        migrar()
+        _poblar(filas)
+        print(f'{filas} solicitudes\n')
+
+        _medir('dict + fetchall (todas)', _como_diccionarios)
+        _medir('Solicitud en lista (todas)', models.obtener_solicitudes)
+        print()
+        _medir('dict + fetchall + [:5] (dashboard antes)', lambda: _como_diccionarios()[:5])
+        _medir('limite=5 (dashboard ahora)', lambda: models.obtener_solicitudes(limite=5))
+        pool.cerrar_todas()
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,82 @@
+"""Tiempo de render de la página de solicitudes con y sin caché de fragmentos.
+
+Renderiza admin/solicitudes.html con una página grande de tarjetas:
+
+- sin caché (FRAGMENTOS_CACHE = False);
+- caché fría: primera visita, se renderiza y guarda cada tarjeta;
+- caché caliente: solo se concatenan las tarjetas guardadas;
+- tras modificar un 5 % de las filas: solo esas tarjetas se renderizan.
+
+Uso: python benchmarks/fragmentos_solicitudes.py [tarjetas] [repeticiones]
+"""
+import os
+import sys
+import tempfile
+import time
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flask import render_template
+from app import create_app
+from app.db import pool, transaccion
+from app import models
+from app.cache_fragmentos import fragmentos
+
+def _poblar(filas):
+    servicios = ['Video Vigilancia', 'Controles de Acceso', 'Alarmas de Intrusión', 'Sistemas Anti Incendios']
+    with transaccion() as conn:
+        conn.executemany('''
+            INSERT INTO solicitudes (nombre, email, telefono, servicio, mensaje, notas)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', ((f'Cliente {i}', f'cliente{i}@example.com', f'555{i:06d}', servicios[i % 4],
+               f'Solicitud de instalación número {i}. ' * 4, 'Llamar por la mañana' if i % 3 else '')
+              for i in range(filas)))
+
+def _renderizar(app, tarjetas):
+    # Como la vista: consulta de la página + plantilla
+    pagina = models.obtener_pagina_solicitudes(limite=tarjetas)
+    with app.test_request_context('/admin/solicitudes'):
+        return render_template('admin/solicitudes.html', solicitudes=pagina['solicitudes'], pagina=pagina,
+                               filtro_estado='todos', filtro_servicio='todos', q='', orden=pagina['orden'],
+                               admin_nombre='Benchmark')
+
+def _medir(nombre, funcion, repeticiones, preparar=None):
+    tiempos = []
+    for _ in range(repeticiones):
+        if preparar:
+            preparar()
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    print(f'{nombre:<36} {statistics.median(tiempos) * 1000:9.2f} ms')
+
+def main(tarjetas, repeticiones):
+    with tempfile.TemporaryDirectory() as directorio:
+        pool.cambiar_ruta(os.path.join(directorio, 'bench.db'))
+        app = create_app('production')
+        _poblar(tarjetas)
+        ids = [solicitud.id for solicitud in models.obtener_solicitudes()]
+        print(f'{tarjetas} tarjetas, mediana de {repeticiones} renders\n')
+
+        fragmentos.habilitada = False
+        _medir('sin caché de fragmentos', lambda: _renderizar(app, tarjetas), repeticiones)
+        fragmentos.habilitada = True
+
+        _medir('caché fría (primera visita)', lambda: _renderizar(app, tarjetas), repeticiones,
+               preparar=fragmentos.vaciar)
+
+        _renderizar(app, tarjetas)
+        _medir('caché caliente', lambda: _renderizar(app, tarjetas), repeticiones)
+
+        modificadas = ids[::20]
+        _medir(f'con {len(modificadas)} filas modificadas', lambda: _renderizar(app, tarjetas), repeticiones,
+               preparar=lambda: models.aplicar_accion_masiva(modificadas, 'actualizar_estado', 'contactado', 'Nota'))
+
+        estadisticas = fragmentos.estadisticas()
+        print(f'\n{estadisticas["entradas"]} fragmentos en caché, {estadisticas["bytes"] / 1024:.0f} KiB')
+        pool.cerrar_todas()
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 20)
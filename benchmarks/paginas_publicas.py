@@ -0,0 +1,72 @@
+"""Peticiones por segundo de las páginas públicas con y sin caché de páginas.
+
+Sin caché: render_template + compresión de flask_compress en cada visita.
+Con caché: cuerpo precomprimido elegido según Accept-Encoding.
+
+Se llama directamente a la aplicación WSGI (sin servidor ni red) para
+medir solo el coste del lado de Flask.
+
+Uso: python benchmarks/paginas_publicas.py [peticiones por página]
+"""
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import create_app, cache_paginas
+from app.db import pool
+from app.escritor_logs import escritor
+
+RUTAS = ['/', '/servicios/video-vigilancia', '/servicios/controles-acceso',
+         '/servicios/alarmas-intrusion', '/servicios/sistemas-anti-incendios']
+
+ACCEPT_ENCODING = ['gzip, deflate, br, zstd', 'gzip', '']
+
+def _entorno(ruta, accept_encoding):
+    return {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': ruta, 'QUERY_STRING': '', 'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1', 'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr, 'wsgi.multithread': False,
+        'wsgi.multiprocess': True, 'wsgi.run_once': False, 'HTTP_ACCEPT_ENCODING': accept_encoding,
+    }
+
+def _medir(app, accept_encoding, peticiones):
+    def start_response(estado, cabeceras):
+        assert estado.startswith('200'), estado
+
+    bytes_enviados = 0
+    inicio = time.perf_counter()
+    for _ in range(peticiones):
+        for ruta in RUTAS:
+            cuerpo = app.wsgi_app(_entorno(ruta, accept_encoding), start_response)
+            bytes_enviados += sum(len(bloque) for bloque in cuerpo)
+            if hasattr(cuerpo, 'close'):
+                cuerpo.close()
+    duracion = time.perf_counter() - inicio
+    total = peticiones * len(RUTAS)
+    return total / duracion, bytes_enviados / total
+
+def main(peticiones):
+    escritor.detener()
+    with tempfile.TemporaryDirectory() as directorio:
+        pool.cambiar_ruta(os.path.join(directorio, 'bench.db'))
+        app = create_app('production')
+        app.config['LIMITES_HABILITADOS'] = False
+        print(f'{peticiones} peticiones por página y codificación\n')
+        print(f'{"Accept-Encoding":<26} {"sin caché":>12} {"con caché":>12} {"mejora":>8} {"bytes/resp.":>12}')
+        for accept_encoding in ACCEPT_ENCODING:
+            app.config['CACHE_PAGINAS'] = False
+            sin_cache, _ = _medir(app, accept_encoding, peticiones)
+            app.config['CACHE_PAGINAS'] = True
+            cache_paginas.invalidar()
+            _medir(app, accept_encoding, 1)  # renderizar antes de medir
+            con_cache, tamano = _medir(app, accept_encoding, peticiones)
+            print(f'{accept_encoding or "(ninguna)":<26} {sin_cache:9.0f} r/s {con_cache:9.0f} r/s '
+                  f'{con_cache / sin_cache:7.1f}x {tamano:12.0f}')
+        pool.cerrar_todas()
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
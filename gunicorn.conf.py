@@ -0,0 +1,40 @@
+# Configuración de gunicorn: gunicorn -c gunicorn.conf.py
+import os
+import time
+
+wsgi_app = 'app:create_app()'
+
+def on_starting(server):
+    # Migraciones una sola vez en el proceso maestro: cada worker solo
+    # comprueba la versión del esquema al ejecutar create_app()
+    if os.environ.get('MIGRACIONES_AUTOMATICAS', '1') != '1':
+        return
+    from app import create_app
+    from app.db import pool
+    from app.escritor_logs import escritor
+    from app.cola_ingesta import cola_ingesta
+    from app.idempotencia import purgador
+    create_app()  # aplica las migraciones pendientes (migraciones.init_app)
+    cola_ingesta.detener()
+    purgador.detener()
+    escritor.detener()
+    pool.cerrar_todas()
+
+def worker_exit(server, worker):
+    # Volcar las solicitudes del spool y escribir los logs pendientes
+    # (incluidos los del volcado) antes de que el worker termine
+    from app.cola_ingesta import cola_ingesta
+    from app.escritor_logs import escritor
+    cola_ingesta.detener()
+    escritor.detener()
+
+def post_worker_init(worker):
+    # Cargar plantillas y visitar cada ruta antes de aceptar peticiones,
+    # para que la primera visita real no pague la compilación
+    app = worker.wsgi
+    if app.config.get('PLANTILLAS_CALENTAR'):
+        from app.plantillas import calentar
+        inicio = time.perf_counter()
+        estados = calentar(app)
+        worker.log.info('Worker calentado: %d rutas en %.0f ms', len(estados),
+                        (time.perf_counter() - inicio) * 1000)
@@ -13,60 +13,10 @@ def get_db_path():
     return os.path.join(os.path.dirname(__file__), 'instance', 'sessvision.db')
 
 def init_database():
-    """Inicializa la base de datos con esquema corregido"""
-    db_path = get_db_path()
-    os.makedirs(os.path.dirname(db_path), exist_ok=True)
-    
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    # Crear tabla de administradores con esquema completo
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS administradores (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            nombre TEXT NOT NULL,
-            email TEXT NOT NULL,
-            rol TEXT DEFAULT 'admin',
-            activo BOOLEAN DEFAULT 1,
-            fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            ultimo_login TIMESTAMP NULL
-        )
-    ''')
-    
-    # Crear tabla de solicitudes
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS solicitudes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nombre TEXT NOT NULL,
-            email TEXT NOT NULL,
-            telefono TEXT NOT NULL,
-            servicio TEXT NOT NULL,
-            mensaje TEXT NOT NULL,
-            fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            leido BOOLEAN DEFAULT 0,
-            prioridad INTEGER DEFAULT 1,
-            estado TEXT DEFAULT 'pendiente',
-            notas TEXT DEFAULT '',
-            fecha_contacto TIMESTAMP NULL,
-            fecha_cierre TIMESTAMP NULL
-        )
-    ''')
-    
-    # Crear tabla de logs
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS logs_sistema (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            tipo TEXT NOT NULL,
-            mensaje TEXT NOT NULL,
-            usuario TEXT,
-            fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    conn.commit()
-    return conn
+    """Aplica las migraciones pendientes y devuelve una conexión a la base de datos"""
+    from app.migraciones import migrar
+    migrar()
+    return sqlite3.connect(get_db_path())
 
 def registrar_admin(username, password, nombre, email, rol='admin'):
     """Registra un nuevo administrador"""
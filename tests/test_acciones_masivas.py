@@ -0,0 +1,40 @@
+"""Validación de POST /api/admin/solicitudes/bulk"""
+import os
+import pytest
+from app import create_app, models
+from app.db import pool
+
+@pytest.fixture
+def cliente(tmp_path):
+    ruta_anterior = pool.ruta
+    pool.cambiar_ruta(os.path.join(tmp_path, 'test.db'))
+    app = create_app('testing')
+    with app.app_context():
+        models.guardar_solicitud('Ana', 'ana@example.com', '555', 'Video Vigilancia', 'Consulta')
+        models.registrar_admin('admin', 'Secreta123!', 'Admin', 'admin@example.com')
+    cliente = app.test_client()
+    cliente.post('/admin/login', data={'username': 'admin', 'password': 'Secreta123!'})
+    yield cliente
+    pool.cambiar_ruta(ruta_anterior)
+
+def _accion(cliente, **datos):
+    return cliente.post('/api/admin/solicitudes/bulk', json=datos)
+
+@pytest.mark.parametrize('ids', [[True], [1, False], [1.0], ['1']])
+def test_rechaza_ids_que_no_son_enteros(cliente, ids):
+    respuesta = _accion(cliente, ids=ids, accion='marcar_leido')
+    assert respuesta.status_code == 400
+    assert models.obtener_estadisticas()['no_leidas'] == 1
+
+@pytest.mark.parametrize('notas', [1, ['nota'], {'texto': 'nota'}, True])
+def test_rechaza_notas_que_no_son_texto(cliente, notas):
+    respuesta = _accion(cliente, ids=[1], accion='actualizar_estado', estado='contactado', notas=notas)
+    assert respuesta.status_code == 400
+    assert models.obtener_solicitudes()[0].estado == 'pendiente'
+
+@pytest.mark.parametrize('notas', ['Llamar el lunes', None])
+def test_acepta_notas_de_texto_o_nulas(cliente, notas):
+    respuesta = _accion(cliente, ids=[1], accion='actualizar_estado', estado='contactado', notas=notas)
+    assert respuesta.get_json()['procesadas'] == 1
+    solicitud = models.obtener_solicitudes()[0]
+    assert (solicitud.estado, solicitud.notas) == ('contactado', notas)
@@ -0,0 +1,57 @@
+"""Sincronización por versión de /api/admin/estadisticas"""
+import os
+import pytest
+from app import create_app, models, routes
+from app.db import pool
+
+@pytest.fixture
+def cliente(tmp_path):
+    ruta_anterior = pool.ruta
+    pool.cambiar_ruta(os.path.join(tmp_path, 'test.db'))
+    app = create_app('testing')
+    with app.app_context():
+        models.guardar_solicitud('Ana', 'ana@example.com', '555', 'Video Vigilancia', 'Consulta')
+        models.registrar_admin('admin', 'Secreta123!', 'Admin', 'admin@example.com')
+    cliente = app.test_client()
+    cliente.post('/admin/login', data={'username': 'admin', 'password': 'Secreta123!'})
+    yield cliente
+    pool.cambiar_ruta(ruta_anterior)
+
+def test_importacion_cambia_la_version(cliente):
+    version = cliente.get('/api/admin/estadisticas').get_json()['version']
+    assert cliente.get(f'/api/admin/estadisticas?since={version}').status_code == 304
+
+    resumen = models.importar_solicitudes([
+        {'nombre': f'Importada {i}', 'email': f'imp{i}@example.com', 'telefono': '556',
+         'servicio': 'Alarmas de Intrusión', 'mensaje': 'Consulta importada'}
+        for i in range(3)
+    ])
+    assert resumen['insertadas'] == 3
+
+    respuesta = cliente.get(f'/api/admin/estadisticas?since={version}')
+    assert respuesta.status_code == 200
+    cambios = respuesta.get_json()
+    assert cambios['parcial'] is True
+    assert cambios['version'] > version
+    assert cambios['total'] == 4
+    assert cambios['no_leidas'] == 4
+    assert cambios['por_servicio'] == {'Alarmas de Intrusión': 3}
+    assert cambios['por_estado'] == {'pendiente': 4}
+    assert cliente.get(f'/api/admin/estadisticas?since={cambios["version"]}').status_code == 304
+
+def test_etag_comprimido_responde_304_sin_leer_contadores(cliente, monkeypatch):
+    # flask_compress añade la codificación al ETag ("estadisticas-N:gzip")
+    cliente.application.config['COMPRESS_MIN_SIZE'] = 0
+    respuesta = cliente.get('/api/admin/estadisticas', headers={'Accept-Encoding': 'gzip'})
+    assert respuesta.headers['Content-Encoding'] == 'gzip'
+    etag = respuesta.headers['ETag']
+    assert etag.endswith(':gzip"')
+
+    lecturas = []
+    obtener_estadisticas = routes.obtener_estadisticas
+    monkeypatch.setattr(routes, 'obtener_estadisticas', lambda: lecturas.append(1) or obtener_estadisticas())
+    respuesta = cliente.get('/api/admin/estadisticas',
+                            headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert respuesta.status_code == 304
+    assert respuesta.headers['ETag'] == etag
+    assert lecturas == []
@@ -0,0 +1,42 @@
+"""Claves de idempotencia de POST /api/solicitud"""
+import os
+import pytest
+from app import create_app, models
+from app.db import pool, transaccion
+
+FORMULARIO = {'nombre': 'Ana', 'email': 'ana@example.com', 'telefono': '555',
+              'servicio': 'Video Vigilancia', 'mensaje': 'Consulta'}
+
+@pytest.fixture
+def cliente(tmp_path):
+    ruta_anterior = pool.ruta
+    pool.cambiar_ruta(os.path.join(tmp_path, 'test.db'))
+    app = create_app('testing')
+    yield app.test_client()
+    pool.cambiar_ruta(ruta_anterior)
+
+def _enviar(cliente, datos, clave='clave-1'):
+    return cliente.post('/api/solicitud', json=datos, headers={'Idempotency-Key': clave})
+
+def test_reenvio_con_la_misma_clave_devuelve_la_original(cliente):
+    original = _enviar(cliente, FORMULARIO)
+    repetida = _enviar(cliente, dict(FORMULARIO, email=' ANA@example.com'))
+    assert repetida.status_code == 200
+    assert repetida.headers['Idempotent-Replayed'] == 'true'
+    assert repetida.get_json()['id'] == original.get_json()['id']
+
+def test_clave_reutilizada_con_otro_contenido_es_422(cliente):
+    _enviar(cliente, FORMULARIO)
+    respuesta = _enviar(cliente, dict(FORMULARIO, mensaje='Otra consulta'))
+    assert respuesta.status_code == 422
+    assert 'id' not in respuesta.get_json()
+    assert len(models.obtener_solicitudes()) == 1
+
+def test_claves_sin_huella_no_se_comprueban(cliente):
+    # Guardadas antes de la migración 11
+    original = _enviar(cliente, FORMULARIO).get_json()['id']
+    with transaccion() as conn:
+        conn.execute('UPDATE claves_idempotencia SET huella = NULL')
+    respuesta = _enviar(cliente, dict(FORMULARIO, mensaje='Otra consulta'))
+    assert respuesta.status_code == 200
+    assert respuesta.get_json()['id'] == original
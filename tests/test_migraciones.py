@@ -0,0 +1,26 @@
+"""Esquema resultante de aplicar las migraciones"""
+import os
+import re
+import pytest
+from app import create_app, models
+from app.db import pool, obtener_conexion
+
+@pytest.fixture
+def app(tmp_path):
+    ruta_anterior = pool.ruta
+    pool.cambiar_ruta(os.path.join(tmp_path, 'test.db'))
+    yield create_app('testing')
+    pool.cambiar_ruta(ruta_anterior)
+
+def _normalizar(sql):
+    return ' '.join(sql.replace('IF NOT EXISTS ', '').split())
+
+def test_triggers_de_estadisticas_coinciden_con_models(app):
+    # importar_solicitudes recrea los triggers de alta desde models: si el
+    # esquema actual cambia, hace falta una migración que lo aplique
+    with app.app_context():
+        instalados = {nombre: _normalizar(sql) for nombre, sql in obtener_conexion().execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'trg_estadisticas_%'")}
+    esperados = {re.search(r'TRIGGER IF NOT EXISTS (\w+)', sql).group(1): _normalizar(sql)
+                 for sql in models._triggers_estadisticas()}
+    assert instalados == esperados
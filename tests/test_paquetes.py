@@ -0,0 +1,23 @@
+"""Recorte de los paquetes CSS públicos (flask assets-build)"""
+import os
+import pytest
+from app import create_app
+from app.db import pool
+from app.paquetes import construir_paquetes, SELECTORES_CONSERVADOS
+
+@pytest.fixture
+def app(tmp_path):
+    ruta_anterior = pool.ruta
+    pool.cambiar_ruta(os.path.join(tmp_path, 'test.db'))
+    yield create_app('testing')
+    pool.cambiar_ruta(ruta_anterior)
+
+def test_conserva_clases_compuestas_en_js(app):
+    css = construir_paquetes(app)['paquetes/publico.css'].decode('utf-8')
+    for clase in SELECTORES_CONSERVADOS:
+        assert f'.{clase}{{' in css
+
+def test_recorta_selectores_no_usados(app):
+    css = construir_paquetes(app)['paquetes/publico.css'].decode('utf-8')
+    # Solo en el panel
+    assert '.solicitud-card' not in css
@@ -0,0 +1,9 @@
+"""Regresión de planes de consulta: ninguna consulta del modelo recorre una tabla completa"""
+from app.planes_consulta import verificar_planes
+
+def test_ninguna_consulta_recorre_tablas_completas():
+    resultados = verificar_planes()
+    assert resultados, 'no se ha capturado ninguna sentencia'
+    completos = [f'{escenario}: {sentencia} -> {", ".join(recorridos)}'
+                 for escenario, sentencia, _, recorridos in resultados if recorridos]
+    assert not completos, '\n'.join(completos)